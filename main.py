@@ -1,14 +1,42 @@
 # src/main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from src.routes import router
+from src.utils.rate_limit import RateLimitMiddleware
+from src.utils.metrics import metrics_response
+from src.utils.timing import ServerTimingMiddleware
+from src.infra.qdrant_client import close_qdrant_clients
+from src.config import FEED_SCHEDULER_ENABLED
+from src.indexing.services.feed_scheduler import feed_scheduler_loop
+from src.indexing.services.feed_url_service import http_client as feed_http_client
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 🗓️ Sincronização periódica dos feeds registrados
+    scheduler = asyncio.create_task(feed_scheduler_loop()) if FEED_SCHEDULER_ENABLED else None
+    yield
+    if scheduler:
+        scheduler.cancel()
+    # 🔌 Fecha os pools de conexão compartilhados (Qdrant, download de feeds)
+    await feed_http_client.aclose()
+    await close_qdrant_clients()
 
 app = FastAPI(
     title="buscoo API",
     description="API de indexação e autocomplete vetorial para e-commerce. Contém endpoints para upload, busca, sugestões e monitoramento de status.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# ⏱️ Header Server-Timing com o tempo de cada etapa (redis, embedding, qdrant, imagens...)
+app.add_middleware(ServerTimingMiddleware)
+
+# 🪣 Rate limit por endpoint/IP/client_id (Redis) — adicionado antes do CORS para que
+# as respostas 429 também recebam os headers de CORS
+app.add_middleware(RateLimitMiddleware)
+
 # ✅ CORSMiddleware primeiro
 app.add_middleware(
     CORSMiddleware,
@@ -16,7 +44,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After"],
 )
 
 # ✅ Inclui rotas após o middleware
 app.include_router(router, prefix="/api")
+
+# 📈 Métricas Prometheus (scrape em prometheus.yml)
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
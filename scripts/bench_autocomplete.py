@@ -0,0 +1,173 @@
+# Load test do /api/autocomplete com substitutos locais (Qdrant em memória, Redis fake ou local,
+# embedding stub). Semeia um catálogo sintético, reproduz um trace de digitação (JSONL no formato
+# {"client_id": ..., "q": ...}) com concorrência fixa e salva throughput e p50/p95/p99 em JSON.
+#
+# Uso:
+#   python -m scripts.bench_autocomplete --produtos 5000 --concorrencia 16 --saida bench.json
+#   python -m scripts.bench_autocomplete --baseline bench.json --tolerancia 0.15   # falha se regredir
+#   python -m scripts.bench_autocomplete --gerar-trace trace.jsonl --queries 2000
+#
+# Requer as credenciais do Firebase usadas em dev (secrets/firebase-admin.json) para importar a API.
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from uuid import uuid4
+from scripts.bench_standins import DIM, configurar_ambiente, embed_local, percentis
+
+PALAVRAS = {
+    "categoria": ["fone", "tenis", "camiseta", "notebook", "cafeteira", "mochila", "relogio", "caixa de som", "teclado", "garrafa"],
+    "atributo": ["bluetooth", "corrida", "algodao", "gamer", "inox", "preto", "azul", "sem fio", "infantil", "premium"],
+    "marca": ["acme", "zeta", "orion", "nova", "atlas", "vega", "lumen", "polar"],
+}
+
+def gerar_catalogo(n: int, seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    produtos = []
+    for i in range(n):
+        categoria = rng.choice(PALAVRAS["categoria"])
+        marca = rng.choice(PALAVRAS["marca"])
+        titulo = f"{categoria} {rng.choice(PALAVRAS['atributo'])} {marca} {i}"
+        price = round(rng.uniform(10, 3000), 2)
+        produtos.append({
+            "title": titulo,
+            "brand": marca,
+            "category": categoria,
+            "price": price,
+            "priceText": f"{price} Kč",
+            "image": f"https://cdn.exemplo.com/thumbs/{i}.jpg",
+            "url": f"https://loja.exemplo.com/p/{i}",
+            "description": "descrição longa " * 50,
+        })
+    return produtos
+
+def gerar_trace(n: int, client_id: str, seed: int = 7) -> list[dict]:
+    """Simula digitação: cada busca vira a sequência de prefixos (a partir de 2 letras)."""
+    rng = random.Random(seed)
+    trace = []
+    while len(trace) < n:
+        termo = rng.choice(PALAVRAS["categoria"])
+        if rng.random() < 0.6:
+            termo += " " + rng.choice(PALAVRAS["atributo"] + PALAVRAS["marca"])
+        for i in range(2, len(termo) + 1):
+            if termo[i - 1] != " ":
+                trace.append({"client_id": client_id, "q": termo[:i]})
+    return trace[:n]
+
+def semear(qdrant, collection: str, produtos: list[dict]):
+    from qdrant_client import models
+    from src.indexing.schemas.product_schema import montar_payload_suggest
+
+    qdrant.recreate_collection(collection, vectors_config=models.VectorParams(size=DIM, distance=models.Distance.COSINE))
+    points = []
+    for p in produtos:
+        payload = {**p, "client_id": collection}
+        payload["suggest"] = montar_payload_suggest(payload)
+        points.append(models.PointStruct(
+            id=str(uuid4()),
+            vector=embed_local(f"{p['title']} {p['brand']} {p['category']}"),
+            payload=payload,
+        ))
+    qdrant.upload_points(collection, points=points, batch_size=512)
+
+async def replay(app, trace: list[dict], concorrencia: int) -> dict:
+    import httpx
+
+    fila: asyncio.Queue = asyncio.Queue()
+    for item in trace:
+        fila.put_nowait(item)
+    latencias = []
+    erros = 0
+
+    async def worker(client):
+        nonlocal erros
+        while not fila.empty():
+            item = fila.get_nowait()
+            inicio = time.perf_counter()
+            resp = await client.get("/api/autocomplete", params=item)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if resp.status_code != 200:
+                erros += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        inicio = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concorrencia)])
+        duracao = time.perf_counter() - inicio
+
+    return {
+        "requests": len(latencias),
+        "erros": erros,
+        "duracao_s": round(duracao, 2),
+        "throughput_rps": round(len(latencias) / duracao, 1),
+        **percentis(latencias),
+    }
+
+def comparar(resultado: dict, baseline: dict, tolerancia: float) -> list[str]:
+    regressoes = []
+    for chave in ("p50_ms", "p95_ms", "p99_ms"):
+        if baseline.get(chave) and resultado[chave] > baseline[chave] * (1 + tolerancia):
+            regressoes.append(f"{chave}: {resultado[chave]} > {baseline[chave]} (+{tolerancia:.0%})")
+    if baseline.get("throughput_rps") and resultado["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerancia):
+        regressoes.append(f"throughput_rps: {resultado['throughput_rps']} < {baseline['throughput_rps']} (-{tolerancia:.0%})")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test do autocomplete com substitutos locais")
+    parser.add_argument("--produtos", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--client-id", default="bench")
+    parser.add_argument("--trace", default="", help="Trace JSONL a reproduzir (senão gera um sintético)")
+    parser.add_argument("--gerar-trace", default="", help="Só grava um trace sintético neste arquivo e sai")
+    parser.add_argument("--redis-url", default="", help="Redis real (senão usa fakeredis)")
+    parser.add_argument("--saida", default="", help="Arquivo JSON com o resultado")
+    parser.add_argument("--baseline", default="", help="Resultado anterior para detectar regressão")
+    parser.add_argument("--tolerancia", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if args.gerar_trace:
+        with open(args.gerar_trace, "w") as f:
+            for item in gerar_trace(args.queries, args.client_id):
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        print(f"💾 Trace com {args.queries} queries salvo em {args.gerar_trace}")
+        return
+
+    configurar_ambiente(args.redis_url or None)
+
+    from src.infra.qdrant_client import get_qdrant
+    from main import app
+
+    print(f"🌱 Semeando {args.produtos} produtos em '{args.client_id}'...")
+    semear(get_qdrant(), args.client_id, gerar_catalogo(args.produtos))
+
+    if args.trace:
+        with open(args.trace) as f:
+            trace = [json.loads(linha) for linha in f if linha.strip()]
+    else:
+        trace = gerar_trace(args.queries, args.client_id)
+
+    print(f"🚀 Reproduzindo {len(trace)} queries com concorrência {args.concorrencia}...")
+    resultado = asyncio.run(replay(app, trace, args.concorrencia))
+    resultado["config"] = {"produtos": args.produtos, "queries": len(trace), "concorrencia": args.concorrencia}
+    print(f"📊 {json.dumps(resultado, ensure_ascii=False)}")
+
+    if args.saida:
+        with open(args.saida, "w") as f:
+            json.dump(resultado, f, indent=2)
+        print(f"💾 Resultado salvo em {args.saida}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressoes = comparar(resultado, json.load(f), args.tolerancia)
+        if regressoes:
+            print("❌ Regressão de performance:")
+            for r in regressoes:
+                print(f"   - {r}")
+            sys.exit(1)
+        print("✅ Sem regressão em relação ao baseline")
+
+if __name__ == "__main__":
+    main()
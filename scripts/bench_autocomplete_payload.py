@@ -0,0 +1,67 @@
+# Compara tamanho de resposta e latência da busca do autocomplete
+# com payload completo vs. seletor de campos (`AUTOCOMPLETE_PAYLOAD_FIELDS`).
+#
+# Uso:
+#   python -m scripts.bench_autocomplete_payload --collection minha_loja --queries "fone,tenis corrida,cafe"
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from qdrant_client.http.models import SearchParams
+from src.infra.embedding_client import encode_text
+from src.infra.qdrant_client import get_qdrant
+from src.search.services.autocomplete_service import AUTOCOMPLETE_PAYLOAD_FIELDS
+
+qdrant = get_qdrant()
+
+def medir(collection: str, vectors: list, with_payload, repeticoes: int) -> dict:
+    latencias = []
+    bytes_payload = []
+
+    for _ in range(repeticoes):
+        for vector in vectors:
+            inicio = time.perf_counter()
+            result = qdrant.search(
+                collection_name=collection,
+                query_vector=vector,
+                limit=7,
+                with_payload=with_payload,
+                search_params=SearchParams(hnsw_ef=128, exact=False),
+                score_threshold=0.05,
+            )
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            bytes_payload.append(len(json.dumps([p.payload for p in result], ensure_ascii=False).encode()))
+
+    latencias.sort()
+    return {
+        "p50_ms": round(statistics.median(latencias), 2),
+        "p95_ms": round(latencias[int(len(latencias) * 0.95) - 1], 2),
+        "bytes_medio": round(statistics.mean(bytes_payload)),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de payload do autocomplete")
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--queries", default="fone,fone bluetooth,tenis,camiseta,cafe,notebook")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    queries = [q.strip() for q in args.queries.split(",") if q.strip()]
+    vectors = [await encode_text(q.lower()) for q in queries]
+
+    # 🔥 Aquecimento para não medir conexão/TLS
+    medir(args.collection, vectors, True, 1)
+
+    antes = medir(args.collection, vectors, True, args.repeticoes)
+    depois = medir(args.collection, vectors, AUTOCOMPLETE_PAYLOAD_FIELDS, args.repeticoes)
+
+    print(f"📊 Coleção '{args.collection}' — {len(queries)} queries x {args.repeticoes} repetições")
+    print(f"   with_payload=True      → {antes}")
+    print(f"   seletor de campos      → {depois}")
+    if antes["bytes_medio"]:
+        reducao = 100 * (1 - depois["bytes_medio"] / antes["bytes_medio"])
+        print(f"✅ Redução de payload: {reducao:.1f}%")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+# Benchmark ponta a ponta do pipeline de upload (process_and_index_file) com substitutos locais:
+# gerador de CSV sintético (aliases de COLUMN_ALIASES, linhas quebradas, URLs de imagem),
+# servidor local de imagens, S3 stub para os thumbnails, Qdrant em memória e embedding stub.
+# Reporta linhas/s, tempo por etapa, pico de RSS e pontos gravados no Qdrant.
+#
+# Uso:
+#   python -m scripts.bench_indexing --linhas 10000 --saida bench_indexing.json
+#   python -m scripts.bench_indexing --gerar-csv catalogo.csv --linhas 1000000 --img-base http://localhost:8765
+#
+# Requer as credenciais do Firebase usadas em dev (secrets/firebase-admin.json).
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+from uuid import uuid4
+from scripts.bench_standins import configurar_ambiente, configurar_s3_stub, iniciar_servidor_imagens
+from scripts.bench_autocomplete import PALAVRAS
+
+# Importado direto do schema: não depende de clientes externos
+from src.indexing.schemas.product_schema import COLUMN_ALIASES
+
+def gerar_csv(caminho: str, linhas: int, img_base: str, taxa_quebrados: float = 0.05, seed: int = 42) -> dict:
+    """Gera o CSV em streaming (memória constante, escala para milhões de linhas)."""
+    rng = random.Random(seed)
+    colunas = {campo: rng.choice(aliases) for campo, aliases in COLUMN_ALIASES.items()}
+    quebrados = 0
+
+    with open(caminho, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(colunas.values())
+
+        for i in range(linhas):
+            categoria = rng.choice(PALAVRAS["categoria"])
+            marca = rng.choice(PALAVRAS["marca"])
+            linha = {
+                "title": f"{categoria} {rng.choice(PALAVRAS['atributo'])} {marca} {i}",
+                "price": f"{rng.uniform(10, 3000):.2f}",
+                "images": str([f"{img_base}/img/{i}.jpg"]),
+                "brand": marca,
+                "category": categoria,
+                "url": f"https://loja.exemplo.com/p/{i}",
+                "description": f"Descrição do produto {i}. " * rng.randint(1, 20),
+                "composition": "algodão, poliéster",
+                "uses": "Uso diário. Esporte",
+                "side_effects": "",
+            }
+
+            if rng.random() < taxa_quebrados:
+                quebrados += 1
+                defeito = rng.choice(["sem_titulo", "url_invalida", "sem_imagem", "imagem_404", "linha_malformada"])
+                if defeito == "sem_titulo":
+                    linha["title"] = ""
+                elif defeito == "url_invalida":
+                    linha["url"] = "loja.exemplo.com/p/sem-esquema"
+                elif defeito == "sem_imagem":
+                    linha["images"] = "[]"
+                elif defeito == "imagem_404":
+                    linha["images"] = str([f"{img_base}/missing/{i}.jpg"])
+                else:
+                    f.write(f'"linha quebrada {i},,,"extra","campos",a,b,c,d,e,f,g\n')
+                    continue
+
+            writer.writerow([linha[campo] for campo in colunas])
+
+    return {"colunas": colunas, "quebrados": quebrados}
+
+def tempos_por_etapa() -> dict:
+    from src.utils.metrics import INDEXING_STAGE_SECONDS
+
+    etapas = {}
+    for familia in INDEXING_STAGE_SECONDS.collect():
+        for sample in familia.samples:
+            if sample.name.endswith("_sum"):
+                etapa = sample.labels["stage"]
+                etapas[etapa] = round(etapas.get(etapa, 0) + sample.value, 3)
+    return dict(sorted(etapas.items(), key=lambda kv: -kv[1]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de indexação")
+    parser.add_argument("--linhas", type=int, default=10000)
+    parser.add_argument("--taxa-quebrados", type=float, default=0.05)
+    parser.add_argument("--client-id", default="bench_indexing")
+    parser.add_argument("--gerar-csv", default="", help="Só gera o CSV neste caminho e sai")
+    parser.add_argument("--img-base", default="http://127.0.0.1:8765", help="Base das URLs de imagem (com --gerar-csv)")
+    parser.add_argument("--redis-url", default="")
+    parser.add_argument("--saida", default="")
+    args = parser.parse_args()
+
+    if args.gerar_csv:
+        info = gerar_csv(args.gerar_csv, args.linhas, args.img_base, args.taxa_quebrados)
+        print(f"💾 CSV com {args.linhas} linhas ({info['quebrados']} quebradas) salvo em {args.gerar_csv}")
+        print(f"   colunas: {info['colunas']}")
+        return
+
+    configurar_ambiente(args.redis_url or None)
+    objetos_s3 = configurar_s3_stub()
+    img_base = iniciar_servidor_imagens()
+
+    from src.indexing.services.upload_service import process_and_index_file
+    from src.infra.tenant_collections import collection_for
+    from src.infra.qdrant_client import get_qdrant
+
+    upload_id = str(uuid4())
+    caminho = os.path.join(tempfile.gettempdir(), f"bench_{upload_id}.csv")
+    inicio = time.perf_counter()
+    info = gerar_csv(caminho, args.linhas, img_base, args.taxa_quebrados)
+    print(f"🧪 CSV sintético: {args.linhas} linhas ({info['quebrados']} quebradas) em {time.perf_counter() - inicio:.1f}s")
+
+    inicio = time.perf_counter()
+    resposta = asyncio.run(process_and_index_file(caminho, upload_id, args.client_id))
+    duracao = time.perf_counter() - inicio
+
+    pontos = get_qdrant().count(collection_for(args.client_id), exact=True).count
+    resultado = {
+        "linhas": args.linhas,
+        "quebradas": info["quebrados"],
+        "duracao_s": round(duracao, 2),
+        "linhas_por_s": round(args.linhas / duracao, 1),
+        "pontos_qdrant": pontos,
+        "thumbnails_s3": len(objetos_s3),
+        "pico_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "etapas_s": tempos_por_etapa(),
+        "resposta": resposta.get("details", resposta),
+    }
+    print(f"📊 {json.dumps(resultado, ensure_ascii=False, indent=2)}")
+
+    if args.saida:
+        with open(args.saida, "w") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultado salvo em {args.saida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# Compara coleção por tenant vs. coleção compartilhada com 10, 100 e 1000 tenants sintéticos:
+# tempo de criação/carga, latência de busca p50/p99 e memória residente do Qdrant
+# (lida do /metrics do próprio Qdrant quando disponível).
+#
+# Uso:
+#   python -m scripts.bench_multitenant --tenants 10,100,1000 --pontos-por-tenant 200
+import argparse
+import json
+import random
+import re
+import time
+import httpx
+import numpy as np
+from qdrant_client import models
+from src.config import QDRANT_URL, QDRANT_API_KEY
+from src.infra.qdrant_client import get_qdrant
+from src.infra.tenant_collections import CLIENT_ID_INDEX, SHARED_HNSW_CONFIG
+
+qdrant = get_qdrant()
+
+DIM = 384
+PREFIXO = "bench_mt"
+
+def percentil(valores: list[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, round(p * (len(ordenados) - 1))))]
+
+def memoria_qdrant_mb() -> float | None:
+    try:
+        headers = {"api-key": QDRANT_API_KEY} if QDRANT_API_KEY else {}
+        texto = httpx.get(f"{QDRANT_URL.rstrip('/')}/metrics", headers=headers, timeout=10).text
+        match = re.search(r"^memory_resident_bytes\s+([0-9.e+]+)", texto, re.MULTILINE)
+        return round(float(match.group(1)) / 2**20, 1) if match else None
+    except Exception:
+        return None
+
+def vetores(n: int, rng: np.random.Generator) -> np.ndarray:
+    v = rng.standard_normal((n, DIM)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+def aguardar_green(collection: str):
+    while qdrant.get_collection(collection).status != models.CollectionStatus.GREEN:
+        time.sleep(0.5)
+
+def limpar():
+    for c in qdrant.get_collections().collections:
+        if c.name.startswith(PREFIXO):
+            qdrant.delete_collection(c.name)
+
+def medir_busca(alvos: list[tuple[str, str | None]], queries: np.ndarray) -> dict:
+    latencias = []
+    for (collection, client_id), q in zip(alvos, queries):
+        query_filter = None
+        if client_id:
+            query_filter = models.Filter(must=[models.FieldCondition(key="client_id", match=models.MatchValue(value=client_id))])
+        inicio = time.perf_counter()
+        qdrant.search(collection, query_vector=q.tolist(), query_filter=query_filter, limit=7, with_payload=False)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return {"p50_ms": round(percentil(latencias, 0.50), 2), "p99_ms": round(percentil(latencias, 0.99), 2)}
+
+def cenario_por_tenant(n_tenants: int, pontos: int, queries: int, rng) -> dict:
+    memoria_antes = memoria_qdrant_mb()
+    inicio = time.perf_counter()
+    for t in range(n_tenants):
+        nome = f"{PREFIXO}_t{t}"
+        qdrant.create_collection(nome, vectors_config=models.VectorParams(size=DIM, distance=models.Distance.COSINE))
+        qdrant.upload_collection(nome, vectors=vetores(pontos, rng), batch_size=256)
+    for t in range(n_tenants):
+        aguardar_green(f"{PREFIXO}_t{t}")
+    carga = time.perf_counter() - inicio
+    memoria_depois = memoria_qdrant_mb()
+
+    alvos = [(f"{PREFIXO}_t{random.randrange(n_tenants)}", None) for _ in range(queries)]
+    busca = medir_busca(alvos, vetores(queries, rng))
+    limpar()
+    return {
+        "carga_s": round(carga, 1),
+        "memoria_mb": round(memoria_depois - memoria_antes, 1) if memoria_antes is not None and memoria_depois is not None else None,
+        **busca,
+    }
+
+def cenario_compartilhado(n_tenants: int, pontos: int, queries: int, rng) -> dict:
+    nome = f"{PREFIXO}_shared"
+    memoria_antes = memoria_qdrant_mb()
+    inicio = time.perf_counter()
+    qdrant.create_collection(
+        nome,
+        vectors_config=models.VectorParams(size=DIM, distance=models.Distance.COSINE),
+        hnsw_config=SHARED_HNSW_CONFIG,
+    )
+    qdrant.create_payload_index(nome, field_name="client_id", field_schema=CLIENT_ID_INDEX)
+    for t in range(n_tenants):
+        qdrant.upload_collection(
+            nome,
+            vectors=vetores(pontos, rng),
+            payload=[{"client_id": f"t{t}"}] * pontos,
+            ids=range(t * pontos, (t + 1) * pontos),
+            batch_size=256,
+        )
+    aguardar_green(nome)
+    carga = time.perf_counter() - inicio
+    memoria_depois = memoria_qdrant_mb()
+
+    alvos = [(nome, f"t{random.randrange(n_tenants)}") for _ in range(queries)]
+    busca = medir_busca(alvos, vetores(queries, rng))
+    limpar()
+    return {
+        "carga_s": round(carga, 1),
+        "memoria_mb": round(memoria_depois - memoria_antes, 1) if memoria_antes is not None and memoria_depois is not None else None,
+        **busca,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-tenant: coleção por tenant vs. compartilhada")
+    parser.add_argument("--tenants", default="10,100,1000")
+    parser.add_argument("--pontos-por-tenant", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--saida", default="")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    random.seed(42)
+    limpar()
+
+    resultados = {}
+    for n in [int(x) for x in args.tenants.split(",")]:
+        print(f"🏢 {n} tenants x {args.pontos_por_tenant} pontos")
+        resultados[n] = {
+            "per_tenant": cenario_por_tenant(n, args.pontos_por_tenant, args.queries, rng),
+            "shared": cenario_compartilhado(n, args.pontos_por_tenant, args.queries, rng),
+        }
+        for modo, r in resultados[n].items():
+            print(f"   {modo:<10} → {r}")
+
+    if args.saida:
+        with open(args.saida, "w") as f:
+            json.dump(resultados, f, indent=2)
+        print(f"💾 Resultados salvos em {args.saida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# Substitutos locais para benchmarks: embedding determinístico, microserviço de embedding
+# stub (HTTP de verdade, em thread própria), Qdrant em memória e Redis fake.
+# Os patches precisam rodar ANTES de importar `main`/serviços, que capturam os clientes no import.
+import hashlib
+import os
+import socket
+import threading
+import time
+import numpy as np
+import uvicorn
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+DIM = 384
+
+def embed_local(text: str, dim: int = DIM) -> list[float]:
+    """Vetor determinístico por trigramas de caracteres — prefixos ficam próximos da palavra completa."""
+    v = np.zeros(dim, dtype=np.float32)
+    t = f"  {text.lower().strip()} "
+    for i in range(len(t) - 2):
+        h = int.from_bytes(hashlib.blake2b(t[i:i + 3].encode(), digest_size=8).digest(), "little")
+        v[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = np.linalg.norm(v)
+    return (v / norm if norm else v).tolist()
+
+class _EmbedRequest(BaseModel):
+    texts: list[str]
+
+stub_embedding_app = FastAPI()
+
+@stub_embedding_app.post("/embed")
+async def _embed(req: _EmbedRequest):
+    return {"vectors": [embed_local(t) for t in req.texts]}
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def iniciar_embedding_stub() -> str:
+    porta = _porta_livre()
+    server = uvicorn.Server(uvicorn.Config(stub_embedding_app, host="127.0.0.1", port=porta, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{porta}"
+
+class QdrantAsyncSobreSync:
+    """Interface do AsyncQdrantClient sobre o cliente sync em memória (mesmo armazenamento)."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, nome):
+        attr = getattr(self._client, nome)
+        if not callable(attr):
+            return attr
+
+        async def chamada(*args, **kwargs):
+            return attr(*args, **kwargs)
+        return chamada
+
+def configurar_ambiente(redis_url: str | None = None) -> str:
+    """Sobe o embedding stub e troca Qdrant/Redis pelos substitutos locais. Retorna a URL do stub."""
+    embedding_url = iniciar_embedding_stub()
+    os.environ["EMBEDDING_SERVICE_URL"] = embedding_url
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    from qdrant_client import QdrantClient
+    from src.infra.qdrant_client import set_qdrant
+    # Um único Qdrant em memória atrás dos dois registros: o que o benchmark semeia pelo cliente sync
+    # é o que o app lê pelo async
+    qdrant = QdrantClient(location=":memory:")
+    set_qdrant(qdrant, async_client=QdrantAsyncSobreSync(qdrant))
+
+    import src.infra.redis_client as redis_module
+    if redis_url:
+        import redis.asyncio as aioredis
+        redis_module.redis_client = aioredis.from_url(redis_url, decode_responses=True)
+    else:
+        from fakeredis import FakeAsyncRedis
+        redis_module.redis_client = FakeAsyncRedis(decode_responses=True)
+
+    return embedding_url
+
+def percentis(latencias_ms: list[float]) -> dict:
+    if not latencias_ms:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    ordenados = sorted(latencias_ms)
+
+    def p(q):
+        return round(ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))], 2)
+
+    return {"p50_ms": p(0.50), "p95_ms": p(0.95), "p99_ms": p(0.99)}
+
+def _servir(handler_cls) -> str:
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+def iniciar_servidor_imagens(variacoes: int = 16) -> str:
+    """Serve JPEGs sintéticos em /img/{n}.jpg (404 para /missing/...)."""
+    from http.server import BaseHTTPRequestHandler
+    from io import BytesIO
+    from PIL import Image
+
+    imagens = []
+    for i in range(variacoes):
+        buffer = BytesIO()
+        Image.new("RGB", (400 + 40 * i, 400 + 30 * i), ((i * 37) % 255, (i * 91) % 255, (i * 53) % 255)).save(buffer, format="JPEG")
+        imagens.append(buffer.getvalue())
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if not self.path.startswith("/img/"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            n = int("".join(c for c in self.path if c.isdigit()) or 0)
+            corpo = imagens[n % len(imagens)]
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    return _servir(Handler)
+
+def iniciar_s3_stub() -> tuple[str, dict]:
+    """S3 mínimo (path-style): aceita PutObject e guarda só o tamanho de cada objeto."""
+    from http.server import BaseHTTPRequestHandler
+
+    objetos: dict[str, int] = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_PUT(self):
+            if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                tamanho = 0
+                while True:
+                    chunk = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                    if chunk == 0:
+                        # trailers (ex: checksum) até a linha em branco
+                        while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                            pass
+                        break
+                    self.rfile.read(chunk + 2)
+                    tamanho += chunk
+            else:
+                tamanho = int(self.headers.get("Content-Length", 0))
+                self.rfile.read(tamanho)
+            objetos[self.path] = tamanho
+            self.send_response(200)
+            self.send_header("ETag", '"bench"')
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    return _servir(Handler), objetos
+
+def configurar_s3_stub() -> dict:
+    """Aponta o upload de thumbnails para o S3 stub. Retorna o dicionário de objetos gravados."""
+    import boto3
+    from botocore.config import Config
+    import src.indexing.services.image_service as image_module
+
+    endpoint, objetos = iniciar_s3_stub()
+    image_module.s3 = boto3.client(
+        "s3",
+        region_name="auto",
+        endpoint_url=endpoint,
+        aws_access_key_id="bench",
+        aws_secret_access_key="bench",
+        config=Config(s3={"addressing_style": "path"}),
+    )
+    return objetos
@@ -0,0 +1,125 @@
+# Compara perfis de armazenamento (default | scalar | binary) copiando uma amostra
+# de uma coleção real para coleções temporárias e medindo memória estimada,
+# latência p50/p99 e recall@k contra a busca exata em float32.
+#
+# Uso:
+#   python -m scripts.bench_storage_profiles --collection minha_loja --pontos 20000
+import argparse
+import json
+import statistics
+import time
+from qdrant_client import models
+from src.infra.qdrant_client import get_qdrant
+from src.indexing.services.storage_profile_service import (
+    STORAGE_PROFILES, quantization_config, quantization_search_params, vector_params
+)
+
+qdrant = get_qdrant()
+
+HNSW_M = 16
+
+def percentil(valores: list[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, round(p * (len(ordenados) - 1))))]
+
+def copiar_amostra(origem: str, limite: int) -> list:
+    pontos = []
+    offset = None
+    while len(pontos) < limite:
+        batch, offset = qdrant.scroll(
+            collection_name=origem,
+            limit=min(1000, limite - len(pontos)),
+            offset=offset,
+            with_vectors=True,
+            with_payload=True,
+        )
+        pontos.extend(batch)
+        if offset is None:
+            break
+    return pontos
+
+def memoria_estimada(profile: str, n: int, dim: int, payload_bytes: int) -> dict:
+    config = STORAGE_PROFILES[profile]
+    originais = n * dim * 4
+    quantizados = {"scalar": n * dim, "binary": n * dim // 8}.get(config["quantization"], 0)
+    grafo = n * HNSW_M * 2 * 8
+    ram = grafo + quantizados
+    ram += 0 if config["on_disk_vectors"] else originais
+    ram += 0 if config["on_disk_payload"] else payload_bytes
+    disco = originais + payload_bytes
+    return {"ram_mb": round(ram / 2**20, 1), "disco_mb": round(disco / 2**20, 1)}
+
+def aguardar_green(collection: str):
+    while qdrant.get_collection(collection).status != models.CollectionStatus.GREEN:
+        time.sleep(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de perfis de armazenamento no Qdrant")
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--pontos", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--hnsw-ef", type=int, default=128)
+    parser.add_argument("--saida", default="", help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    pontos = copiar_amostra(args.collection, args.pontos)
+    if not pontos:
+        print("⚠️ Coleção vazia.")
+        return
+
+    dim = len(pontos[0].vector)
+    payload_bytes = sum(len(json.dumps(p.payload or {}, ensure_ascii=False).encode()) for p in pontos)
+    queries = [p.vector for p in pontos[:: max(1, len(pontos) // args.queries)]][: args.queries]
+    print(f"📦 Amostra: {len(pontos)} pontos de '{args.collection}' ({dim} dims), {len(queries)} queries")
+
+    resultados = {}
+    ground_truth = None
+
+    for profile in STORAGE_PROFILES:
+        nome = f"bench_profile_{profile}"
+        qdrant.recreate_collection(
+            collection_name=nome,
+            vectors_config=vector_params(profile, size=dim),
+            quantization_config=quantization_config(profile),
+            on_disk_payload=STORAGE_PROFILES[profile]["on_disk_payload"],
+        )
+        qdrant.upload_points(
+            collection_name=nome,
+            points=[models.PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in pontos],
+            batch_size=256,
+        )
+        aguardar_green(nome)
+
+        if ground_truth is None:
+            ground_truth = [
+                {h.id for h in qdrant.search(nome, query_vector=q, limit=args.k, search_params=models.SearchParams(exact=True))}
+                for q in queries
+            ]
+
+        search_params = models.SearchParams(hnsw_ef=args.hnsw_ef, quantization=quantization_search_params(profile))
+        latencias = []
+        recalls = []
+        for q, esperados in zip(queries, ground_truth):
+            inicio = time.perf_counter()
+            hits = qdrant.search(nome, query_vector=q, limit=args.k, search_params=search_params)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if esperados:
+                recalls.append(len({h.id for h in hits} & esperados) / len(esperados))
+
+        resultados[profile] = {
+            **memoria_estimada(profile, len(pontos), dim, payload_bytes),
+            "p50_ms": round(percentil(latencias, 0.50), 2),
+            "p99_ms": round(percentil(latencias, 0.99), 2),
+            f"recall@{args.k}": round(statistics.mean(recalls), 4) if recalls else 1.0,
+        }
+        print(f"   {profile:<8} → {resultados[profile]}")
+        qdrant.delete_collection(nome)
+
+    if args.saida:
+        with open(args.saida, "w") as f:
+            json.dump(resultados, f, indent=2)
+        print(f"💾 Resultados salvos em {args.saida}")
+
+if __name__ == "__main__":
+    main()
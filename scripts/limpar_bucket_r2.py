@@ -1,36 +1,41 @@
-import boto3
-import os
-from dotenv import load_dotenv
+# Apaga thumbnails do bucket R2 — listagem paginada e delete_objects em lotes de 1000, em paralelo.
+#
+# Uso:
+#   python -m scripts.limpar_bucket_r2                       # bucket inteiro
+#   python -m scripts.limpar_bucket_r2 --client-id minha_loja  # só products/thumbs/minha_loja/
+import argparse
+import asyncio
+from src.indexing.services.image_service import BUCKET_NAME, thumbs_prefix
+from src.indexing.services.purge_service import apagar_prefixo_r2
+from src.infra.tenant_collections import validar_client_id_purge
 
-load_dotenv()
+async def progresso(totais: dict):
+    print(f"🪣 {totais['paginas']} páginas listadas, {totais['apagados']} objetos apagados")
 
-# Configs
-BUCKET_NAME = "buscaflex-thumbs"
-ENDPOINT_URL = "https://a2cadc9639c11816e7afa11db881dddf.r2.cloudflarestorage.com"
-ACCESS_KEY = os.getenv("R2_ACCESS_KEY")
-SECRET_KEY = os.getenv("R2_SECRET_KEY")
+def main():
+    parser = argparse.ArgumentParser(description="Limpeza do bucket de thumbnails no R2")
+    parser.add_argument("--client-id", default="", help="Apaga só as imagens deste cliente")
+    args = parser.parse_args()
+    if args.client_id:
+        try:
+            validar_client_id_purge(args.client_id)
+        except ValueError as e:
+            raise SystemExit(f"❌ {e}")
 
-# Cliente R2
-s3 = boto3.client(
-    "s3",
-    region_name="auto",
-    endpoint_url=ENDPOINT_URL,
-    aws_access_key_id=ACCESS_KEY,
-    aws_secret_access_key=SECRET_KEY,
-)
+    prefix = thumbs_prefix(args.client_id) if args.client_id else ""
+    alvo = f"'{BUCKET_NAME}/{prefix}'" if prefix else f"TODOS os arquivos do bucket '{BUCKET_NAME}'"
 
-# Confirmação antes de apagar tudo
-confirm = input(f"⚠️ Isso vai apagar TODOS os arquivos do bucket '{BUCKET_NAME}'. Tem certeza? (s/n): ")
-if confirm.strip().lower() != "s":
-    print("❎ Cancelado.")
-    exit()
+    # Confirmação antes de apagar
+    confirm = input(f"⚠️ Isso vai apagar {alvo}. Tem certeza? (s/n): ")
+    if confirm.strip().lower() != "s":
+        print("❎ Cancelado.")
+        return
 
-# Lista e apaga todos os objetos
-response = s3.list_objects_v2(Bucket=BUCKET_NAME)
-if "Contents" in response:
-    for obj in response["Contents"]:
-        print(f"❌ Deletando: {obj['Key']}")
-        s3.delete_object(Bucket=BUCKET_NAME, Key=obj["Key"])
-    print("✅ Todos os objetos foram deletados.")
-else:
-    print("ℹ️ Bucket vazio.")
+    totais = asyncio.run(apagar_prefixo_r2(prefix, progresso))
+    if totais["apagados"] or totais["erros"]:
+        print(f"✅ {totais['apagados']} objetos deletados ({totais['erros']} erros).")
+    else:
+        print("ℹ️ Nada para apagar.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Move coleções por tenant para a coleção compartilhada (QDRANT_SHARED_COLLECTION),
+# gravando client_id no payload. Depois de migrar, rode a API com QDRANT_STORAGE_MODE=shared.
+#
+# Uso:
+#   python -m scripts.migrar_colecao_compartilhada                      # todas as coleções
+#   python -m scripts.migrar_colecao_compartilhada --clientes loja_a,loja_b --remover-origem
+import argparse
+import time
+from qdrant_client import models
+from src.config import QDRANT_SHARED_COLLECTION
+from src.infra.qdrant_client import get_qdrant
+from src.indexing.services.indexing import create_collection_if_not_exists, create_payload_indexes
+
+qdrant = get_qdrant()
+
+def migrar_tenant(client_id: str, batch_size: int) -> int:
+    total = 0
+    offset = None
+    while True:
+        pontos, offset = qdrant.scroll(
+            collection_name=client_id,
+            limit=batch_size,
+            offset=offset,
+            with_vectors=True,
+            with_payload=True,
+        )
+        if not pontos:
+            break
+
+        qdrant.upsert(
+            collection_name=QDRANT_SHARED_COLLECTION,
+            points=[
+                models.PointStruct(id=p.id, vector=p.vector, payload={**(p.payload or {}), "client_id": client_id})
+                for p in pontos
+            ],
+            wait=True,
+        )
+        total += len(pontos)
+        print(f"\r   🔁 {client_id}: {total} pontos", end="", flush=True)
+
+        if offset is None:
+            break
+    print()
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Migração para a coleção compartilhada multi-tenant")
+    parser.add_argument("--clientes", default="", help="client_ids separados por vírgula (padrão: todas as coleções)")
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--remover-origem", action="store_true", help="Apaga a coleção do tenant após migrar")
+    args = parser.parse_args()
+
+    existentes = [c.name for c in qdrant.get_collections().collections]
+    if args.clientes:
+        clientes = [c.strip() for c in args.clientes.split(",") if c.strip()]
+    else:
+        clientes = [c for c in existentes if c != QDRANT_SHARED_COLLECTION]
+
+    create_collection_if_not_exists(QDRANT_SHARED_COLLECTION)
+    create_payload_indexes(QDRANT_SHARED_COLLECTION)
+
+    inicio = time.perf_counter()
+    for client_id in clientes:
+        if client_id not in existentes:
+            print(f"⚠️ Coleção '{client_id}' não existe — ignorada.")
+            continue
+
+        origem = qdrant.count(collection_name=client_id, exact=True).count
+        migrados = migrar_tenant(client_id, args.batch_size)
+        destino = qdrant.count(
+            collection_name=QDRANT_SHARED_COLLECTION,
+            count_filter=models.Filter(must=[models.FieldCondition(key="client_id", match=models.MatchValue(value=client_id))]),
+            exact=True,
+        ).count
+        print(f"✅ {client_id}: {migrados}/{origem} pontos migrados ({destino} na coleção compartilhada)")
+
+        if args.remover_origem and destino >= origem:
+            qdrant.delete_collection(client_id)
+            print(f"🧨 Coleção '{client_id}' removida.")
+
+    print(f"🏁 Migração concluída em {time.perf_counter() - inicio:.1f}s")
+
+if __name__ == "__main__":
+    main()
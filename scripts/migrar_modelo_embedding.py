@@ -0,0 +1,29 @@
+# Re-embeda uma coleção com outro modelo do registro (src/infra/embedding_models.py) numa
+# coleção versionada e troca o alias ao final; a busca segue na coleção antiga até lá.
+#
+# Uso:
+#   python -m scripts.migrar_modelo_embedding --collection minha_loja --model multilingual-mpnet-v1
+#   python -m scripts.migrar_modelo_embedding --collection products_shared --model multilingual-minilm-v1 --remover-origem
+import argparse
+import asyncio
+from uuid import uuid4
+from src.config import EMBEDDING_MIGRATION_BATCH_SIZE
+from src.infra.embedding_models import EMBEDDING_MODELS
+from src.indexing.services.embedding_migration_service import migrar_modelo
+
+async def main():
+    parser = argparse.ArgumentParser(description="Migração de modelo de embedding com cut-over por alias")
+    parser.add_argument("--collection", required=True, help="Nome lógico da coleção (client_id ou a compartilhada)")
+    parser.add_argument("--model", required=True, choices=list(EMBEDDING_MODELS))
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_MIGRATION_BATCH_SIZE)
+    parser.add_argument("--remover-origem", action="store_true", help="Apaga a coleção anterior após a troca")
+    args = parser.parse_args()
+
+    job_id = f"embedding-migration-{uuid4()}"
+    print(f"🧠 Job {job_id} (progresso em /api/upload-status/{job_id})")
+    resultado = await migrar_modelo(job_id, args.collection, args.model, args.remover_origem, args.batch_size)
+    if "error" in resultado:
+        raise SystemExit(f"❌ {resultado['error']}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+# Converte uma coleção existente para outro perfil de armazenamento (default | scalar | binary)
+# e registra o perfil do tenant para as próximas indexações e para a busca.
+#
+# Uso:
+#   python -m scripts.migrar_perfil_qdrant --collection minha_loja --profile scalar
+import argparse
+import asyncio
+import time
+from src.infra.qdrant_client import get_qdrant
+from src.indexing.services.storage_profile_service import STORAGE_PROFILES, aplicar_perfil, save_storage_profile
+
+qdrant = get_qdrant()
+
+async def main():
+    parser = argparse.ArgumentParser(description="Migração de perfil de armazenamento no Qdrant")
+    parser.add_argument("--collection", required=True, help="Coleção do tenant (client_id)")
+    parser.add_argument("--profile", required=True, choices=list(STORAGE_PROFILES))
+    parser.add_argument("--aguardar", action="store_true", help="Espera a coleção voltar ao status green")
+    args = parser.parse_args()
+
+    aplicar_perfil(qdrant, args.collection, args.profile)
+    await save_storage_profile(args.collection, args.profile)
+    print(f"✅ Coleção '{args.collection}' agora usa o perfil '{args.profile}'.")
+
+    if args.aguardar:
+        inicio = time.perf_counter()
+        while qdrant.get_collection(args.collection).status != "green":
+            print(f"\r⏳ Otimizando segmentos... {time.perf_counter() - inicio:.0f}s", end="", flush=True)
+            await asyncio.sleep(2)
+        print(f"\r✅ Coleção otimizada em {time.perf_counter() - inicio:.0f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
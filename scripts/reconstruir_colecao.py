@@ -0,0 +1,115 @@
+# Recarrega uma coleção do Qdrant a partir do arquivo de embeddings (EMBEDDING_ARCHIVE_DIR), sem chamar
+# o microserviço de embedding: troca de perfil/quantização/HNSW, migração para a coleção compartilhada
+# ou recuperação de uma coleção perdida.
+#
+# Uso:
+#   python -m scripts.reconstruir_colecao --clientes minha_loja --destino minha_loja__v2 --alias minha_loja
+#   python -m scripts.reconstruir_colecao --destino products_shared                  # todos os tenants do arquivo
+#   python -m scripts.reconstruir_colecao --clientes minha_loja --destino minha_loja__scalar --profile scalar --compactar
+import argparse
+import asyncio
+import time
+from qdrant_client import models
+from src.config import QDRANT_SHARED_COLLECTION
+from src.infra.embedding_models import get_model_spec
+from src.infra.qdrant_client import get_qdrant
+from src.infra.tenant_collections import SHARED_HNSW_CONFIG, collection_for
+from src.indexing.services.embedding_archive_service import compactar, diretorio_arquivo, iterar_pontos, listar_tenants
+from src.indexing.services.embedding_model_service import get_collection_model, set_collection_model, trocar_alias
+from src.indexing.services.indexing import create_payload_indexes
+from src.indexing.services.storage_profile_service import (
+    STORAGE_PROFILES, get_storage_profile, quantization_config, vector_params
+)
+from src.search.services.catalog_version_service import bump_catalog_version
+
+qdrant = get_qdrant()
+
+INDEXING_THRESHOLD = 20000  # padrão do Qdrant, restaurado depois da carga
+
+def criar_destino(destino: str, nome_logico: str, profile: str, model_id: str) -> bool:
+    if qdrant.collection_exists(destino):
+        return False
+    qdrant.create_collection(
+        collection_name=destino,
+        vectors_config=vector_params(profile, size=get_model_spec(model_id)["size"]),
+        quantization_config=quantization_config(profile),
+        on_disk_payload=STORAGE_PROFILES[profile]["on_disk_payload"],
+        hnsw_config=SHARED_HNSW_CONFIG if nome_logico == QDRANT_SHARED_COLLECTION else None,
+        # HNSW só é construído depois da carga: upload em velocidade de disco
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0),
+    )
+    create_payload_indexes(destino)
+    return True
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rebuild de coleção a partir do arquivo de embeddings")
+    parser.add_argument("--clientes", default="", help="client_ids separados por vírgula (padrão: todos do arquivo)")
+    parser.add_argument("--destino", required=True, help="Coleção a carregar (criada se não existir)")
+    parser.add_argument("--alias", default=None, help="Nome lógico a apontar para o destino ao final (ex: o client_id)")
+    parser.add_argument("--model", default=None, help="Modelo do arquivo a usar (padrão: o da coleção atual)")
+    parser.add_argument("--profile", default=None, choices=list(STORAGE_PROFILES), help="Perfil da coleção nova")
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--parallel", type=int, default=2, help="Processos de upload em paralelo")
+    parser.add_argument("--compactar", action="store_true", help="Compacta os segmentos do arquivo antes de carregar")
+    args = parser.parse_args()
+
+    clientes = [c.strip() for c in args.clientes.split(",") if c.strip()] or listar_tenants()
+    if not clientes:
+        raise SystemExit("❌ Nenhum tenant no arquivo de embeddings")
+
+    nome_logico = args.alias or args.destino
+    modelos = {c: args.model or await get_collection_model(collection_for(c)) for c in clientes}
+    if len(set(modelos.values())) > 1:
+        raise SystemExit(f"❌ Tenants com modelos diferentes não cabem numa coleção: {modelos} (use --model)")
+    model_id = next(iter(modelos.values()))
+
+    profile = args.profile or await get_storage_profile(nome_logico)
+    criada = criar_destino(args.destino, nome_logico, profile, model_id)
+    print(f"🧱 Destino '{args.destino}' ({'criado' if criada else 'existente'}, perfil '{profile}', modelo '{model_id}')")
+
+    inicio = time.perf_counter()
+    total = 0
+    for client_id in clientes:
+        if args.compactar and compactar(client_id, model_id) is None:
+            raise SystemExit(f"❌ Outra compactação do arquivo de '{client_id}' está em andamento")
+
+        carregados = 0
+        for ids, vetores, _, payloads, _ in iterar_pontos(diretorio_arquivo(client_id, model_id), batch_size=args.batch_size * 10):
+            for payload in payloads:
+                payload.setdefault("client_id", client_id)
+            qdrant.upload_collection(
+                collection_name=args.destino,
+                vectors=vetores,
+                payload=payloads,
+                ids=ids,
+                batch_size=args.batch_size,
+                parallel=args.parallel,
+                wait=True,
+            )
+            carregados += len(ids)
+            print(f"\r   🔁 {client_id}: {carregados} pontos", end="", flush=True)
+        print()
+        if not carregados:
+            print(f"⚠️ Nada no arquivo de '{client_id}' para o modelo '{model_id}'")
+        total += carregados
+
+    if criada:
+        qdrant.update_collection(
+            collection_name=args.destino,
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=INDEXING_THRESHOLD),
+        )
+
+    print(f"✅ {total} pontos carregados em {time.perf_counter() - inicio:.1f}s (sem re-embedding)")
+
+    if criada:
+        await set_collection_model(args.destino, model_id)
+
+    if args.alias:
+        anterior = await trocar_alias(args.alias, args.destino)
+        await set_collection_model(args.alias, model_id)
+        for client_id in clientes:
+            await bump_catalog_version(client_id)
+        print(f"🔀 '{args.alias}' agora aponta para '{args.destino}' (antes: '{anterior}')")
+
+if __name__ == "__main__":
+    asyncio.run(main())
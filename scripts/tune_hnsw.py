@@ -0,0 +1,126 @@
+# Calibra hnsw_ef / busca exata por tenant medindo recall@k contra a busca exata
+# e latência p50/p99 para cada ef. O resultado é salvo em Redis e lido pelo autocomplete.
+#
+# Uso:
+#   python -m scripts.tune_hnsw --client-id minha_loja
+#   python -m scripts.tune_hnsw --client-id minha_loja --queries "fone,tenis" --recall-alvo 0.98 --dry-run
+import argparse
+import asyncio
+import statistics
+import time
+from qdrant_client.http.models import SearchParams
+from src.infra.embedding_client import encode_text
+from src.infra.qdrant_client import get_qdrant
+from src.infra.tenant_collections import collection_for, tenant_filter
+from src.search.services.search_params_service import DEFAULT_SEARCH_PARAMS, save_search_params
+
+qdrant = get_qdrant()
+
+EF_CANDIDATOS = [16, 32, 64, 96, 128, 192, 256]
+
+def percentil(valores: list[float], p: float) -> float:
+    ordenados = sorted(valores)
+    idx = min(len(ordenados) - 1, max(0, round(p * (len(ordenados) - 1))))
+    return ordenados[idx]
+
+def amostrar_vetores(client_id: str, n: int) -> list:
+    # Sem queries reais, usa vetores de produtos do próprio catálogo como consulta
+    points, _ = qdrant.scroll(
+        collection_name=collection_for(client_id),
+        scroll_filter=tenant_filter(client_id),
+        limit=n,
+        with_vectors=True,
+        with_payload=False,
+    )
+    return [p.vector for p in points if p.vector]
+
+def buscar_ids(client_id: str, vector, k: int, search_params: SearchParams, threshold: float) -> tuple[list, float]:
+    inicio = time.perf_counter()
+    result = qdrant.search(
+        collection_name=collection_for(client_id),
+        query_vector=vector,
+        query_filter=tenant_filter(client_id),
+        limit=k,
+        with_payload=False,
+        search_params=search_params,
+        score_threshold=threshold,
+    )
+    return [p.id for p in result], (time.perf_counter() - inicio) * 1000
+
+def avaliar(client_id: str, vectors: list, k: int, threshold: float, ground_truth: list, search_params: SearchParams) -> dict:
+    recalls = []
+    latencias = []
+    for vector, esperados in zip(vectors, ground_truth):
+        ids, ms = buscar_ids(client_id, vector, k, search_params, threshold)
+        latencias.append(ms)
+        if esperados:
+            recalls.append(len(set(ids) & set(esperados)) / len(esperados))
+    return {
+        "recall": round(statistics.mean(recalls), 4) if recalls else 1.0,
+        "p50_ms": round(percentil(latencias, 0.50), 2),
+        "p99_ms": round(percentil(latencias, 0.99), 2),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Tuning de HNSW ef por tenant")
+    parser.add_argument("--client-id", required=True, help="Tenant a calibrar")
+    parser.add_argument("--queries", default="", help="Queries separadas por vírgula (senão amostra vetores do catálogo)")
+    parser.add_argument("--amostras", type=int, default=200)
+    parser.add_argument("--k", type=int, default=DEFAULT_SEARCH_PARAMS["limit"])
+    parser.add_argument("--recall-alvo", type=float, default=0.95)
+    parser.add_argument("--score-threshold", type=float, default=DEFAULT_SEARCH_PARAMS["score_threshold"])
+    parser.add_argument("--exact-max-points", type=int, default=5000, help="Abaixo disso, usa busca exata")
+    parser.add_argument("--use-min-score", action="store_true", help="Filtra hits pelo score mínimo por tamanho de query")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.queries:
+        vectors = [await encode_text(q.strip().lower()) for q in args.queries.split(",") if q.strip()]
+    else:
+        vectors = amostrar_vetores(args.client_id, args.amostras)
+
+    if not vectors:
+        print("⚠️ Nenhum vetor para avaliar.")
+        return
+
+    total_pontos = qdrant.count(
+        collection_name=collection_for(args.client_id),
+        count_filter=tenant_filter(args.client_id),
+        exact=True,
+    ).count
+    print(f"📦 Tenant '{args.client_id}': {total_pontos} pontos, {len(vectors)} queries, k={args.k}")
+
+    exata = SearchParams(exact=True)
+    ground_truth = [buscar_ids(args.client_id, v, args.k, exata, args.score_threshold)[0] for v in vectors]
+    resultado_exato = avaliar(args.client_id, vectors, args.k, args.score_threshold, ground_truth, exata)
+    print(f"   exact=True → {resultado_exato}")
+
+    escolhido = None
+    for ef in EF_CANDIDATOS:
+        resultado = avaliar(args.client_id, vectors, args.k, args.score_threshold, ground_truth, SearchParams(hnsw_ef=ef, exact=False))
+        print(f"   hnsw_ef={ef:<4} → {resultado}")
+        if escolhido is None and resultado["recall"] >= args.recall_alvo:
+            escolhido = ef
+
+    params = {
+        "limit": args.k,
+        "score_threshold": args.score_threshold,
+        "use_min_score": args.use_min_score,
+    }
+    if total_pontos <= args.exact_max_points:
+        params.update({"exact": True, "hnsw_ef": DEFAULT_SEARCH_PARAMS["hnsw_ef"]})
+        print("✅ Coleção pequena — usando busca exata")
+    else:
+        params.update({"exact": False, "hnsw_ef": escolhido or EF_CANDIDATOS[-1]})
+        if escolhido is None:
+            print(f"⚠️ Nenhum ef atingiu recall {args.recall_alvo} — usando o maior candidato")
+        print(f"✅ Menor ef com recall ≥ {args.recall_alvo}: {params['hnsw_ef']}")
+
+    if args.dry_run:
+        print(f"🧪 Dry-run — parâmetros não salvos: {params}")
+        return
+
+    await save_search_params(args.client_id, params)
+
+if __name__ == "__main__":
+    asyncio.run(main())
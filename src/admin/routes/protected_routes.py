@@ -1,15 +1,29 @@
 # src/routes/protected_routes.py
-from fastapi import APIRouter, HTTPException, Depends
+from uuid import uuid4
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Query, Request
+from fastapi.responses import PlainTextResponse
 from firebase_admin import firestore
 from src.middleware.auth_middleware import verify_token
-from qdrant_client import QdrantClient
+from src.infra.firestore_client import get_config_doc, set_doc, update_doc
+from src.infra.qdrant_client import get_async_qdrant
+from src.utils.profiler import perfilar
+from src.utils.rate_limit import limitar_tenant
+from src.admin.services.widget_config_service import bump_widget_config_version
+from src.admin.services.relatorio_service import listar_erros, resumo_erros
+from src.indexing.schemas.product_update_schema import PartialUpdateRequest
+from src.indexing.services.partial_update_service import atualizar_produtos_parcial
+from src.indexing.services.product_sync_service import ler_itens, remover_produtos, upsert_produtos
+from src.indexing.services.progress_service import atualizar_status
+from src.indexing.schemas.embedding_schema import EmbeddingMigrationRequest
+from src.indexing.schemas.feed_schema import FeedRegistration
+from src.indexing.services.feed_url_service import listar_feeds, registrar_feed, remover_feed
+from src.indexing.services.embedding_migration_service import migrar_modelo
+from src.indexing.services.embedding_model_service import listar_modelos_colecoes
+from src.infra.embedding_models import EMBEDDING_MODELS
+from src.config import EMBEDDING_DEFAULT_MODEL
 
 router_protected = APIRouter()
 
-from src.config import (
-    QDRANT_URL, QDRANT_API_KEY
-)
-
 @router_protected.get(
     "/users/me",
     summary="Perfil do usuário autenticado",
@@ -34,21 +48,15 @@ async def get_profile(user=Depends(verify_token)):
     description="Consulta as configurações salvas no Firestore vinculadas ao clientId do usuário autenticado."
 )
 async def get_admin_configs(user=Depends(verify_token)):
-    db = firestore.client()
-
-    uid = user["uid"]
-    user_doc = db.collection("users").document(uid).get()
-
-    if not user_doc.exists:
+    if not user.get("user_exists"):
         return {"error": "Usuário não encontrado"}
 
-    client_id = user_doc.to_dict().get("clientId")
-    config_doc = db.collection("configs").document(client_id).get()
+    config = await get_config_doc(user.get("clientId"))
 
-    if not config_doc.exists:
+    if config is None:
         return {"error": "Configuração não encontrada"}
 
-    return config_doc.to_dict()
+    return config
 
 @router_protected.post(
     "/admin/save-configs",
@@ -56,16 +64,12 @@ async def get_admin_configs(user=Depends(verify_token)):
     description="Permite ao usuário autenticado salvar ou atualizar suas configurações personalizadas no Firestore, vinculadas ao seu clientId."
 )
 async def save_admin_configs(payload: dict, user=Depends(verify_token)):
-    db = firestore.client()
-
-    uid = user["uid"]
-    user_doc = db.collection("users").document(uid).get()
-
-    if not user_doc.exists:
+    if not user.get("user_exists"):
         return {"error": "Usuário não encontrado"}
 
-    client_id = user_doc.to_dict().get("clientId")
-    db.collection("configs").document(client_id).set(payload, merge=True)
+    client_id = user.get("clientId")
+    await set_doc("configs", client_id, payload, merge=True)
+    await bump_widget_config_version(client_id)
 
     return {"status": "Configuração salva com sucesso"}
 
@@ -78,8 +82,7 @@ async def listar_collections(user=Depends(verify_token)):
     if user.get("role") != "superadmin":
         raise HTTPException(status_code=403, detail="Acesso negado — esta operação é restrita a superadministradores.")
 
-    client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-    collections = client.get_collections()
+    collections = await get_async_qdrant().get_collections()
     return collections.model_dump()
 
 @router_protected.get(
@@ -91,8 +94,7 @@ async def listar_nomes_collections(user=Depends(verify_token)):
     if user.get("role") != "superadmin":
         raise HTTPException(status_code=403, detail="Acesso negado — esta operação é restrita a superadministradores.")
 
-    client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-    collections = client.get_collections()
+    collections = await get_async_qdrant().get_collections()
     return [c.name for c in collections.collections]
 
 @router_protected.get(
@@ -104,10 +106,56 @@ async def detalhes_collection(collection_name: str, user=Depends(verify_token)):
     if user.get("role") != "superadmin":
         raise HTTPException(status_code=403, detail="Acesso negado — esta operação é restrita a superadministradores.")
 
-    client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-    info = client.get_collection(collection_name=collection_name)
+    info = await get_async_qdrant().get_collection(collection_name=collection_name)
     return info.model_dump()
 
+@router_protected.get(
+    "/superadmin/profile",
+    summary="Profiling por amostragem do worker",
+    description="Amostra as pilhas do worker que atendeu a request por N segundos e retorna o perfil no formato folded (flamegraph.pl / speedscope).",
+    response_class=PlainTextResponse,
+)
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=60),
+    interval_ms: float = Query(5, ge=1, le=100),
+    user=Depends(verify_token),
+):
+    if user.get("role") != "superadmin":
+        raise HTTPException(status_code=403, detail="Acesso negado — esta operação é restrita a superadministradores.")
+
+    try:
+        return await perfilar(seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router_protected.get(
+    "/superadmin/embedding-models",
+    summary="Modelos de embedding",
+    description="Lista os modelos do registro e o modelo com que cada coleção foi indexada."
+)
+async def listar_modelos_embedding(user=Depends(verify_token)):
+    if user.get("role") != "superadmin":
+        raise HTTPException(status_code=403, detail="Acesso negado — esta operação é restrita a superadministradores.")
+
+    return {"default": EMBEDDING_DEFAULT_MODEL, "models": EMBEDDING_MODELS, "collections": await listar_modelos_colecoes()}
+
+@router_protected.post(
+    "/superadmin/embedding-migrations",
+    summary="Migrar coleção para outro modelo de embedding",
+    description="Re-embeda a coleção em background numa nova coleção versionada e troca o alias ao final (atômico a partir da segunda migração da coleção). Acompanhe por /upload-status/{job_id}."
+)
+async def migrar_modelo_embedding(payload: EmbeddingMigrationRequest, background_tasks: BackgroundTasks, user=Depends(verify_token)):
+    if user.get("role") != "superadmin":
+        raise HTTPException(status_code=403, detail="Acesso negado — esta operação é restrita a superadministradores.")
+    if payload.model not in EMBEDDING_MODELS:
+        raise HTTPException(status_code=400, detail=f"Modelo desconhecido (opções: {list(EMBEDDING_MODELS)})")
+
+    job_id = str(uuid4())
+    await atualizar_status(job_id, "processing", f"🧠 Migração de '{payload.collection}' para '{payload.model}' agendada", 0)
+    background_tasks.add_task(migrar_modelo, job_id, payload.collection, payload.model, payload.delete_source)
+
+    return {"job_id": job_id, "status": "processing", "status_url": f"/api/upload-status/{job_id}"}
+
 # Constante de fallback se não houver nada salvo ainda
 DEFAULT_AUTOCOMPLETE_CONFIG = {
     "draft": {
@@ -128,26 +176,22 @@ DEFAULT_AUTOCOMPLETE_CONFIG = {
 
 
 def _get_client_id(user):
-    db = firestore.client()
-    uid = user["uid"]
-    user_doc = db.collection("users").document(uid).get()
-
-    if not user_doc.exists:
+    # verify_token já mesclou users/{uid} (com cache) no usuário — sem nova leitura no Firestore
+    if not user.get("user_exists"):
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
-    return user_doc.to_dict().get("clientId")
+    return user.get("clientId")
 
 #TODO refinar com timestamps/versionamento no futuro
 # GET Draft config
 @router_protected.get("/admin/autocomplete/draft")
 async def get_autocomplete_draft(user=Depends(verify_token)):
-    db = firestore.client()
     client_id = _get_client_id(user)
 
-    doc = db.collection("configs").document(client_id).get()
+    config = await get_config_doc(client_id)
 
-    if doc.exists:
-        data = doc.to_dict().get("autocomplete", DEFAULT_AUTOCOMPLETE_CONFIG)
+    if config is not None:
+        data = config.get("autocomplete", DEFAULT_AUTOCOMPLETE_CONFIG)
     else:
         data = DEFAULT_AUTOCOMPLETE_CONFIG
 
@@ -156,10 +200,9 @@ async def get_autocomplete_draft(user=Depends(verify_token)):
 # POST Salvar Draft
 @router_protected.post("/admin/autocomplete/draft")
 async def save_autocomplete_draft(payload: dict, user=Depends(verify_token)):
-    db = firestore.client()
     client_id = _get_client_id(user)
 
-    db.collection("configs").document(client_id).set({
+    await set_doc("configs", client_id, {
         "autocomplete": {
             "draft": payload
         }
@@ -170,31 +213,29 @@ async def save_autocomplete_draft(payload: dict, user=Depends(verify_token)):
 # 🚀 POST Publicar (move draft para published)
 @router_protected.post("/admin/autocomplete/publish")
 async def publish_autocomplete(user=Depends(verify_token)):
-    db = firestore.client()
     client_id = _get_client_id(user)
 
-    ref = db.collection("configs").document(client_id)
-    doc = ref.get()
+    config = await get_config_doc(client_id)
 
-    if not doc.exists:
+    if config is None:
         raise HTTPException(status_code=404, detail="Configuração não encontrada")
 
-    draft = doc.to_dict().get("autocomplete", {}).get("draft", {})
+    draft = config.get("autocomplete", {}).get("draft", {})
 
-    ref.set({
+    await set_doc("configs", client_id, {
         "autocomplete.published": draft
     }, merge=True)
+    await bump_widget_config_version(client_id)
 
     return {"status": "Draft publicado com sucesso"}
 
 # 🧹 POST Resetar configuração para default
 @router_protected.post("/admin/autocomplete/reset")
 async def reset_autocomplete_config(user=Depends(verify_token)):
-    db = firestore.client()
     client_id = _get_client_id(user)
 
     # Apaga o campo draft dentro do objeto autocomplete
-    db.collection("configs").document(client_id).update({
+    await update_doc("configs", client_id, {
         "autocomplete.draft": firestore.DELETE_FIELD
     })
 
@@ -207,11 +248,129 @@ async def enable_autocomplete(payload: dict, user=Depends(verify_token)):
     if is_enabled not in [True, False]:
         raise HTTPException(status_code=400, detail="Valor inválido para is_enabled")
 
-    db = firestore.client()
     client_id = _get_client_id(user)
 
-    db.collection("configs").document(client_id).set({
+    await set_doc("configs", client_id, {
         "autocomplete.is_enabled": is_enabled
     }, merge=True)
+    await bump_widget_config_version(client_id)
 
     return {"status": f"Autocomplete {'ativado' if is_enabled else 'desativado'} com sucesso"}
+
+# 📝 GET Relatório de erros de um upload (paginado pelo cursor do stream)
+@router_protected.get(
+    "/admin/uploads/{upload_id}/errors",
+    summary="Relatório de erros do upload",
+    description="Retorna as contagens por motivo e uma página dos produtos rejeitados. Use `next_cursor` para buscar a próxima página. Acima de ERROR_REPORT_MAX_ENTRIES itens só os mais recentes ficam no relatório: `truncado`/`omitidos` dizem quantos faltam em relação a `total`."
+)
+async def listar_erros_upload(
+    upload_id: str,
+    cursor: str | None = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    user=Depends(verify_token),
+):
+    resumo = await resumo_erros(upload_id)
+    if resumo is None:
+        raise HTTPException(status_code=404, detail="Nenhum erro registrado para este upload (ou o relatório expirou)")
+
+    if user.get("role") != "superadmin" and resumo["client_id"] != _get_client_id(user):
+        raise HTTPException(status_code=403, detail="Acesso negado a este relatório")
+
+    pagina = await listar_erros(upload_id, cursor=cursor, limit=limit)
+    return {**resumo, **pagina}
+
+# 💸 PATCH Atualização parcial de preço/estoque (sem reprocessar imagem nem embedding)
+@router_protected.patch(
+    "/admin/products",
+    summary="Atualizar preço/estoque em lote",
+    description="Aplica alterações de preço e estoque a milhares de produtos por chamada, identificados pela chave do produto (id/SKU ou URL). Invalida o cache do autocomplete do cliente."
+)
+async def atualizar_produtos(payload: PartialUpdateRequest, user=Depends(verify_token)):
+    client_id = _get_client_id(user)
+    alteracoes = [u.model_dump(exclude_none=True) for u in payload.updates]
+    return await atualizar_produtos_parcial(client_id, alteracoes)
+
+# 🔄 PUT Upsert incremental de produtos (webhook): NDJSON, objeto ou lista JSON
+@router_protected.put(
+    "/admin/products",
+    summary="Inserir/atualizar produtos",
+    description="Indexa só os produtos enviados (validação, imagem e embedding), sobrescrevendo os existentes pela chave (id/SKU ou URL). Processa em background; acompanhe por /upload-status/{upload_id}."
+)
+async def upsert_produtos_route(request: Request, background_tasks: BackgroundTasks, user=Depends(verify_token)):
+    client_id = _get_client_id(user)
+    try:
+        produtos = ler_itens(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    upload_id = str(uuid4())
+    await atualizar_status(upload_id, "processing", f"📦 {len(produtos)} produtos recebidos", 5)
+    background_tasks.add_task(upsert_produtos, produtos, client_id, upload_id)
+
+    return {
+        "upload_id": upload_id,
+        "status": "processing",
+        "recebidos": len(produtos),
+        "status_url": f"/api/upload-status/{upload_id}",
+        "errors_url": f"/api/admin/uploads/{upload_id}/errors",
+    }
+
+# 🗑️ POST Remoção em lote (NDJSON/JSON com chaves ou produtos)
+@router_protected.post(
+    "/admin/products/delete",
+    summary="Remover produtos em lote",
+    description="Remove os produtos informados (chaves, {\"key\": ...} ou produtos com id/url) do Qdrant e apaga suas thumbnails no R2."
+)
+async def remover_produtos_route(request: Request, user=Depends(verify_token)):
+    client_id = _get_client_id(user)
+    try:
+        itens = ler_itens(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return await remover_produtos(itens, client_id)
+
+# 🗑️ DELETE Remoção de um produto pela chave
+@router_protected.delete(
+    "/admin/products/{key:path}",
+    summary="Remover produto",
+    description="Remove um produto pela chave (id/SKU ou URL) e apaga sua thumbnail no R2."
+)
+async def remover_produto_route(key: str, user=Depends(verify_token)):
+    resultado = await remover_produtos([key], _get_client_id(user))
+    if not resultado["removidos"]:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    return resultado
+
+# 📡 Feeds do cliente autenticado para sincronização periódica (o client_id vem do token, nunca do body)
+@router_protected.post(
+    "/feeds",
+    summary="Registrar feed para sincronização",
+    description="Registra uma URL de feed do cliente autenticado para ser verificada periodicamente; só reindexa quando o feed muda (ETag/Last-Modified/conteúdo)."
+)
+async def registrar_feed_route(payload: FeedRegistration, request: Request, user=Depends(verify_token)):
+    client_id = _get_client_id(user)
+    await limitar_tenant(request, client_id)
+    return await registrar_feed(payload.feed_url, client_id, payload.interval_minutes)
+
+@router_protected.get(
+    "/feeds",
+    summary="Listar feeds registrados",
+    description="Lista os feeds do cliente autenticado. Superadmin vê todos ou filtra por `client_id`."
+)
+async def listar_feeds_route(client_id: str | None = Query(None), user=Depends(verify_token)):
+    if user.get("role") != "superadmin":
+        client_id = _get_client_id(user)
+    return await listar_feeds(client_id)
+
+@router_protected.delete(
+    "/feeds",
+    summary="Remover feed registrado",
+    description="Remove a URL de feed da sincronização periódica do cliente autenticado."
+)
+async def remover_feed_route(request: Request, feed_url: str = Query(...), user=Depends(verify_token)):
+    client_id = _get_client_id(user)
+    await limitar_tenant(request, client_id)
+    if not await remover_feed(feed_url, client_id):
+        raise HTTPException(status_code=404, detail="Feed não registrado")
+    return {"status": "removed", "feed_url": feed_url, "client_id": client_id}
@@ -1,8 +1,94 @@
-import csv
-from typing import List, Dict, Tuple  # já tem, só confirmar
-
-def salvar_relatorio_erros(erros: List[Dict], caminho="report.csv"):
-    with open(caminho, mode="w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["produto", "motivo", "dados"])
-        writer.writeheader()
-        writer.writerows(erros)
+import json
+import os
+from collections import Counter
+from src.infra.redis_client import redis_client
+
+# 📝 Relatório de erros por upload: cada produto rejeitado vai para um Redis Stream próprio
+# (upload:{id}:errors) em lotes, com as contagens por motivo num hash — nada fica acumulado no worker.
+# O stream guarda no máximo ~ERROR_REPORT_MAX_ENTRIES itens (os mais recentes); as contagens cobrem todos,
+# e o resumo diz quantos ficaram de fora (`truncado`/`omitidos`).
+
+ERROR_REPORT_TTL_SECONDS = int(os.getenv("ERROR_REPORT_TTL_SECONDS", str(7 * 24 * 3600)))
+ERROR_REPORT_MAX_ENTRIES = int(os.getenv("ERROR_REPORT_MAX_ENTRIES", "50000"))
+ERROR_DADOS_MAX_CHARS = 2000
+FLUSH_SIZE = 500
+
+def _stream_key(upload_id: str) -> str:
+    return f"upload:{upload_id}:errors"
+
+def _meta_key(upload_id: str) -> str:
+    return f"upload:{upload_id}:errors:meta"
+
+def _serializar(dados: dict) -> str:
+    texto = json.dumps(dados, ensure_ascii=False, default=str)
+    return texto if len(texto) <= ERROR_DADOS_MAX_CHARS else texto[:ERROR_DADOS_MAX_CHARS] + "…"
+
+def _desserializar(texto: str):
+    try:
+        return json.loads(texto)
+    except ValueError:
+        return texto  # truncado em ERROR_DADOS_MAX_CHARS
+
+class RelatorioErros:
+    """Sink de erros de um upload: buffer pequeno, descarregado no Redis a cada FLUSH_SIZE itens."""
+
+    def __init__(self, upload_id: str, client_id: str):
+        self.upload_id = upload_id
+        self.client_id = client_id
+        self.total = 0
+        self.por_motivo: Counter = Counter()
+        self._buffer: list[dict] = []
+
+    async def registrar(self, produto: str, motivo: str, dados: dict):
+        self.total += 1
+        self.por_motivo[motivo] += 1
+        self._buffer.append({"produto": produto, "motivo": motivo, "dados": _serializar(dados)})
+        if len(self._buffer) >= FLUSH_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        itens, self._buffer = self._buffer, []
+        motivos = Counter(item["motivo"] for item in itens)
+
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for item in itens:
+                pipe.xadd(_stream_key(self.upload_id), item, maxlen=ERROR_REPORT_MAX_ENTRIES, approximate=True)
+            pipe.hset(_meta_key(self.upload_id), "client_id", self.client_id)
+            pipe.hincrby(_meta_key(self.upload_id), "total", len(itens))
+            for motivo, quantidade in motivos.items():
+                pipe.hincrby(_meta_key(self.upload_id), f"motivo:{motivo}", quantidade)
+            pipe.expire(_stream_key(self.upload_id), ERROR_REPORT_TTL_SECONDS)
+            pipe.expire(_meta_key(self.upload_id), ERROR_REPORT_TTL_SECONDS)
+            await pipe.execute()
+
+async def resumo_erros(upload_id: str) -> dict | None:
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hgetall(_meta_key(upload_id))
+        pipe.xlen(_stream_key(upload_id))
+        meta, armazenados = await pipe.execute()
+    if not meta:
+        return None
+    total = int(meta.get("total", 0))
+    # MAXLEN aproximado: o número exato de itens descartados vem do tamanho real do stream
+    omitidos = max(0, total - armazenados)
+    return {
+        "client_id": meta.get("client_id"),
+        "total": total,
+        "por_motivo": {k.removeprefix("motivo:"): int(v) for k, v in meta.items() if k.startswith("motivo:")},
+        "armazenados": armazenados,
+        "truncado": omitidos > 0,
+        "omitidos": omitidos,
+    }
+
+async def listar_erros(upload_id: str, cursor: str | None = None, limit: int = 100) -> dict:
+    """Página de erros em ordem de chegada; `next_cursor` é o ID da última entrada devolvida."""
+    inicio = f"({cursor}" if cursor else "-"
+    entradas = await redis_client.xrange(_stream_key(upload_id), min=inicio, max="+", count=limit)
+
+    itens = [{"id": entry_id, **campos, "dados": _desserializar(campos.get("dados", "{}"))} for entry_id, campos in entradas]
+    return {
+        "items": itens,
+        "next_cursor": entradas[-1][0] if len(entradas) == limit else None,
+    }
@@ -1,10 +1,9 @@
 # src/services/user_service.py
-from src.infra.firestore_client import db
+from src.infra.firestore_client import get_user_doc, set_doc
 
-def create_default_user_if_not_exists(user_data):
-    doc_ref = db.collection("users").document(user_data["uid"])
-    if not doc_ref.get().exists:
-        doc_ref.set({
+async def create_default_user_if_not_exists(user_data):
+    if await get_user_doc(user_data["uid"]) is None:
+        await set_doc("users", user_data["uid"], {
             "uid": user_data["uid"],
             "email": user_data.get("email"),
             "name": user_data.get("name", "Novo Usuário"),
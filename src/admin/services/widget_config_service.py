@@ -0,0 +1,106 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from src.infra.firestore_client import get_config_doc
+from src.infra.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 🧩 Config publicada do widget, servida a cada page view das lojas.
+# Camadas: memória do processo (curta, LRU) → Redis (por versão) → Firestore (1 leitura por publicação).
+# `/admin/autocomplete/publish` e `/enable` incrementam a versão, o que invalida tudo.
+# Sem Redis o endpoint continua servindo direto do Firestore, como antes do cache.
+
+LOCAL_TTL_SECONDS = 5
+LOCAL_MAX_ENTRIES = 10000
+REDIS_TTL_SECONDS = 7 * 24 * 3600
+# client_id desconhecido (404): curto, para um tenant recém-criado aparecer logo e lixo não ficar uma semana
+NOT_FOUND_TTL_SECONDS = 60
+
+_local_cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+def _version_key(client_id: str) -> str:
+    return f"widget:config:version:{client_id}"
+
+def _config_key(client_id: str, version: int) -> str:
+    return f"widget:config:{client_id}:v{version}"
+
+def _etag(version: int, body: dict | None) -> str:
+    digest = hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+def etag_confere(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match com lista de tags, `*` ou tags fracas (`W/"..."`, comum depois de CDN/proxy)."""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return any(t == "*" or t.removeprefix("W/") == etag for t in tags)
+
+def _cache_local(client_id: str, entry: dict):
+    _local_cache[client_id] = (time.monotonic() + LOCAL_TTL_SECONDS, entry)
+    _local_cache.move_to_end(client_id)
+    while len(_local_cache) > LOCAL_MAX_ENTRIES:
+        _local_cache.popitem(last=False)
+
+async def _ler_firestore(client_id: str) -> dict | None:
+    # Sem o cache de 300 s do firestore_client: depois de um publish, outro worker não pode
+    # gravar o documento antigo no Redis sob a versão nova
+    config = await get_config_doc(client_id, fresh=True)
+    if config is None:
+        return None
+
+    autocomplete = config.get("autocomplete", {})
+    return {
+        "enabled": autocomplete.get("is_enabled", False),
+        "published": autocomplete.get("published", {})
+    }
+
+async def _ler_redis(client_id: str) -> dict:
+    version = int(await redis_client.get(_version_key(client_id)) or 0)
+    raw = await redis_client.get(_config_key(client_id, version))
+    if raw:
+        return json.loads(raw)
+
+    body = await _ler_firestore(client_id)
+    entry = {"version": version, "etag": _etag(version, body), "body": body}
+    ttl = REDIS_TTL_SECONDS if body is not None else NOT_FOUND_TTL_SECONDS
+    await redis_client.set(_config_key(client_id, version), json.dumps(entry), ex=ttl)
+    logger.info(f"🧩 Config do widget de '{client_id}' carregada do Firestore (versão {version})")
+    return entry
+
+async def get_published_config(client_id: str) -> dict:
+    """Retorna {"version", "etag", "body"}; body None quando configs/{client_id} não existe."""
+    cached = _local_cache.get(client_id)
+    if cached and cached[0] > time.monotonic():
+        _local_cache.move_to_end(client_id)
+        return cached[1]
+
+    entry = None
+    if redis_client:
+        try:
+            entry = await _ler_redis(client_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis indisponível para a config do widget de '{client_id}', lendo do Firestore: {e}")
+
+    if entry is None:
+        body = await _ler_firestore(client_id)
+        entry = {"version": 0, "etag": _etag(0, body), "body": body}
+
+    _cache_local(client_id, entry)
+    return entry
+
+async def bump_widget_config_version(client_id: str) -> int | None:
+    """Chamado depois da escrita no Firestore: sem Redis, a config já salva não pode virar erro 500."""
+    _local_cache.pop(client_id, None)
+    if not redis_client:
+        return None
+    try:
+        version = await redis_client.incr(_version_key(client_id))
+    except Exception as e:
+        # Com o Redis fora, os outros workers leem do Firestore quando o cache local (LOCAL_TTL_SECONDS) expira
+        logger.warning(f"⚠️ Redis indisponível: config do widget de '{client_id}' salva sem nova versão: {e}")
+        return None
+    logger.info(f"🧩 Config do widget de '{client_id}' agora na versão {version}")
+    return version
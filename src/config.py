@@ -1,7 +1,7 @@
 import os
+import tempfile
 import redis
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient
 
 # 🔥 Carrega variáveis de ambiente do .env
 dotenv_path = os.path.join(os.path.dirname(__file__), "..", ".env")
@@ -10,12 +10,47 @@ load_dotenv(dotenv_path)
 # Qdrant
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+# Clientes compartilhados (src/infra/qdrant_client.py): transporte, pool, timeout e retries
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() in ("1", "true", "yes")
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "10"))
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "20"))
+QDRANT_RETRIES = int(os.getenv("QDRANT_RETRIES", "2"))
 
 # Redis
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 REDIS_DB = int(os.getenv("REDIS_DB", "0"))
 
+# Uploads: gravados em blocos no diretório de spool, com limite de tamanho (bytes recebidos, já comprimidos)
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "buscaflex-uploads"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(3 * 1024 ** 3)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Feeds remotos: timeout de download e agendador de sincronização periódica
+FEED_DOWNLOAD_TIMEOUT = float(os.getenv("FEED_DOWNLOAD_TIMEOUT", "60"))
+# Bytes gravados no spool por download (já sem Content-Encoding): o Content-Length é checado antes e o total a cada bloco
+FEED_MAX_BYTES = int(os.getenv("FEED_MAX_BYTES", str(UPLOAD_MAX_BYTES)))
+FEED_SCHEDULER_ENABLED = os.getenv("FEED_SCHEDULER_ENABLED", "false").lower() in ("1", "true", "yes")
+FEED_SCHEDULER_TICK_SECONDS = int(os.getenv("FEED_SCHEDULER_TICK_SECONDS", "60"))
+
+# Microserviço de embedding
+EMBEDDING_SERVICE_URL = os.getenv("EMBEDDING_SERVICE_URL", "http://localhost:8001")
+# Modelo (ID do registro em src/infra/embedding_models.py) das coleções novas; o microserviço
+# carrega na subida os modelos de EMBEDDING_MODELS_PRELOAD e os demais sob demanda
+EMBEDDING_DEFAULT_MODEL = os.getenv("EMBEDDING_DEFAULT_MODEL", "minilm-v1")
+EMBEDDING_MODELS_PRELOAD = [m.strip() for m in os.getenv("EMBEDDING_MODELS_PRELOAD", EMBEDDING_DEFAULT_MODEL).split(",") if m.strip()]
+EMBEDDING_MIGRATION_BATCH_SIZE = int(os.getenv("EMBEDDING_MIGRATION_BATCH_SIZE", "256"))
+# Produtos por upsert/chamada de embedding na indexação
+INDEXING_BATCH_SIZE = int(os.getenv("INDEXING_BATCH_SIZE", "64"))
+
+# Arquivo de embeddings por tenant/modelo (vetores float32 .npy + textos/payloads em Parquet) para rebuilds sem re-embedding
+EMBEDDING_ARCHIVE_ENABLED = os.getenv("EMBEDDING_ARCHIVE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_ARCHIVE_DIR = os.getenv("EMBEDDING_ARCHIVE_DIR", os.path.join("data", "embedding_archive"))
+# Compactação automática ao passar de N segmentos por tenant/modelo; remoções ficam registradas por N dias
+EMBEDDING_ARCHIVE_MAX_SEGMENTS = int(os.getenv("EMBEDDING_ARCHIVE_MAX_SEGMENTS", "32"))
+EMBEDDING_ARCHIVE_TOMBSTONE_DAYS = int(os.getenv("EMBEDDING_ARCHIVE_TOMBSTONE_DAYS", "7"))
+
 # Firebase
 FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID")
 FIREBASE_PRIVATE_KEY_ID = os.getenv("FIREBASE_PRIVATE_KEY_ID")
@@ -33,6 +68,16 @@ R2_SECRET_KEY = os.getenv("R2_SECRET_KEY")
 R2_BUCKET_NAME = os.getenv("R2_BUCKET_NAME")
 R2_ENDPOINT_URL = os.getenv("R2_ENDPOINT_URL")
 CDN_DOMAIN = os.getenv("CDN_DOMAIN")
+# Lotes de delete_objects (até 1000 chaves) em paralelo durante a limpeza do bucket
+R2_DELETE_CONCURRENCY = int(os.getenv("R2_DELETE_CONCURRENCY", "4"))
+
+# Atualização parcial (preço/estoque): itens por requisição, por batch no Qdrant e batches em paralelo
+PARTIAL_UPDATE_MAX_ITEMS = int(os.getenv("PARTIAL_UPDATE_MAX_ITEMS", "50000"))
+PARTIAL_UPDATE_BATCH_SIZE = int(os.getenv("PARTIAL_UPDATE_BATCH_SIZE", "1000"))
+PARTIAL_UPDATE_CONCURRENCY = int(os.getenv("PARTIAL_UPDATE_CONCURRENCY", "8"))
+
+# Webhooks de produto (upsert/delete por item): máximo de itens por requisição
+PRODUCT_WEBHOOK_MAX_ITEMS = int(os.getenv("PRODUCT_WEBHOOK_MAX_ITEMS", "1000"))
 
 # Nome padrão da collection no Qdrant (para produtos)
 PRODUCT_CLASS = "products"
@@ -45,20 +90,31 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
-# Qdrant client singleton
-def create_qdrant_client():
-    try:
-        print(f"🔍 Conectando ao Qdrant: {QDRANT_URL}")
-        client = QdrantClient(
-            url=QDRANT_URL,
-            api_key=QDRANT_API_KEY,
-            prefer_grpc=False,
-            https=True
-        )
-        print("✅ Conectado ao Qdrant com sucesso!")
-        return client
-    except Exception as e:
-        print(f"🚨 Erro ao conectar ao Qdrant: {e}")
-        raise
-
-qdrant_client = create_qdrant_client()
+# Cache semântico do autocomplete (por tenant, em memória do processo)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_MAX_DISTANCE = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", "0.08"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "256"))
+
+# Perfil de armazenamento padrão das coleções no Qdrant (default | scalar | binary)
+QDRANT_DEFAULT_STORAGE_PROFILE = os.getenv("QDRANT_DEFAULT_STORAGE_PROFILE", "default")
+
+# Modo de armazenamento: uma coleção por tenant ("per_tenant") ou coleção compartilhada ("shared")
+QDRANT_STORAGE_MODE = os.getenv("QDRANT_STORAGE_MODE", "per_tenant")
+QDRANT_SHARED_COLLECTION = os.getenv("QDRANT_SHARED_COLLECTION", "products_shared")
+
+# Rate limit (token bucket em Redis): "taxa/s,burst" por IP e por client_id em cada endpoint
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_RULES = {
+    "/api/autocomplete": {
+        "per_ip": os.getenv("RATE_LIMIT_AUTOCOMPLETE_IP", "10,30"),
+        "per_tenant": os.getenv("RATE_LIMIT_AUTOCOMPLETE_TENANT", "500,1000"),
+    },
+    "/api/upload": {
+        "per_ip": os.getenv("RATE_LIMIT_UPLOAD_IP", "0.1,3"),
+        "per_tenant": os.getenv("RATE_LIMIT_UPLOAD_TENANT", "0.05,5"),
+    },
+    "/api/feeds": {
+        "per_ip": os.getenv("RATE_LIMIT_FEEDS_IP", "1,10"),
+        "per_tenant": os.getenv("RATE_LIMIT_FEEDS_TENANT", "0.2,10"),
+    },
+}
@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+class EmbeddingMigrationRequest(BaseModel):
+    collection: str  # nome lógico: client_id ou a coleção compartilhada
+    model: str  # ID do registro (ex: "multilingual-mpnet-v1")
+    delete_source: bool = False  # apaga a coleção anterior após o cut-over (sem ela, não há rollback)
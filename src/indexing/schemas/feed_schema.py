@@ -1,5 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class FeedURLRequest(BaseModel):
     feed_url: str
     client_id: str = "default"
+    force: bool = False  # ignora ETag/Last-Modified e reindexa mesmo sem mudanças
+
+class FeedRegistration(BaseModel):
+    # client_id vem do usuário autenticado
+    feed_url: str
+    interval_minutes: int = Field(60, ge=5)
@@ -1,3 +1,6 @@
+import math
+from uuid import NAMESPACE_URL, uuid5
+
 # Campos obrigatórios
 REQUIRED_FIELDS = [
     "title",
@@ -16,7 +19,9 @@ OPTIONAL_FIELDS = [
     "side_effects",
     "review_positive",
     "review_average",
-    "review_negative"
+    "review_negative",
+    "id",
+    "stock"
 ]
 
 ALL_FIELDS = REQUIRED_FIELDS + OPTIONAL_FIELDS
@@ -32,24 +37,105 @@ COLUMN_ALIASES = {
     "description": ["description", "desc", "product_description"],
     "composition": ["composition"],
     "uses": ["uses"],
-    "side_effects": ["side_effects"]
+    "side_effects": ["side_effects"],
+    "id": ["id", "sku", "product_id", "item_id"],
+    "stock": ["stock", "estoque", "quantity", "inventory"]
 }
 
-def detectar_e_mapear_colunas(df):
-    df.columns = [col.strip().lower() for col in df.columns]
-    original_cols = df.columns.tolist()
+def mapear_colunas(colunas: list[str]) -> tuple[dict, str | None]:
+    """Resolve os aliases só pelos nomes das colunas (schema), sem tocar nas linhas.
 
-    mapeamento = {}
+    Retorna {coluna original: nome final}: todas as colunas em minúsculas, com os aliases já trocados.
+    """
+    normalizadas = {col: col.strip().lower() for col in colunas}
+    disponiveis = set(normalizadas.values())
 
+    mapeamento = {}
     for campo_padrao, aliases in COLUMN_ALIASES.items():
         for alias in aliases:
-            if alias in original_cols:
+            if alias in disponiveis:
                 mapeamento[alias] = campo_padrao
                 break
 
     if not all(field in mapeamento.values() for field in REQUIRED_FIELDS):
-        return df, f"❌ Mapeamento incompleto. Faltam campos obrigatórios: {[f for f in REQUIRED_FIELDS if f not in mapeamento.values()]}"
+        return {}, f"❌ Mapeamento incompleto. Faltam campos obrigatórios: {[f for f in REQUIRED_FIELDS if f not in mapeamento.values()]}"
 
     print(f"✅ Mapeamento automático aplicado: {mapeamento}")
-    df = df.rename(columns=mapeamento)
-    return df, None
+    return {col: mapeamento.get(nome, nome) for col, nome in normalizadas.items()}, None
+
+def detectar_e_mapear_colunas(df):
+    renomear, erro = mapear_colunas(df.columns.tolist())
+    if erro:
+        df.columns = [col.strip().lower() for col in df.columns]
+        return df, erro
+    return df.rename(columns=renomear), None
+
+# 🔑 Chave estável do produto (id/SKU do lojista ou, na falta, a URL) e ID determinístico do ponto:
+# reindexar o mesmo produto sobrescreve o ponto, e atualizações parciais o encontram sem busca.
+def chave_produto(produto: dict) -> str:
+    for campo in ("id", "url"):
+        valor = produto.get(campo)
+        if valor is None or valor != valor:  # None / NaN do pandas
+            continue
+        valor = str(valor).strip()
+        if valor:
+            return valor
+    return ""
+
+def product_point_id(client_id: str, chave: str) -> str:
+    return str(uuid5(NAMESPACE_URL, f"buscoo:{client_id}:{chave}"))
+
+def _limpar_preco(valor) -> float:
+    return float(str(valor).replace("R$", "").replace("%", "").replace(",", ".").strip())
+
+def parse_preco(valor) -> float:
+    try:
+        return _limpar_preco(valor)
+    except (ValueError, TypeError):
+        return 0.0
+
+def converter_preco(valor) -> float:
+    """Como parse_preco, mas levanta ValueError (em vez de virar 0.0) para preço ilegível, negativo ou não finito."""
+    try:
+        preco = _limpar_preco(valor)
+    except (ValueError, TypeError):
+        raise ValueError(f"Preço inválido: {valor!r}")
+    if not math.isfinite(preco) or preco < 0:
+        raise ValueError(f"Preço inválido: {valor!r}")
+    return preco
+
+def formatar_preco(price: float) -> str:
+    return f"{price} Kč" if price > 0 else "Indisponível"
+
+def parse_estoque(valor) -> int | None:
+    try:
+        return int(float(valor))
+    except (ValueError, TypeError):
+        return None
+
+def texto_embedding(payload: dict) -> str:
+    """Texto vetorizado do produto: o gravado na indexação ou, em pontos antigos, remontado do payload."""
+    if payload.get("embedding_text"):
+        return payload["embedding_text"]
+    listas = " ".join(" ".join(payload.get(campo) or []) for campo in ("uses", "composition"))
+    return f"{payload.get('title', '')} {payload.get('brand', '')} {payload.get('category', '')} {listas}"
+
+# Campos usados pelo autocomplete — o resto do payload não precisa trafegar na busca
+SUGGEST_FIELDS = ["title", "price", "priceText", "brand", "category", "image", "url"]
+
+def montar_payload_suggest(payload: dict) -> dict:
+    """Monta o payload compacto `suggest`, já no formato servido pelo autocomplete."""
+    try:
+        price = float(payload.get("price", 0))
+    except (ValueError, TypeError):
+        price = 0.0
+
+    return {
+        "title": payload.get("title", ""),
+        "price": price,
+        "priceText": payload.get("priceText", "Indisponível"),
+        "brand": payload.get("brand", ""),
+        "category": payload.get("category", ""),
+        "image": payload.get("image", ""),
+        "url": payload.get("url", ""),
+    }
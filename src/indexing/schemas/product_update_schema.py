@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field, field_validator, model_validator
+from src.config import PARTIAL_UPDATE_MAX_ITEMS
+from src.indexing.schemas.product_schema import converter_preco
+
+class ProductPartialUpdate(BaseModel):
+    key: str = Field(..., min_length=1)  # id/SKU do produto (ou a URL, se o catálogo não tem id)
+    price: float | None = None  # aceita "R$ 12,90"; preço ilegível é 422, nunca vira 0
+    stock: int | None = None
+
+    @field_validator("price", mode="before")
+    @classmethod
+    def valida_preco(cls, valor):
+        return None if valor is None else converter_preco(valor)
+
+    @model_validator(mode="after")
+    def exige_alteracao(self):
+        if self.price is None and self.stock is None:
+            raise ValueError("Informe ao menos um campo para alterar (price, stock)")
+        return self
+
+class PartialUpdateRequest(BaseModel):
+    updates: list[ProductPartialUpdate] = Field(..., min_length=1, max_length=PARTIAL_UPDATE_MAX_ITEMS)
@@ -0,0 +1,346 @@
+import asyncio
+import fcntl
+import json
+import os
+import shutil
+import time
+from collections import defaultdict
+from uuid import uuid4
+import numpy as np
+from src.config import (
+    EMBEDDING_ARCHIVE_DIR, EMBEDDING_ARCHIVE_ENABLED, EMBEDDING_ARCHIVE_MAX_SEGMENTS, EMBEDDING_ARCHIVE_TOMBSTONE_DAYS
+)
+from src.infra.redis_client import redis_client
+from src.infra.tenant_collections import nome_seguro
+
+# 🗃️ Arquivo de embeddings por tenant e modelo: segmentos append-only com os vetores em float32 (.npy,
+# lidos via memory-map) e ID/texto/payload em Parquet. Cada linha leva a sequência do momento em que a
+# escrita aconteceu no Qdrant (não a do flush do segmento); o estado final (maior sequência vence)
+# recarrega uma coleção sem chamar o embedding.
+#
+#   {EMBEDDING_ARCHIVE_DIR}/{tenant}/.client_id
+#   {EMBEDDING_ARCHIVE_DIR}/{tenant}/{model_id}/seg-{ns}-{hex}.npy
+#   {EMBEDDING_ARCHIVE_DIR}/{tenant}/{model_id}/seg-{ns}-{hex}.parquet   ← gravado por último (marca o segmento completo)
+#
+# {tenant} é o próprio client_id quando ele é um nome seguro ([A-Za-z0-9_-]) e "h-{sha256}" caso contrário:
+# o client_id vem da requisição e nunca pode virar caminho fora de EMBEDDING_ARCHIVE_DIR.
+
+SEGMENT_ROWS = 5000
+KIND_UPSERT, KIND_PATCH, KIND_DELETE = "upsert", "patch", "delete"
+MARCADOR_TENANT = ".client_id"
+LOCK_COMPACTACAO = ".compact.lock"
+
+# 🔢 Sequência por tenant em µs de relógio que nunca recua (Redis): escritas de workers diferentes ficam
+# na ordem em que aconteceram. Devolve o primeiro de ARGV[2] números reservados.
+SEQUENCIA_LUA = """
+local atual = tonumber(redis.call('GET', KEYS[1]) or '0')
+local base = math.max(atual, tonumber(ARGV[1]))
+redis.call('SET', KEYS[1], string.format('%.0f', base + tonumber(ARGV[2])))
+return string.format('%.0f', base + 1)
+"""
+
+_script_sequencia = redis_client.register_script(SEQUENCIA_LUA) if redis_client else None
+_ultima_sequencia_local = 0
+
+def _agora_us() -> int:
+    return time.time_ns() // 1000
+
+def _sequencia_local(n: int) -> int:
+    global _ultima_sequencia_local
+    inicio = max(_ultima_sequencia_local + 1, _agora_us())
+    _ultima_sequencia_local = inicio + n - 1
+    return inicio
+
+async def proxima_sequencia(client_id: str, n: int = 1) -> int:
+    if _script_sequencia:
+        try:
+            return int(await _script_sequencia(keys=[f"embedding_archive:seq:{client_id}"], args=[_agora_us(), n]))
+        except Exception as e:
+            print(f"⚠️ Sequência do arquivo de embeddings sem Redis, usando relógio local: {e}")
+    return _sequencia_local(n)
+
+def diretorio_arquivo(client_id: str, model_id: str = None) -> str:
+    if not client_id:
+        raise ValueError("client_id obrigatório para o arquivo de embeddings")
+    raiz = os.path.realpath(EMBEDDING_ARCHIVE_DIR)
+    partes = [nome_seguro(client_id)] + ([nome_seguro(model_id)] if model_id else [])
+    diretorio = os.path.realpath(os.path.join(raiz, *partes))
+    # Defesa extra contra symlinks: o caminho resolvido precisa continuar dentro da raiz
+    if diretorio == raiz or os.path.commonpath([raiz, diretorio]) != raiz:
+        raise ValueError(f"Caminho do arquivo de embeddings fora de {EMBEDDING_ARCHIVE_DIR}: {client_id!r}")
+    return diretorio
+
+def listar_tenants() -> list[str]:
+    if not os.path.isdir(EMBEDDING_ARCHIVE_DIR):
+        return []
+    tenants = []
+    for nome in os.listdir(EMBEDDING_ARCHIVE_DIR):
+        caminho = os.path.join(EMBEDDING_ARCHIVE_DIR, nome)
+        if not os.path.isdir(caminho):
+            continue
+        marcador = os.path.join(caminho, MARCADOR_TENANT)
+        if os.path.exists(marcador):
+            with open(marcador, encoding="utf-8") as f:
+                nome = f.read().strip() or nome
+        tenants.append(nome)
+    return sorted(tenants)
+
+def _segmentos(diretorio: str) -> list[str]:
+    if not os.path.isdir(diretorio):
+        return []
+    return sorted(f.removesuffix(".parquet") for f in os.listdir(diretorio) if f.endswith(".parquet"))
+
+def _tabela(linhas: list[dict]):
+    import pyarrow as pa
+
+    return pa.table({
+        "id": pa.array([l["id"] for l in linhas], type=pa.string()),
+        "kind": pa.array([l["kind"] for l in linhas], type=pa.string()),
+        "seq": pa.array([l["seq"] for l in linhas], type=pa.int64()),
+        "row": pa.array([l.get("row", -1) for l in linhas], type=pa.int64()),
+        "embedding_text": pa.array([l.get("embedding_text") for l in linhas], type=pa.string()),
+        "payload": pa.array([l.get("payload") for l in linhas], type=pa.string()),
+    })
+
+def _gravar_segmento(diretorio: str, linhas: list[dict], vetores: list):
+    import pyarrow.parquet as pq
+
+    os.makedirs(diretorio, exist_ok=True)
+    nome = f"seg-{time.time_ns()}-{uuid4().hex[:8]}"
+    if vetores:
+        np.save(os.path.join(diretorio, f"{nome}.npy"), np.asarray(vetores, dtype=np.float32))
+
+    tmp = os.path.join(diretorio, f"{nome}.parquet.tmp")
+    pq.write_table(_tabela(linhas), tmp, compression="zstd")
+    os.replace(tmp, os.path.join(diretorio, f"{nome}.parquet"))
+
+def _marcar_tenant(client_id: str):
+    marcador = os.path.join(diretorio_arquivo(client_id), MARCADOR_TENANT)
+    if not os.path.exists(marcador):
+        with open(marcador, "w", encoding="utf-8") as f:
+            f.write(client_id)
+
+class ArquivoEmbeddings:
+    """Buffer de um tenant/modelo, gravado como segmento a cada SEGMENT_ROWS linhas e no flush final."""
+
+    def __init__(self, client_id: str, model_id: str):
+        self.client_id = client_id
+        self.model_id = model_id
+        self.diretorio = diretorio_arquivo(client_id, model_id)
+        self._linhas: list[dict] = []
+        self._vetores: list = []
+
+    async def _adicionar(self, linhas: list[dict], vetores: list = None):
+        if not EMBEDDING_ARCHIVE_ENABLED or not linhas:
+            return
+        # A sequência é tomada agora, logo depois da escrita no Qdrant, e não no flush
+        seq = await proxima_sequencia(self.client_id, len(linhas))
+        for i, linha in enumerate(linhas):
+            linha["seq"] = seq + i
+            if vetores is not None:
+                linha["row"] = len(self._vetores)
+                self._vetores.append(vetores[i])
+            self._linhas.append(linha)
+        if len(self._linhas) >= SEGMENT_ROWS:
+            await self.flush()
+
+    async def registrar(self, pontos: list[tuple]):
+        """Upserts já gravados no Qdrant: [(point_id, texto, vetor, payload)]."""
+        linhas = [
+            {
+                "id": str(point_id), "kind": KIND_UPSERT, "embedding_text": texto,
+                "payload": json.dumps({k: v for k, v in payload.items() if k != "embedding_text"}, ensure_ascii=False, default=str),
+            }
+            for point_id, texto, _, payload in pontos
+        ]
+        await self._adicionar(linhas, [vetor for _, _, vetor, _ in pontos])
+
+    async def registrar_patches(self, patches: list[tuple[str, dict]]):
+        await self._adicionar([
+            {"id": str(point_id), "kind": KIND_PATCH, "payload": json.dumps(campos, ensure_ascii=False)}
+            for point_id, campos in patches
+        ])
+
+    async def registrar_remocoes(self, point_ids: list[str]):
+        await self._adicionar([{"id": str(point_id), "kind": KIND_DELETE} for point_id in point_ids])
+
+    async def flush(self):
+        if not self._linhas:
+            return
+        linhas, vetores = self._linhas, self._vetores
+        self._linhas, self._vetores = [], []
+        try:
+            await asyncio.to_thread(_gravar_segmento, self.diretorio, linhas, vetores)
+            await asyncio.to_thread(_marcar_tenant, self.client_id)
+            # 🗜️ Ressincronizações completas só acrescentam segmentos: compacta ao passar do limite
+            if len(_segmentos(self.diretorio)) > EMBEDDING_ARCHIVE_MAX_SEGMENTS:
+                await asyncio.to_thread(compactar, self.client_id, self.model_id)
+        except Exception as e:
+            # O arquivo é auxiliar: falhar aqui não pode derrubar a indexação
+            print(f"⚠️ Erro ao gravar segmento do arquivo de embeddings em {self.diretorio}: {e}")
+
+def _aplicar_patch(payload: dict, patch: dict) -> dict:
+    payload.update(patch)
+    if "suggest" in payload:
+        payload["suggest"].update({k: patch[k] for k in ("price", "priceText") if k in patch})
+    return payload
+
+def _seq_legada(seg: str) -> int:
+    # Segmentos anteriores à coluna seq: o nome guarda o time_ns do flush
+    return int(seg.split("-")[1]) // 1000
+
+def resolver_estado(diretorio: str, segmentos: list[str] = None) -> tuple[dict, dict, dict]:
+    """
+    Estado final pela sequência de cada linha (a ordem dos segmentos não importa):
+    ({id: (seq, segmento, linha)} do último upsert vivo, {id: (seq, patch)} posteriores a ele, {id: seq} das remoções).
+    """
+    import pyarrow.parquet as pq
+
+    upserts: dict[str, tuple] = {}
+    remocoes: dict[str, tuple] = {}
+    linhas_patch = defaultdict(list)
+
+    for seg in _segmentos(diretorio) if segmentos is None else segmentos:
+        caminho = os.path.join(diretorio, f"{seg}.parquet")
+        colunas = [c for c in ("id", "kind", "seq") if c in pq.read_schema(caminho).names]
+        tabela = pq.read_table(caminho, columns=colunas)
+        ids, kinds = tabela["id"].to_pylist(), tabela["kind"].to_pylist()
+        seqs = tabela["seq"].to_pylist() if "seq" in colunas else [_seq_legada(seg)] * len(ids)
+        payloads = pq.read_table(caminho, columns=["payload"])["payload"].to_pylist() if KIND_PATCH in kinds else None
+
+        for i, (point_id, kind, seq) in enumerate(zip(ids, kinds, seqs)):
+            # Empate de sequência (só em segmentos legados): vale a ordem de gravação
+            chave = (seq, seg, i)
+            if kind == KIND_UPSERT:
+                if point_id not in upserts or chave > upserts[point_id]:
+                    upserts[point_id] = chave
+            elif kind == KIND_PATCH:
+                linhas_patch[point_id].append((chave, payloads[i]))
+            elif point_id not in remocoes or chave > remocoes[point_id]:
+                remocoes[point_id] = chave
+
+    estado = {
+        point_id: chave
+        for point_id, chave in upserts.items()
+        if point_id not in remocoes or remocoes[point_id] < chave
+    }
+
+    patches = {}
+    for point_id, linhas in linhas_patch.items():
+        if point_id not in estado:
+            continue
+        posteriores = sorted(l for l in linhas if l[0] > estado[point_id])
+        if posteriores:
+            campos = {}
+            for _, payload in posteriores:
+                campos.update(json.loads(payload))
+            patches[point_id] = (posteriores[-1][0][0], campos)
+
+    return (
+        estado,
+        patches,
+        {point_id: chave[0] for point_id, chave in remocoes.items() if point_id not in estado},
+    )
+
+def iterar_pontos(diretorio: str, batch_size: int = SEGMENT_ROWS, segmentos: list[str] = None, estado: tuple = None):
+    """Gera (ids, vetores float32, textos, payloads, seqs) do estado final, segmento a segmento via memory-map."""
+    import pyarrow.parquet as pq
+
+    segmentos = _segmentos(diretorio) if segmentos is None else segmentos
+    vivos, patches, _ = estado or resolver_estado(diretorio, segmentos)
+    linhas_por_segmento = defaultdict(list)
+    for seq, seg, linha in vivos.values():
+        linhas_por_segmento[seg].append(linha)
+
+    for seg in segmentos:
+        linhas = sorted(linhas_por_segmento.get(seg, []))
+        if not linhas:
+            continue
+        tabela = pq.read_table(os.path.join(diretorio, f"{seg}.parquet"), columns=["id", "row", "embedding_text", "payload"]).take(linhas)
+        vetores = np.load(os.path.join(diretorio, f"{seg}.npy"), mmap_mode="r")
+
+        for inicio in range(0, tabela.num_rows, batch_size):
+            parte = tabela.slice(inicio, batch_size)
+            ids = parte["id"].to_pylist()
+            textos = parte["embedding_text"].to_pylist()
+            payloads = [
+                _aplicar_patch({**json.loads(p), "embedding_text": t}, patches[i][1] if i in patches else {})
+                for i, t, p in zip(ids, textos, parte["payload"].to_pylist())
+            ]
+            # Indexação "fancy" no memmap copia só as linhas do lote
+            yield ids, np.asarray(vetores[parte["row"].to_numpy()]), textos, payloads, [vivos[i][0] for i in ids]
+
+def compactar(client_id: str, model_id: str) -> int | None:
+    """
+    Reescreve o estado final num único segmento (em streaming) e apaga os antigos. Os patches continuam como
+    linhas próprias e as remoções recentes (EMBEDDING_ARCHIVE_TOMBSTONE_DAYS) também ficam: um upsert mais
+    antigo ainda no buffer de outro worker não pode ressuscitar um produto nem desfazer um preço.
+    Retorna o número de pontos, ou None se outra compactação do mesmo diretório estiver em andamento.
+    """
+    import pyarrow.parquet as pq
+
+    diretorio = diretorio_arquivo(client_id, model_id)
+    if not os.path.isdir(diretorio):
+        return 0
+
+    with open(os.path.join(diretorio, LOCK_COMPACTACAO), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print(f"⏳ Compactação de '{client_id}' ({model_id}) já em andamento")
+            return None
+
+        segmentos = _segmentos(diretorio)
+        estado = resolver_estado(diretorio, segmentos)
+        vivos, patches, remocoes = estado
+        if len(segmentos) <= 1:
+            return len(vivos)
+
+        limite = _agora_us() - EMBEDDING_ARCHIVE_TOMBSTONE_DAYS * 86400 * 1_000_000
+        extras = [
+            {"id": point_id, "kind": KIND_PATCH, "seq": seq, "payload": json.dumps(campos, ensure_ascii=False, default=str)}
+            for point_id, (seq, campos) in patches.items()
+        ] + [
+            {"id": point_id, "kind": KIND_DELETE, "seq": seq}
+            for point_id, seq in remocoes.items() if seq >= limite
+        ]
+
+        # Nome logo após o último segmento compactado (a ordem vem da coluna seq, o nome só desempata)
+        nome = f"{segmentos[-1]}-compact"
+        tmp = os.path.join(diretorio, f"{nome}.parquet.tmp")
+        escritos = 0
+        with pq.ParquetWriter(tmp, _tabela([]).schema, compression="zstd") as writer:
+            if vivos:
+                dim = next(np.load(os.path.join(diretorio, f"{seg}.npy"), mmap_mode="r").shape[1]
+                           for seg in segmentos if os.path.exists(os.path.join(diretorio, f"{seg}.npy")))
+                saida = np.lib.format.open_memmap(os.path.join(diretorio, f"{nome}.npy"), mode="w+", dtype=np.float32, shape=(len(vivos), dim))
+                # Sem patches aplicados: eles seguem como linhas próprias (em `extras`)
+                for ids, vetores, textos, payloads, seqs in iterar_pontos(diretorio, segmentos=segmentos, estado=(vivos, {}, {})):
+                    saida[escritos:escritos + len(ids)] = vetores
+                    writer.write_table(_tabela([
+                        {
+                            "id": point_id, "kind": KIND_UPSERT, "seq": seq, "row": escritos + i, "embedding_text": texto,
+                            "payload": json.dumps({k: v for k, v in payload.items() if k != "embedding_text"}, ensure_ascii=False, default=str),
+                        }
+                        for i, (point_id, texto, payload, seq) in enumerate(zip(ids, textos, payloads, seqs))
+                    ]))
+                    escritos += len(ids)
+                saida.flush()
+                del saida
+            if extras:
+                writer.write_table(_tabela(extras))
+        os.replace(tmp, os.path.join(diretorio, f"{nome}.parquet"))
+
+        for seg in segmentos:
+            for ext in (".parquet", ".npy"):
+                caminho = os.path.join(diretorio, seg + ext)
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+        print(f"🗜️ Arquivo de '{client_id}' ({model_id}): {len(segmentos)} segmentos → 1 ({escritos} pontos, {len(extras)} patches/remoções)")
+        return escritos
+
+def apagar_arquivo(client_id: str):
+    """Remove o arquivo de um tenant: depois de um purge, o rebuild não pode ressuscitar produtos."""
+    diretorio = diretorio_arquivo(client_id)
+    if os.path.isdir(diretorio):
+        shutil.rmtree(diretorio)
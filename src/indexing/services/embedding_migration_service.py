@@ -0,0 +1,153 @@
+import asyncio
+import time
+from collections import defaultdict
+from qdrant_client import models
+from src.config import EMBEDDING_MIGRATION_BATCH_SIZE, QDRANT_SHARED_COLLECTION
+from src.indexing.schemas.product_schema import texto_embedding
+from src.indexing.services.embedding_archive_service import ArquivoEmbeddings
+from src.indexing.services.embedding_model_service import (
+    LOCAL_TTL_SECONDS, colecao_fisica, forget_collection_model, get_collection_model, set_collection_model, trocar_alias
+)
+from src.indexing.services.indexing import create_payload_indexes
+from src.indexing.services.progress_service import atualizar_status
+from src.indexing.services.storage_profile_service import (
+    STORAGE_PROFILES, get_storage_profile, quantization_config, vector_params
+)
+from src.infra.embedding_client import encode_texts
+from src.infra.embedding_models import encode_local, get_model_spec
+from src.infra.qdrant_client import get_async_qdrant
+from src.infra.tenant_collections import SHARED_HNSW_CONFIG
+from src.search.services.catalog_version_service import bump_catalog_version
+from src.utils.metrics import UPLOAD_JOBS_IN_PROGRESS
+
+# 🔁 Migração de modelo de embedding: copia os pontos para `{nome}__{modelo}` re-embedando o texto
+# guardado no payload, recopia o que mudou durante a cópia e troca o alias. A busca continua na
+# coleção antiga até a troca (atômica quando o nome já é um alias; ver trocar_alias).
+
+EMBED_TIMEOUT_SECONDS = 120
+
+def nome_versionado(nome: str, model_id: str) -> str:
+    return f"{nome}__{model_id}"
+
+async def _embed(textos: list[str], model_id: str) -> list:
+    try:
+        return await encode_texts(textos, model=model_id, timeout=EMBED_TIMEOUT_SECONDS)
+    except Exception as e:
+        print(f"⚠️ Erro no microserviço de embedding, usando fallback local: {e}")
+        return await asyncio.to_thread(encode_local, textos, model_id)
+
+async def _copiar(origem: str, destino: str, model_id: str, batch_size: int, filtro=None, on_batch=None) -> int:
+    qdrant = get_async_qdrant()
+    copiados = 0
+    offset = None
+    # Os vetores novos também vão para o arquivo de cada tenant, já no modelo de destino
+    arquivos: dict[str, ArquivoEmbeddings] = {}
+
+    while True:
+        pontos, offset = await qdrant.scroll(
+            collection_name=origem,
+            scroll_filter=filtro,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False,
+        )
+        if pontos:
+            textos = [texto_embedding(p.payload or {}) for p in pontos]
+            vetores = await _embed(textos, model_id)
+            novos = [
+                models.PointStruct(id=p.id, vector=vetor, payload={**(p.payload or {}), "embedding_text": texto})
+                for p, texto, vetor in zip(pontos, textos, vetores)
+            ]
+            await qdrant.upsert(collection_name=destino, points=novos, wait=True)
+            por_tenant = defaultdict(list)
+            for ponto, texto in zip(novos, textos):
+                por_tenant[ponto.payload.get("client_id") or origem].append((ponto.id, texto, ponto.vector, ponto.payload))
+            for client_id, registros in por_tenant.items():
+                await arquivos.setdefault(client_id, ArquivoEmbeddings(client_id, model_id)).registrar(registros)
+            copiados += len(pontos)
+            if on_batch:
+                await on_batch(copiados)
+
+        if offset is None:
+            for arquivo in arquivos.values():
+                await arquivo.flush()
+            return copiados
+
+async def _criar_destino(nome: str, destino: str, model_id: str):
+    qdrant = get_async_qdrant()
+    if await qdrant.collection_exists(destino):
+        # Sobra de uma migração interrompida: recomeça do zero
+        await qdrant.delete_collection(destino)
+
+    profile = await get_storage_profile(nome)
+    await qdrant.create_collection(
+        collection_name=destino,
+        vectors_config=vector_params(profile, size=get_model_spec(model_id)["size"]),
+        quantization_config=quantization_config(profile),
+        on_disk_payload=STORAGE_PROFILES[profile]["on_disk_payload"],
+        hnsw_config=SHARED_HNSW_CONFIG if nome == QDRANT_SHARED_COLLECTION else None,
+    )
+    await asyncio.to_thread(create_payload_indexes, destino)
+    # Registrado antes da troca: quem resolver o alias para `destino` já codifica com o modelo novo
+    await set_collection_model(destino, model_id)
+
+async def migrar_modelo(job_id: str, nome: str, model_id: str, apagar_origem: bool = False,
+                        batch_size: int = EMBEDDING_MIGRATION_BATCH_SIZE) -> dict:
+    """Re-embeda a coleção lógica `nome` (client_id ou a compartilhada) com `model_id` e faz o cut-over."""
+    qdrant = get_async_qdrant()
+    UPLOAD_JOBS_IN_PROGRESS.inc()
+
+    try:
+        get_model_spec(model_id)
+        modelo_atual = await get_collection_model(nome)
+        if modelo_atual == model_id:
+            raise ValueError(f"A coleção '{nome}' já usa o modelo '{model_id}'")
+
+        origem = await colecao_fisica(nome)
+        destino = nome_versionado(nome, model_id)
+        await atualizar_status(job_id, "processing", f"🧠 Criando '{destino}' ({modelo_atual} → {model_id})", 2)
+        await _criar_destino(nome, destino, model_id)
+
+        total = (await qdrant.count(collection_name=origem, exact=True)).count
+        inicio = int(time.time())
+
+        async def on_batch(copiados: int):
+            await atualizar_status(
+                job_id, "processing", f"🔁 {copiados}/{total} pontos re-embedados",
+                min(90, 5 + copiados * 85 // max(total, 1)),
+                recebidos=total, indexados=copiados,
+            )
+
+        copiados = await _copiar(origem, destino, model_id, batch_size, on_batch=on_batch)
+
+        # Produtos indexados/atualizados durante a cópia (updated_at ≥ início) são recopiados
+        await atualizar_status(job_id, "processing", "🔁 Recopiando alterações feitas durante a migração", 92)
+        recentes = models.Filter(must=[models.FieldCondition(key="updated_at", range=models.Range(gte=inicio))])
+        recopiados = await _copiar(origem, destino, model_id, batch_size, filtro=recentes)
+
+        await atualizar_status(job_id, "processing", f"🔀 Trocando '{nome}' para '{destino}'", 96)
+        anterior = await trocar_alias(nome, destino)
+        # O nome lógico só muda depois da troca: antes dela, numa coleção antiga (origem == nome),
+        # o registro de `nome` ainda descreve a coleção que está recebendo escritas
+        await set_collection_model(nome, model_id)
+        await bump_catalog_version(nome)
+
+        if apagar_origem and anterior != nome:
+            # Outros workers podem ter o par (coleção antiga, modelo antigo) no cache de resolver_colecao
+            await asyncio.sleep(LOCAL_TTL_SECONDS + 1)
+            await qdrant.delete_collection(anterior)
+            await forget_collection_model(anterior)
+
+        resumo = f"✅ '{nome}' migrada para '{model_id}': {copiados} pontos ({recopiados} recopiados), servida por '{destino}'"
+        await atualizar_status(job_id, "done", resumo, 100, recebidos=total, indexados=copiados)
+        print(resumo)
+        return {"collection": nome, "model": model_id, "physical": destino, "previous": anterior, "copiados": copiados, "recopiados": recopiados}
+
+    except Exception as e:
+        print(f"❌ Erro na migração de modelo de '{nome}': {e}")
+        await atualizar_status(job_id, "failed", f"❌ Erro na migração: {e}", 99)
+        return {"error": str(e)}
+
+    finally:
+        UPLOAD_JOBS_IN_PROGRESS.dec()
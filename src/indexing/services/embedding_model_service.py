@@ -0,0 +1,149 @@
+import logging
+import time
+from qdrant_client import models
+from src.config import EMBEDDING_DEFAULT_MODEL
+from src.infra.embedding_models import LEGACY_MODEL, get_model_spec
+from src.infra.qdrant_client import get_async_qdrant
+from src.infra.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 🧠 Modelo de embedding de cada coleção (nome lógico = client_id ou a coleção compartilhada).
+# Coleções físicas criadas por migração/rebuild (`{nome}__{modelo}`) são registradas na criação e nunca
+# mudam de modelo; o modelo de um nome lógico é o da coleção física para a qual ele aponta. Busca e
+# escrita resolvem o par (coleção física, modelo) junto, então a troca de alias não mistura modelos.
+
+COLLECTION_MODELS_KEY = "embedding:collection_models"
+# Geração incrementada a cada troca de alias/modelo: writers resolvem a coleção uma vez e só
+# resolvem de novo (get_aliases lista o cluster inteiro) quando ela muda
+COLLECTION_MODELS_VERSION_KEY = "embedding:collection_models:version"
+LOCAL_TTL_SECONDS = 5
+
+_local_cache: dict[str, tuple[float, tuple[str, str]]] = {}
+
+async def _modelo_registrado(nome: str) -> str | None:
+    if not redis_client:
+        return None
+    try:
+        return await redis_client.hget(COLLECTION_MODELS_KEY, nome)
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao ler modelo de embedding de '{nome}': {e}")
+        return None
+
+async def colecao_para_escrita(nome: str) -> tuple[str, str]:
+    """(coleção física, modelo) lidos agora, sem cache: writers gravam na física com o modelo dela."""
+    fisica = await colecao_fisica(nome)
+    model_id = (await _modelo_registrado(fisica) if fisica != nome else None) or await _modelo_registrado(nome) or LEGACY_MODEL
+    return fisica, model_id
+
+async def versao_colecoes() -> int | None:
+    """Geração atual dos aliases/modelos; None sem Redis (o writer então resolve antes de cada gravação)."""
+    if not redis_client:
+        return None
+    try:
+        return int(await redis_client.get(COLLECTION_MODELS_VERSION_KEY) or 0)
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao ler a geração dos modelos de embedding: {e}")
+        return None
+
+async def _nova_versao_colecoes():
+    try:
+        await redis_client.incr(COLLECTION_MODELS_VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao incrementar a geração dos modelos de embedding: {e}")
+
+class ColecaoEscrita:
+    """(coleção física, modelo) de um nome lógico para um writer, resolvidos de novo só quando a geração muda."""
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.fisica = None
+        self.model_id = None
+        self.versao = None
+
+    async def atual(self) -> tuple[str, str]:
+        versao = await versao_colecoes()
+        if self.fisica is None or versao is None or versao != self.versao:
+            self.fisica, self.model_id = await colecao_para_escrita(self.nome)
+            self.versao = versao
+        return self.fisica, self.model_id
+
+async def resolver_colecao(nome: str) -> tuple[str, str]:
+    """(coleção física, modelo) com cache local curto: a busca consulta a física com o modelo dela."""
+    now = time.monotonic()
+    cached = _local_cache.get(nome)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    try:
+        par = await colecao_para_escrita(nome)
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao resolver coleção física de '{nome}': {e}")
+        par = (nome, await _modelo_registrado(nome) or LEGACY_MODEL)
+
+    _local_cache[nome] = (now + LOCAL_TTL_SECONDS, par)
+    return par
+
+async def get_collection_model(nome: str) -> str:
+    return (await resolver_colecao(nome))[1]
+
+async def set_collection_model(nome: str, model_id: str):
+    get_model_spec(model_id)
+    await redis_client.hset(COLLECTION_MODELS_KEY, nome, model_id)
+    await _nova_versao_colecoes()
+    _local_cache.pop(nome, None)
+    logger.info(f"🧠 Coleção '{nome}' agora usa o modelo '{model_id}'")
+
+async def forget_collection_model(nome: str):
+    await redis_client.hdel(COLLECTION_MODELS_KEY, nome)
+    await _nova_versao_colecoes()
+    _local_cache.pop(nome, None)
+
+async def listar_modelos_colecoes() -> dict:
+    return await redis_client.hgetall(COLLECTION_MODELS_KEY)
+
+async def resolver_modelo_indexacao(nome: str) -> str:
+    """Modelo para indexar em `nome`: o registrado, o legado (coleção antiga) ou o padrão (coleção nova)."""
+    registrado = await redis_client.hget(COLLECTION_MODELS_KEY, nome)
+    if registrado:
+        return registrado
+
+    model_id = LEGACY_MODEL if await get_async_qdrant().collection_exists(nome) else EMBEDDING_DEFAULT_MODEL
+    await set_collection_model(nome, model_id)
+    return model_id
+
+async def colecao_fisica(nome: str) -> str:
+    """Coleção real por trás do nome lógico (alias criado por uma migração) ou o próprio nome."""
+    aliases = (await get_async_qdrant().get_aliases()).aliases
+    return next((a.collection_name for a in aliases if a.alias_name == nome), nome)
+
+async def trocar_alias(nome: str, destino: str) -> str:
+    """Aponta o nome lógico para `destino`. Retorna a coleção física que atendia antes."""
+    qdrant = get_async_qdrant()
+    origem = await colecao_fisica(nome)
+    criar = models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=destino, alias_name=nome))
+
+    if origem != nome:
+        await qdrant.update_collection_aliases(change_aliases_operations=[
+            models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=nome)),
+            criar,
+        ])
+        await _nova_versao_colecoes()
+        return origem
+
+    # Coleção anterior ao registro ocupa o próprio nome lógico: precisa ser apagada antes do alias.
+    # Não é atômico: entre os dois passos o nome não existe (buscas falham) e um upload/webhook pode
+    # recriar a coleção com esse nome. Os dados continuam em `destino`; falha aqui exige ação manual.
+    await qdrant.delete_collection(nome)
+    try:
+        await qdrant.update_collection_aliases(change_aliases_operations=[criar])
+        if await colecao_fisica(nome) != destino:
+            raise RuntimeError(f"alias '{nome}' não aponta para '{destino}' depois da criação")
+    except Exception as e:
+        logger.critical(
+            f"🚨 '{nome}' foi apagada mas o alias para '{destino}' não foi criado ({e}). O catálogo está em "
+            f"'{destino}': apague uma eventual coleção '{nome}' recriada e crie o alias '{nome}' → '{destino}' manualmente."
+        )
+        raise
+    await _nova_versao_colecoes()
+    return origem
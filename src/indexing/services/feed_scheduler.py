@@ -0,0 +1,37 @@
+import asyncio
+import time
+from src.config import FEED_SCHEDULER_TICK_SECONDS
+from src.infra.redis_client import redis_client
+from src.indexing.services.feed_url_service import feed_key, get_feed_state, listar_feeds, process_feed_url
+
+# 🗓️ Sincronização periódica dos feeds registrados. Roda em cada worker do app;
+# o lock no Redis garante que um feed é verificado por um worker só a cada intervalo.
+
+async def _sincronizar(feed: dict):
+    client_id, feed_url = feed["client_id"], feed["feed_url"]
+    intervalo = int(feed.get("interval_minutes", 60)) * 60
+
+    estado = await get_feed_state(client_id, feed_url)
+    if time.time() - int(estado.get("last_checked", 0)) < intervalo:
+        return
+
+    lock_key = f"{feed_key(client_id, feed_url)}:lock"
+    if not await redis_client.set(lock_key, "1", nx=True, ex=intervalo):
+        return
+
+    print(f"🗓️ Sincronizando feed de '{client_id}': {feed_url}")
+    resultado = await process_feed_url(feed_url, client_id)
+    print(f"🗓️ Feed de '{client_id}': {resultado.get('status') or resultado.get('error') or 'indexado'}")
+
+async def feed_scheduler_loop():
+    print(f"🗓️ Agendador de feeds ativo (tick de {FEED_SCHEDULER_TICK_SECONDS}s)")
+    while True:
+        try:
+            for feed in await listar_feeds():
+                # Um feed por vez: a indexação já disputa CPU/embedding com o tráfego do app
+                await _sincronizar(feed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Erro no agendador de feeds: {e}")
+        await asyncio.sleep(FEED_SCHEDULER_TICK_SECONDS)
@@ -1,23 +1,136 @@
+import hashlib
+import json
+import os
+import time
 import httpx
-import tempfile
 from uuid import uuid4
-from src.indexing.services.upload_service import process_and_index_csv
+from src.config import FEED_DOWNLOAD_TIMEOUT, FEED_MAX_BYTES, UPLOAD_SPOOL_DIR
+from src.infra.redis_client import redis_client
+from src.indexing.services.progress_service import atualizar_status
+from src.indexing.services.upload_service import process_and_index_file
 
-async def process_feed_url(feed_url: str, client_id: str = "default"):
+# 🌐 Download de feeds em streaming para disco, com GET condicional (ETag/Last-Modified)
+# e hash do conteúdo por tenant+URL: feed inalterado não passa pela indexação de novo.
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(FEED_DOWNLOAD_TIMEOUT, connect=10),
+    follow_redirects=True,
+    headers={"User-Agent": "BuscaFlex-FeedFetcher/1.0"},
+)
+
+def feed_key(client_id: str, feed_url: str) -> str:
+    return f"feed:{client_id}:{hashlib.sha1(feed_url.encode()).hexdigest()[:16]}"
+
+async def get_feed_state(client_id: str, feed_url: str) -> dict:
+    return await redis_client.hgetall(feed_key(client_id, feed_url)) or {}
+
+async def _salvar_estado(client_id: str, feed_url: str, **campos):
+    campos = {k: v for k, v in campos.items() if v is not None}
+    await redis_client.hset(feed_key(client_id, feed_url), mapping={"feed_url": feed_url, **campos})
+
+async def baixar_feed(feed_url: str, headers: dict) -> tuple[httpx.Response, str | None, str | None]:
+    """Baixa o feed para o diretório de spool em blocos.
+
+    Content-Encoding é decodificado pelo httpx; feeds .gz/.zst servidos como arquivo ficam
+    comprimidos em disco e são lidos em streaming pelo leitor de ingestão.
+    Retorna (resposta, caminho, sha256); caminho None quando o servidor responde 304.
+    Levanta ValueError quando o feed passa de FEED_MAX_BYTES (o spool não pode encher por uma URL).
+    """
+    limite = f"Feed excede o limite de {FEED_MAX_BYTES // (1024 ** 2)} MB"
+    async with http_client.stream("GET", feed_url, headers=headers) as response:
+        if response.status_code == 304:
+            return response, None, None
+        response.raise_for_status()
+
+        tamanho = response.headers.get("Content-Length", "")
+        if tamanho.isdigit() and int(tamanho) > FEED_MAX_BYTES:
+            raise ValueError(limite)
+
+        os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+        file_path = os.path.join(UPLOAD_SPOOL_DIR, f"feed_{uuid4()}.upload")
+        digest = hashlib.sha256()
+        recebidos = 0
+        try:
+            with open(file_path, "wb") as f:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    recebidos += len(chunk)
+                    if recebidos > FEED_MAX_BYTES:
+                        raise ValueError(limite)
+                    digest.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.remove(file_path)
+            raise
+        return response, file_path, digest.hexdigest()
+
+async def process_feed_url(feed_url: str, client_id: str = "default", force: bool = False):
+    temp_path = None
+    upload_id = str(uuid4())
     try:
+        estado = {} if force else await get_feed_state(client_id, feed_url)
+        headers = {}
+        if estado.get("etag"):
+            headers["If-None-Match"] = estado["etag"]
+        if estado.get("last_modified"):
+            headers["If-Modified-Since"] = estado["last_modified"]
+
         print(f"🌐 Baixando feed: {feed_url}")
-        response = await httpx.AsyncClient().get(feed_url, timeout=15)
-        response.raise_for_status()
+        response, temp_path, content_hash = await baixar_feed(feed_url, headers)
+        agora = str(int(time.time()))
+
+        if temp_path is None or (content_hash and content_hash == estado.get("content_hash")):
+            print(f"⏭️ Feed inalterado, indexação ignorada: {feed_url}")
+            await _salvar_estado(client_id, feed_url, last_checked=agora, last_status="unchanged")
+            return {"status": "unchanged", "feed_url": feed_url}
+
+        # Formato detectado pelo conteúdo: XML, CSV, NDJSON, Parquet ou Arrow
+        resultado = await process_and_index_file(temp_path, upload_id=upload_id, client_id=client_id)
+        temp_path = None  # os processadores removem o arquivo
 
-        # Salva em arquivo temporário
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".csv", mode="wb") as tmp:
-            tmp.write(response.content)
-            temp_path = tmp.name
+        if "error" in resultado:
+            await _salvar_estado(client_id, feed_url, last_checked=agora, last_status="failed")
+            return resultado
 
-        # Usa a função de upload já existente
-        upload_id = str(uuid4())
-        return await process_and_index_csv(temp_path, upload_id=upload_id, client_id=client_id)
+        # Validadores só são gravados depois de indexar: uma falha faz a próxima rodada baixar de novo
+        await _salvar_estado(
+            client_id, feed_url,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            content_hash=content_hash,
+            last_checked=agora,
+            last_synced=agora,
+            last_status="indexed",
+        )
+        return resultado
 
     except Exception as e:
         print(f"❌ Erro ao baixar ou processar feed: {e}")
-        return {"error": str(e)}
+        try:
+            await atualizar_status(upload_id, "failed", f"❌ {e}", 99)
+            await _salvar_estado(client_id, feed_url, last_checked=str(int(time.time())), last_status="failed")
+        except Exception as erro_status:
+            print(f"⚠️ Erro ao registrar a falha do feed: {erro_status}")
+        return {"upload_id": upload_id, "error": str(e)}
+
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+# 🗓️ Registro de feeds para sincronização periódica (hash único, campo = client_id|url)
+FEED_REGISTRY_KEY = "feeds:registry"
+
+async def registrar_feed(feed_url: str, client_id: str, interval_minutes: int) -> dict:
+    feed = {"feed_url": feed_url, "client_id": client_id, "interval_minutes": interval_minutes}
+    await redis_client.hset(FEED_REGISTRY_KEY, f"{client_id}|{feed_url}", json.dumps(feed))
+    return feed
+
+async def remover_feed(feed_url: str, client_id: str) -> bool:
+    removidos = await redis_client.hdel(FEED_REGISTRY_KEY, f"{client_id}|{feed_url}")
+    await redis_client.delete(feed_key(client_id, feed_url))
+    return bool(removidos)
+
+async def listar_feeds(client_id: str | None = None) -> list[dict]:
+    feeds = [json.loads(v) for v in (await redis_client.hgetall(FEED_REGISTRY_KEY)).values()]
+    return [f for f in feeds if client_id is None or f["client_id"] == client_id]
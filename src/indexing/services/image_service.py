@@ -3,12 +3,17 @@ from PIL import Image
 from io import BytesIO
 import httpx
 import boto3
+from src.infra.tenant_collections import nome_seguro
+from src.utils.metrics import INDEXING_STAGE_SECONDS, medir_etapa
 
 # 🔧 CONFIGURAÇÕES
 BUCKET_NAME = "buscaflex-thumbs"
 REGIAO = "auto"
 ENDPOINT_URL = "https://a2cadc9639c11816e7afa11db881dddf.r2.cloudflarestorage.com"
 
+PUBLIC_BASE_URL = "https://pub-f7ad44c25e7a4c599be0d11851654e0c.r2.dev"
+THUMBS_PREFIX = "products/thumbs/"
+
 ACCESS_KEY = os.getenv("R2_ACCESS_KEY")
 SECRET_KEY = os.getenv("R2_SECRET_KEY")
 
@@ -21,15 +26,24 @@ s3 = boto3.client(
     aws_secret_access_key=SECRET_KEY,
 )
 
+# 🗂️ Thumbnails ficam sob o prefixo do tenant, o que permite apagar o catálogo de um cliente só.
+# O diretório é o nome seguro do client_id: com "acme/" ou "a/b" cru, o prefixo de um tenant cobriria o de outro
+def thumbs_prefix(client_id: str = None) -> str:
+    return f"{THUMBS_PREFIX}{nome_seguro(client_id)}/" if client_id else THUMBS_PREFIX
+
+def thumb_key(uuid: str, client_id: str = None) -> str:
+    return f"{thumbs_prefix(client_id)}{uuid}.jpg"
+
 # 🖼️ Processa imagem da URL, redimensiona e envia pro R2 — tudo em memória
-async def processar_e_enviar_imagem(url_original: str, uuid: str, tamanho=(700, 700)) -> str:
+async def processar_e_enviar_imagem(url_original: str, uuid: str, tamanho=(700, 700), client_id: str = None) -> str:
     try:
         print(f"📥 Baixando imagem: {url_original}")
         
-        async with httpx.AsyncClient(headers={
-            "User-Agent": "Mozilla/5.0"
-        }) as client:
-            resp = await client.get(url_original, timeout=10)
+        with medir_etapa(INDEXING_STAGE_SECONDS, "image_fetch", client_id):
+            async with httpx.AsyncClient(headers={
+                "User-Agent": "Mozilla/5.0"
+            }) as client:
+                resp = await client.get(url_original, timeout=10)
 
 
         if resp.status_code != 200:
@@ -44,26 +58,28 @@ async def processar_e_enviar_imagem(url_original: str, uuid: str, tamanho=(700,
         if "image" not in content_type:
             raise Exception(f"URL não é uma imagem: {url_original}")
 
-        img = Image.open(BytesIO(resp.content)).convert("RGB")
+        with medir_etapa(INDEXING_STAGE_SECONDS, "thumbnail", client_id):
+            img = Image.open(BytesIO(resp.content)).convert("RGB")
 
-        # 🛑 Verifica tamanho mínimo antes de redimensionar
-        if img.width < 200 or img.height < 200:
-            print(f"⚠️ Imagem pequena ({img.width}x{img.height}), mas será usada mesmo assim.")
+            # 🛑 Verifica tamanho mínimo antes de redimensionar
+            if img.width < 200 or img.height < 200:
+                print(f"⚠️ Imagem pequena ({img.width}x{img.height}), mas será usada mesmo assim.")
 
-        img.thumbnail(tamanho)
+            img.thumbnail(tamanho)
 
-        buffer = BytesIO()
-        img.save(buffer, format="JPEG", quality=85)
-        buffer.seek(0)
+            buffer = BytesIO()
+            img.save(buffer, format="JPEG", quality=85)
+            buffer.seek(0)
 
-        s3.upload_fileobj(
-            Fileobj=buffer,
-            Bucket=BUCKET_NAME,
-            Key=f"products/thumbs/{uuid}.jpg",
-            ExtraArgs={"ContentType": "image/jpeg"}
-        )
+        with medir_etapa(INDEXING_STAGE_SECONDS, "r2_upload", client_id):
+            s3.upload_fileobj(
+                Fileobj=buffer,
+                Bucket=BUCKET_NAME,
+                Key=thumb_key(uuid, client_id),
+                ExtraArgs={"ContentType": "image/jpeg"}
+            )
 
-        url_final = f"https://pub-f7ad44c25e7a4c599be0d11851654e0c.r2.dev/products/thumbs/{uuid}.jpg"
+        url_final = f"{PUBLIC_BASE_URL}/{thumb_key(uuid, client_id)}"
         print(f"✅ Upload completo! URL: {url_final}")
         return url_final
 
@@ -1,24 +1,37 @@
 import os
+import time
 from uuid import uuid4
 import asyncio
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient, models
-from qdrant_client.http.models import PointStruct, VectorParams, Distance
+from qdrant_client import models
+from qdrant_client.http.models import PointStruct
 from src.search.services.autocomplete_service import extract_image_from_url
 from src.indexing.services.image_service import processar_e_enviar_imagem, BUCKET_NAME
 from ast import literal_eval
 import csv
 from src.indexing.services.validation_service import validar_produto
-from typing import List, Dict, Tuple
-from src.admin.services.relatorio_service import salvar_relatorio_erros
+from typing import AsyncIterator, List, Dict, Tuple
+from src.admin.services.relatorio_service import RelatorioErros
+from src.indexing.services.embedding_archive_service import ArquivoEmbeddings
 import re
 import pandas as pd
-from src.indexing.schemas.product_schema import ALL_FIELDS
+from src.indexing.schemas.product_schema import (
+    ALL_FIELDS, chave_produto, formatar_preco, montar_payload_suggest, parse_estoque, parse_preco, product_point_id
+)
 from src.indexing.services.normalizacao_service import normalizar_dataset
 import ast
-from src.infra.embedding_client import encode_text
-from src.config import qdrant_client as client
-from firebase_admin import firestore
+from src.infra.embedding_client import encode_texts
+from src.infra.embedding_models import encode_local, get_model_spec
+from src.indexing.services.embedding_model_service import ColecaoEscrita, resolver_modelo_indexacao
+from src.infra.qdrant_client import get_async_qdrant, get_qdrant
+from src.infra.firestore_client import get_docs, set_doc
+from src.admin.services.widget_config_service import bump_widget_config_version
+from src.search.services.catalog_version_service import bump_catalog_version
+from src.config import EMBEDDING_DEFAULT_MODEL, INDEXING_BATCH_SIZE, QDRANT_SHARED_COLLECTION
+from src.utils.metrics import INDEXED_PRODUCTS, INDEXING_STAGE_SECONDS, medir_etapa, tenant_label
+from src.infra.tenant_collections import CLIENT_ID_INDEX, SHARED_HNSW_CONFIG, collection_for
+from src.indexing.services.storage_profile_service import (
+    STORAGE_PROFILES, get_storage_profile, quantization_config, vector_params
+)
 
 # 🔧 Configurações carregadas do .env
 QDRANT_URL = os.getenv("QDRANT_URL")
@@ -41,8 +54,6 @@ DEFAULT_AUTOCOMPLETE_CONFIG = {
     "is_enabled": False
 }
 
-model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
-
 def prepare_row(row: dict) -> dict:
     # 🧠 Tenta extrair categoria a partir do breadcrumb
     if not row.get("category") and row.get("breadcrumb"):
@@ -78,13 +89,17 @@ def smart_split(text):
     return [p.strip() for p in parts if p.strip()]
 
 # 🚀 Cria coleção no Qdrant (se ainda não existe)
-def create_collection_if_not_exists(collection_name: str):
-    collections = client.get_collections().collections
-    if collection_name not in [c.name for c in collections]:
-        print(f"🧠 Criando coleção '{collection_name}'...")
+def create_collection_if_not_exists(collection_name: str, profile: str = "default", model_id: str = EMBEDDING_DEFAULT_MODEL):
+    client = get_qdrant()
+    # collection_exists também resolve aliases (coleções migradas de modelo)
+    if not client.collection_exists(collection_name):
+        print(f"🧠 Criando coleção '{collection_name}' (perfil '{profile}', modelo '{model_id}')...")
         client.create_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=384, distance=Distance.COSINE)
+            vectors_config=vector_params(profile, size=get_model_spec(model_id)["size"]),
+            quantization_config=quantization_config(profile),
+            on_disk_payload=STORAGE_PROFILES[profile]["on_disk_payload"],
+            hnsw_config=SHARED_HNSW_CONFIG if collection_name == QDRANT_SHARED_COLLECTION else None,
         )
     else:
         print(f"📦 Coleção '{collection_name}' já existe.")  # ✅ agora usa o argumento certo
@@ -92,13 +107,15 @@ def create_collection_if_not_exists(collection_name: str):
 
 # 🔎 Cria índices de payload para filtro e visualização na UI do Qdrant
 def create_payload_indexes(collection_name: str):
+    client = get_qdrant()
     index_fields = [
-        ("client_id", models.PayloadSchemaType.KEYWORD),
+        ("client_id", CLIENT_ID_INDEX),
         ("title", models.PayloadSchemaType.KEYWORD),
         ("brand", models.PayloadSchemaType.KEYWORD),
         ("category", models.PayloadSchemaType.KEYWORD),
         ("price", models.PayloadSchemaType.FLOAT),
         ("uuid", models.PayloadSchemaType.UUID),
+        ("updated_at", models.PayloadSchemaType.INTEGER),
         ("description", models.TextIndexParams(
             type="text",
             tokenizer=models.TokenizerType.WORD,
@@ -170,169 +187,276 @@ def check_dataset_schema(products: List[Dict[str, any]], required_fields: List[s
     print("✅ Todos os campos obrigatórios estão presentes.")
     return True
 
+# 🧱 Prepara o tenant: docs no Firestore, coleção e índices no Qdrant. Retorna o nome da coleção.
+async def preparar_indexacao(client_id: str) -> str:
+    # Define collection name = client_id (ou a coleção compartilhada)
+    collection_name = collection_for(client_id)
+
+    # 🚀 Garante que users/{client_id} e configs/{client_id} existem no Firestore (uma leitura em lote)
+    user_doc, config_doc = await get_docs([("users", client_id), ("configs", client_id)])
+
+    if user_doc is None:
+        await set_doc("users", client_id, {
+            "uid": client_id,  # neste caso, assumindo client_id == uid, você pode mudar isso
+            "email": "",
+            "role": "admin",
+            "clientId": client_id
+        })
+
+    if config_doc is None:
+        print(f"🧠 Criando configs padrão para {client_id}...")
+        await set_doc("configs", client_id, {
+            "autocomplete": DEFAULT_AUTOCOMPLETE_CONFIG
+        })
+        await bump_widget_config_version(client_id)
+
+    # Cria collection e índices
+    storage_profile = await get_storage_profile(collection_name)
+    model_id = await resolver_modelo_indexacao(collection_name)
+    create_collection_if_not_exists(collection_name, storage_profile, model_id)
+    create_payload_indexes(collection_name)
+
+    print("\n🚀 Iniciando indexação...\n")
+    await loading_animation()
+    return collection_name
+
+async def encode_lote(textos: List[str], model_id: str) -> list:
+    try:
+        return await encode_texts(textos, model=model_id)
+    except Exception as e:
+        print(f"⚠️ Erro no microserviço de embedding, usando fallback local: {e}")
+        return await asyncio.to_thread(encode_local, textos, model_id)
+
+# Erros não ficam em memória: vão para o relatório do upload (Redis Stream) conforme acontecem
+def novo_resultado(upload_id: str, client_id: str) -> dict:
+    return {"indexados": 0, "ignorados": 0, "erros": 0, "relatorio": RelatorioErros(upload_id, client_id), "arquivo": None}
+
+# 📦 Indexa um lote já normalizado, acumulando contagens em `stats` e erros no relatório
+async def indexar_lote(products: List[Dict[str, any]], client_id: str, collection_name: str, stats: dict):
+    client = get_async_qdrant()
+    batch_size = INDEXING_BATCH_SIZE
+    # Coleção física + modelo resolvidos uma vez; antes de cada upsert só a geração (1 GET) é conferida
+    escrita = ColecaoEscrita(collection_name)
+    _, model_id = await escrita.atual()
+
+    for i in range(0, len(products), batch_size):
+        batch = products[i:i + batch_size]
+        pendentes = []
+        print(f"🔁 Processando batch {i} - {i + len(batch)}")
+
+        for p in batch:
+            p = prepare_row(p)
+
+            # Preenche campos ausentes
+            for col in ALL_FIELDS:
+                if col not in p:
+                    p[col] = ""
+
+            with medir_etapa(INDEXING_STAGE_SECONDS, "validate", client_id):
+                valido, motivo = validar_produto(p)
+            print(f"➡️ Produto: {p.get('title', '[sem título]')}")
+
+            if not valido:
+                stats["erros"] += 1
+                await stats["relatorio"].registrar(p.get("title", ""), motivo, p)
+                stats["ignorados"] += 1
+                continue
+
+            product_key = chave_produto(p)
+            obj_uuid = product_point_id(client_id, product_key)
+            description = str(p.get("description", "")).strip()
+            brand = str(p.get("brand", "")).strip()
+            category = str(p.get("category", "")).strip()
+
+            images = safe_parse_images(p.get("images", []))
+            print(f"✅ Lista final de imagens ({len(images)}): {images}")
+
+            valid_images = [img for img in images if isinstance(img, str) and img.startswith("http") and img.lower().endswith((".jpg", ".jpeg", ".png"))]
+
+            if not valid_images:
+                print(f"⚠️ Nenhuma imagem válida para o produto: {p.get('title')}")
+                stats["erros"] += 1
+                await stats["relatorio"].registrar(p.get("title", ""), "Nenhuma imagem válida encontrada", p)
+                stats["ignorados"] += 1
+                continue
+
+            url = valid_images[0]
+
+            try:
+                url_final = await asyncio.wait_for(processar_e_enviar_imagem(url, obj_uuid, client_id=client_id), timeout=5)
+            except asyncio.TimeoutError:
+                print(f"⏰ Timeout ao tentar baixar imagem: {url}")
+                url_final = "Erro - timeout"
+            except Exception as e:
+                # Uma imagem quebrada ignora o produto, não aborta a indexação inteira
+                url_final = f"Erro - {e}"
+
+            if url_final.startswith("Erro"):
+                stats["erros"] += 1
+                await stats["relatorio"].registrar(p.get("title", ""), "Erro na imagem ou imagem pequena", p)
+                stats["ignorados"] += 1
+                continue
+
+            price = parse_preco(p.get("price", "0"))
+
+            title = str(p.get("title", "")).strip()
+            uses = smart_split(p.get("uses", ""))
+            side_effects = smart_split(p.get("side_effects", ""))
+            composition = smart_split(p.get("composition", ""))
+
+            payload = {
+                "uuid": obj_uuid,
+                "client_id": client_id,
+                "title": title,
+                "description": description or "Sem descrição",
+                "brand": brand or "Desconhecida",
+                "category": category or "Sem categoria",
+                "image": url_final,
+                "url": url,
+                "product_key": product_key,
+                "price": price,
+                "priceText": formatar_preco(price),
+                "stock": parse_estoque(p.get("stock")),
+                "uses": uses,
+                "side_effects": side_effects,
+                "composition": composition,
+            }
+            payload["suggest"] = montar_payload_suggest(payload)
+
+            text_to_vectorize = f"{title} {brand} {category} {' '.join(uses)} {' '.join(composition)}"
+            # Texto guardado para re-embedding (troca de modelo) sem o catálogo original
+            payload["embedding_text"] = text_to_vectorize
+            payload["updated_at"] = int(time.time())
+
+            pendentes.append((obj_uuid, payload))
+
+        if pendentes:
+            with medir_etapa(INDEXING_STAGE_SECONDS, "embed", client_id):
+                vetores = await encode_lote([payload["embedding_text"] for _, payload in pendentes], model_id)
+            points: List[PointStruct] = [
+                PointStruct(id=obj_uuid, vector=vetor, payload=payload)
+                for (obj_uuid, payload), vetor in zip(pendentes, vetores)
+            ]
+
+            # 🧠 Grava na coleção física com o modelo dela: se uma migração trocou o alias durante o
+            # lote, a geração mudou, o par é resolvido de novo e o lote é re-embedado em vez de misturar modelos
+            fisica, modelo_atual = await escrita.atual()
+            if modelo_atual != model_id:
+                print(f"🔀 '{collection_name}' agora usa '{modelo_atual}' (lote codificado com '{model_id}'): re-embedando")
+                model_id = modelo_atual
+                vetores = await encode_lote([p.payload["embedding_text"] for p in points], model_id)
+                for point, vetor in zip(points, vetores):
+                    point.vector = vetor
+
+            if stats["arquivo"] is None or stats["arquivo"].model_id != model_id:
+                if stats["arquivo"]:
+                    await stats["arquivo"].flush()
+                stats["arquivo"] = ArquivoEmbeddings(client_id, model_id)
+
+            with medir_etapa(INDEXING_STAGE_SECONDS, "upsert", client_id):
+                await client.upsert(collection_name=fisica, points=points)
+            # 🗃️ Vetor + texto + payload vão para o arquivo do tenant (rebuild sem re-embedding)
+            await stats["arquivo"].registrar([(p.id, p.payload["embedding_text"], p.vector, p.payload) for p in points])
+            stats["indexados"] += len(points)
+            print(f"✅ {len(points)} produtos indexados...")
+
+
+# 🧾 Grava o que ficou no buffer do relatório e do arquivo, inclusive quando a indexação falha no meio
+async def descarregar_buffers(stats: dict | None):
+    for nome in ("relatorio", "arquivo"):
+        if stats and stats.get(nome):
+            try:
+                await stats[nome].flush()
+            except Exception as e:
+                print(f"⚠️ Erro ao gravar {nome} pendente: {e}")
+
+# 🏁 Métricas, versão do catálogo e relatório de erros ao fim da indexação
+async def finalizar_indexacao(client_id: str, stats: dict) -> dict:
+    total_indexados, total_ignorados, erros = stats["indexados"], stats["ignorados"], stats["erros"]
+
+    print(f"\n🚀 Final: {total_indexados} indexados, {total_ignorados} ignorados.")
+    INDEXED_PRODUCTS.labels(result="indexed", tenant=tenant_label(client_id)).inc(total_indexados)
+    INDEXED_PRODUCTS.labels(result="ignored", tenant=tenant_label(client_id)).inc(total_ignorados)
+
+    # 🏷️ Nova versão do catálogo invalida caches derivados (ex: cache semântico)
+    if total_indexados:
+        await bump_catalog_version(client_id)
+
+    if stats["arquivo"]:
+        await stats["arquivo"].flush()
+
+    relatorio = stats["relatorio"]
+    await relatorio.flush()
+    if erros:
+        print(f"📝 Relatório de erros do upload {relatorio.upload_id}: {erros} itens.")
+
+    return {
+        "message": "✅ CSV processado!",
+        "adicionados": total_indexados,
+        "ignorados": total_ignorados,
+        "erros": erros,
+        "erros_por_motivo": dict(relatorio.por_motivo),
+        "relatorio_id": relatorio.upload_id if erros else None,
+    }
+
 # 🔁 Função principal de indexação
-async def index_products(products: List[Dict[str, any]], client_id: str = "default"):
+async def index_products(products: List[Dict[str, any]], client_id: str = "default", upload_id: str = None):
+    stats = None
     try:
         # Normaliza dataset
         products = normalizar_dataset(products)
 
-        # Define collection name = client_id
-        collection_name = client_id
-
-        # 🚀 Garante que configs/{client_id} existe no Firestore
-        db = firestore.client()
-
-        user_doc = db.collection("users").document(client_id).get()
-        if not user_doc.exists:
-            db.collection("users").document(client_id).set({
-                "uid": client_id,  # neste caso, assumindo client_id == uid, você pode mudar isso
-                "email": "",
-                "role": "admin",
-                "clientId": client_id
-            })
-
-        # 🚀 Garante que configs/{client_id} existe no Firestore
-        config_ref = db.collection("configs").document(client_id)
-        if not config_ref.get().exists:
-            print(f"🧠 Criando configs padrão para {client_id}...")
-            config_ref.set({
-                "autocomplete": DEFAULT_AUTOCOMPLETE_CONFIG
-            })
-
         # Verifica schema
         if not check_dataset_schema(products):
             return {"error": "Dataset inválido. Faltam colunas obrigatórias."}
 
         print(f"📊 Quantidade total de produtos no CSV: {len(products)}")
 
-        # Cria collection e índices
-        create_collection_if_not_exists(collection_name)
-        create_payload_indexes(collection_name)
+        collection_name = await preparar_indexacao(client_id)
+        stats = novo_resultado(upload_id or str(uuid4()), client_id)
+        await indexar_lote(products, client_id, collection_name, stats)
+        return await finalizar_indexacao(client_id, stats)
+
+    except Exception as e:
+        print(f"❌ Erro ao indexar produtos: {e}")
+        return {"error": str(e)}
 
-        print("\n🚀 Iniciando indexação...\n")
-        await loading_animation()
+    finally:
+        await descarregar_buffers(stats)
 
-        total_indexados = 0
-        total_ignorados = 0
-        batch_size = 1
-        erros = []
+# 🌊 Indexação em streaming: consome lotes de um iterador assíncrono (XML, NDJSON...) em memória constante
+async def index_product_stream(lotes: AsyncIterator[List[Dict[str, any]]], client_id: str = "default", on_batch=None, upload_id: str = None):
+    stats = None
+    try:
+        collection_name = None
+        stats = novo_resultado(upload_id or str(uuid4()), client_id)
+        recebidos = 0
 
-        for i in range(0, len(products), batch_size):
-            batch = products[i:i + batch_size]
-            points: List[PointStruct] = []
-            print(f"🔁 Processando batch {i} - {i + len(batch)}")
+        async for lote in lotes:
+            lote = normalizar_dataset(lote)
+            if not lote:
+                continue
 
-            for p in batch:
-                p = prepare_row(p)
+            if collection_name is None:
+                if not check_dataset_schema(lote):
+                    return {"error": "Dataset inválido. Faltam colunas obrigatórias."}
+                collection_name = await preparar_indexacao(client_id)
 
-                # Preenche campos ausentes
-                for col in ALL_FIELDS:
-                    if col not in p:
-                        p[col] = ""
+            await indexar_lote(lote, client_id, collection_name, stats)
+            recebidos += len(lote)
+            if on_batch:
+                await on_batch(recebidos, stats)
 
-                valido, motivo = validar_produto(p)
-                print(f"➡️ Produto: {p.get('title', '[sem título]')}")
-
-                if not valido:
-                    erros.append({
-                        "produto": p.get("title", ""),
-                        "motivo": motivo,
-                        "dados": p
-                    })
-                    total_ignorados += 1
-                    continue
-
-                obj_uuid = str(uuid4())
-                description = str(p.get("description", "")).strip()
-                brand = str(p.get("brand", "")).strip()
-                category = str(p.get("category", "")).strip()
-
-                images = safe_parse_images(p.get("images", []))
-                print(f"✅ Lista final de imagens ({len(images)}): {images}")
-
-                valid_images = [img for img in images if isinstance(img, str) and img.startswith("http") and img.lower().endswith((".jpg", ".jpeg", ".png"))]
-
-                if not valid_images:
-                    print(f"⚠️ Nenhuma imagem válida para o produto: {p.get('title')}")
-                    erros.append({
-                        "produto": p.get("title", ""),
-                        "motivo": "Nenhuma imagem válida encontrada",
-                        "dados": p
-                    })
-                    total_ignorados += 1
-                    continue
-
-                url = valid_images[0]
-
-                try:
-                    url_final = await asyncio.wait_for(processar_e_enviar_imagem(url, obj_uuid), timeout=5)
-                except asyncio.TimeoutError:
-                    print(f"⏰ Timeout ao tentar baixar imagem: {url}")
-                    url_final = "Erro - timeout"
-
-                if url_final.startswith("Erro"):
-                    erros.append({
-                        "produto": p.get("title", ""),
-                        "motivo": "Erro na imagem ou imagem pequena",
-                        "dados": p
-                    })
-                    total_ignorados += 1
-                    continue
-
-                try:
-                    price_str = str(p.get("price", "0")).replace("R$", "").replace("%", "").replace(",", ".").strip()
-                    price = float(price_str)
-                except Exception:
-                    price = 0.0
-
-                title = str(p.get("title", "")).strip()
-                uses = smart_split(p.get("uses", ""))
-                side_effects = smart_split(p.get("side_effects", ""))
-                composition = smart_split(p.get("composition", ""))
-
-                payload = {
-                    "uuid": obj_uuid,
-                    "client_id": client_id,
-                    "title": title,
-                    "description": description or "Sem descrição",
-                    "brand": brand or "Desconhecida",
-                    "category": category or "Sem categoria",
-                    "image": url_final,
-                    "url": url,
-                    "price": price,
-                    "priceText": f"{price} Kč" if price > 0 else "Indisponível",
-                    "uses": uses,
-                    "side_effects": side_effects,
-                    "composition": composition,
-                }
-
-                text_to_vectorize = f"{title} {brand} {category} {' '.join(uses)} {' '.join(composition)}"
-
-                try:
-                    vector = await encode_text(text_to_vectorize)
-                except Exception as e:
-                    print(f"⚠️ Erro no microserviço de embedding, usando fallback local: {e}")
-                    vector = model.encode(text_to_vectorize).tolist()
-
-                points.append(PointStruct(id=obj_uuid, vector=vector, payload=payload))
-
-            if points:
-                client.upsert(collection_name=collection_name, points=points)
-                total_indexados += len(points)
-                print(f"✅ {len(points)} produtos indexados...")
-
-        print(f"\n🚀 Final: {total_indexados} indexados, {total_ignorados} ignorados.")
-
-        if erros:
-            salvar_relatorio_erros(erros)
-            print(f"📝 Relatório de erros salvo com {len(erros)} itens.")
-
-        return {
-            "message": "✅ CSV processado!",
-            "adicionados": total_indexados,
-            "ignorados": total_ignorados
-        }
+        if collection_name is None:
+            return {"error": "Nenhum produto encontrado no feed."}
+
+        resultado = await finalizar_indexacao(client_id, stats)
+        resultado["recebidos"] = recebidos
+        return resultado
 
     except Exception as e:
         print(f"❌ Erro ao indexar produtos: {e}")
         return {"error": str(e)}
+
+    finally:
+        await descarregar_buffers(stats)
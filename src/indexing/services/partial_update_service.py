@@ -0,0 +1,94 @@
+import asyncio
+import time
+from collections import defaultdict
+from qdrant_client import models
+from src.config import PARTIAL_UPDATE_BATCH_SIZE, PARTIAL_UPDATE_CONCURRENCY
+from src.indexing.schemas.product_schema import formatar_preco, parse_estoque, parse_preco, product_point_id
+from src.indexing.services.embedding_archive_service import ArquivoEmbeddings
+from src.indexing.services.embedding_model_service import get_collection_model
+from src.infra.qdrant_client import get_async_qdrant
+from src.infra.tenant_collections import collection_for
+from src.search.services.catalog_version_service import bump_catalog_version
+from src.utils.metrics import INDEXED_PRODUCTS, tenant_label
+
+# 💸 Atualização parcial de preço/estoque: só payload (set_payload), sem imagem nem embedding.
+# Os pontos são endereçados pelo ID determinístico (client_id + chave do produto) e produtos
+# com os mesmos valores viram uma única operação — lotes grandes custam poucas requisições.
+
+MAX_CHAVES_NAO_ENCONTRADAS = 100
+
+def _campos(alteracao: dict) -> dict:
+    campos = {}
+    if alteracao.get("price") is not None:
+        price = parse_preco(alteracao["price"])
+        campos["price"] = price
+        campos["priceText"] = formatar_preco(price)
+    if alteracao.get("stock") is not None:
+        campos["stock"] = parse_estoque(alteracao["stock"])
+    return campos
+
+def _operacoes(grupos: dict[tuple, list[str]], agora: int) -> list:
+    ops = []
+    for campos, ids in grupos.items():
+        campos = dict(campos)
+        # updated_at: a migração de modelo recopia o que mudou durante a cópia
+        ops.append(models.SetPayloadOperation(set_payload=models.SetPayload(payload={**campos, "updated_at": agora}, points=ids)))
+        # O payload compacto do autocomplete também carrega preço
+        suggest = {k: campos[k] for k in ("price", "priceText") if k in campos}
+        if suggest:
+            ops.append(models.SetPayloadOperation(set_payload=models.SetPayload(payload=suggest, points=ids, key="suggest")))
+    return ops
+
+async def atualizar_produtos_parcial(client_id: str, alteracoes: list[dict]) -> dict:
+    """Aplica [{"key", "price"?, "stock"?}] no catálogo do cliente; chaves repetidas: vale a última."""
+    qdrant = get_async_qdrant()
+    collection_name = collection_for(client_id)
+
+    por_id = {product_point_id(client_id, a["key"]): a for a in alteracoes}
+    ids = list(por_id)
+    resultado = {"recebidos": len(alteracoes), "atualizados": 0, "nao_encontrados": 0, "chaves_nao_encontradas": []}
+
+    if not await qdrant.collection_exists(collection_name):
+        resultado["nao_encontrados"] = len(ids)
+        resultado["chaves_nao_encontradas"] = [por_id[i]["key"] for i in ids[:MAX_CHAVES_NAO_ENCONTRADAS]]
+        return resultado
+
+    semaforo = asyncio.Semaphore(PARTIAL_UPDATE_CONCURRENCY)
+    arquivo = ArquivoEmbeddings(client_id, await get_collection_model(collection_name))
+
+    async def aplicar_lote(lote: list[str]):
+        async with semaforo:
+            # set_payload falha o batch inteiro se um ID não existir: filtra antes
+            existentes = await qdrant.retrieve(collection_name, ids=lote, with_payload=False, with_vectors=False)
+            encontrados = {str(p.id) for p in existentes}
+
+            grupos = defaultdict(list)
+            for point_id in encontrados:
+                grupos[tuple(sorted(_campos(por_id[point_id]).items()))].append(point_id)
+
+            if grupos:
+                agora = int(time.time())
+                await qdrant.batch_update_points(collection_name, update_operations=_operacoes(grupos, agora), wait=True)
+                await arquivo.registrar_patches([
+                    (point_id, {**dict(campos), "updated_at": agora})
+                    for campos, point_ids in grupos.items() for point_id in point_ids
+                ])
+
+            resultado["atualizados"] += len(encontrados)
+            faltando = [por_id[i]["key"] for i in lote if i not in encontrados]
+            resultado["nao_encontrados"] += len(faltando)
+            espaco = MAX_CHAVES_NAO_ENCONTRADAS - len(resultado["chaves_nao_encontradas"])
+            resultado["chaves_nao_encontradas"].extend(faltando[:max(espaco, 0)])
+
+    await asyncio.gather(*[
+        aplicar_lote(ids[i:i + PARTIAL_UPDATE_BATCH_SIZE])
+        for i in range(0, len(ids), PARTIAL_UPDATE_BATCH_SIZE)
+    ])
+    await arquivo.flush()
+
+    if resultado["atualizados"]:
+        INDEXED_PRODUCTS.labels(result="updated", tenant=tenant_label(client_id)).inc(resultado["atualizados"])
+        # 🏷️ Invalida o cache do autocomplete (exato e semântico) do cliente
+        await bump_catalog_version(client_id)
+
+    return resultado
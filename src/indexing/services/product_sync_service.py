@@ -0,0 +1,125 @@
+import asyncio
+import json
+from qdrant_client import models
+from src.config import PRODUCT_WEBHOOK_MAX_ITEMS
+from src.indexing.schemas.product_schema import chave_produto, product_point_id
+from src.indexing.services import image_service
+from src.indexing.services.embedding_archive_service import ArquivoEmbeddings
+from src.indexing.services.embedding_model_service import get_collection_model
+from src.indexing.services.indexing import (
+    descarregar_buffers, finalizar_indexacao, indexar_lote, novo_resultado, preparar_indexacao
+)
+from src.indexing.services.normalizacao_service import normalizar_dataset
+from src.indexing.services.progress_service import atualizar_status
+from src.indexing.services.purge_service import R2_DELETE_BATCH
+from src.infra.qdrant_client import get_async_qdrant
+from src.infra.tenant_collections import collection_for
+from src.search.services.catalog_version_service import bump_catalog_version
+from src.utils.metrics import UPLOAD_JOBS_IN_PROGRESS
+
+# 🔄 Sincronização incremental por produto (webhooks da plataforma): upsert passa pelas mesmas
+# etapas da indexação (validação, imagem, embedding) só para os itens enviados; delete remove
+# os pontos pelo ID determinístico e as thumbnails correspondentes no R2.
+
+def ler_itens(corpo: bytes) -> list:
+    """Aceita NDJSON (um item por linha), um objeto JSON ou uma lista JSON."""
+    texto = corpo.decode("utf-8-sig").strip()
+    if not texto:
+        raise ValueError("Corpo vazio")
+
+    try:
+        dados = json.loads(texto)
+        itens = dados if isinstance(dados, list) else [dados]
+    except json.JSONDecodeError:
+        try:
+            itens = [json.loads(linha) for linha in texto.splitlines() if linha.strip()]
+        except json.JSONDecodeError as e:
+            raise ValueError(f"NDJSON inválido na linha {e.lineno}: {e.msg}")
+
+    if len(itens) > PRODUCT_WEBHOOK_MAX_ITEMS:
+        raise ValueError(f"Máximo de {PRODUCT_WEBHOOK_MAX_ITEMS} itens por requisição")
+    return itens
+
+async def _colecao_pronta(client_id: str) -> str:
+    collection_name = collection_for(client_id)
+    if await get_async_qdrant().collection_exists(collection_name):
+        return collection_name
+    # Primeiro produto do cliente: cria docs, coleção e índices como num upload
+    return await preparar_indexacao(client_id)
+
+async def upsert_produtos(produtos: list[dict], client_id: str, upload_id: str) -> dict:
+    UPLOAD_JOBS_IN_PROGRESS.inc()
+    stats = None
+    try:
+        await atualizar_status(upload_id, "processing", f"🔄 Atualizando {len(produtos)} produtos", 10)
+
+        collection_name = await _colecao_pronta(client_id)
+        stats = novo_resultado(upload_id, client_id)
+        # ID determinístico: o mesmo produto sobrescreve o ponto (e a thumbnail) existente
+        await indexar_lote(normalizar_dataset(produtos), client_id, collection_name, stats)
+        resultado = await finalizar_indexacao(client_id, stats)
+
+        await atualizar_status(
+            upload_id, "done", "✅ Produtos atualizados", 100,
+            recebidos=len(produtos),
+            indexados=resultado["adicionados"],
+            ignorados=resultado["ignorados"],
+            erros=resultado["erros"],
+        )
+        return resultado
+
+    except Exception as e:
+        print(f"❌ Erro no upsert incremental de '{client_id}': {e}")
+        await atualizar_status(upload_id, "failed", f"❌ {e}", 99)
+        return {"error": str(e)}
+
+    finally:
+        await descarregar_buffers(stats)
+        UPLOAD_JOBS_IN_PROGRESS.dec()
+
+def _chave_item(item) -> str:
+    if isinstance(item, dict):
+        return str(item.get("key") or chave_produto(item)).strip()
+    return str(item).strip()
+
+async def _apagar_thumbs(point_ids: list[str], client_id: str):
+    keys = [image_service.thumb_key(point_id, client_id) for point_id in point_ids]
+    for i in range(0, len(keys), R2_DELETE_BATCH):
+        resp = await asyncio.to_thread(
+            image_service.s3.delete_objects,
+            Bucket=image_service.BUCKET_NAME,
+            Delete={"Objects": [{"Key": k} for k in keys[i:i + R2_DELETE_BATCH]], "Quiet": True},
+        )
+        for erro in resp.get("Errors", [])[:5]:
+            print(f"⚠️ Falha ao apagar {erro.get('Key')}: {erro.get('Code')} {erro.get('Message')}")
+
+async def remover_produtos(itens: list, client_id: str) -> dict:
+    """Remove produtos por chave (string, {"key": ...} ou o próprio produto com id/url)."""
+    chaves = {product_point_id(client_id, chave): chave for chave in map(_chave_item, itens) if chave}
+    resultado = {"recebidos": len(itens), "removidos": 0, "nao_encontrados": []}
+
+    qdrant = get_async_qdrant()
+    collection_name = collection_for(client_id)
+    if not chaves or not await qdrant.collection_exists(collection_name):
+        resultado["nao_encontrados"] = list(chaves.values())
+        return resultado
+
+    existentes = await qdrant.retrieve(collection_name, ids=list(chaves), with_payload=False, with_vectors=False)
+    encontrados = [str(p.id) for p in existentes]
+    presentes = set(encontrados)
+    resultado["nao_encontrados"] = [chave for point_id, chave in chaves.items() if point_id not in presentes]
+
+    if encontrados:
+        await qdrant.delete(
+            collection_name=collection_name,
+            points_selector=models.PointIdsList(points=encontrados),
+            wait=True,
+        )
+        await _apagar_thumbs(encontrados, client_id)
+        arquivo = ArquivoEmbeddings(client_id, await get_collection_model(collection_name))
+        await arquivo.registrar_remocoes(encontrados)
+        await arquivo.flush()
+        await bump_catalog_version(client_id)
+        resultado["removidos"] = len(encontrados)
+
+    return resultado
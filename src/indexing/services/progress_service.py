@@ -0,0 +1,83 @@
+import json
+import time
+from src.infra.redis_client import redis_client
+
+# 📡 Progresso de uploads/jobs: hash com o estado atual + Redis Stream (limitado) com o log.
+# Cada passo é um HSET + XADD numa transação — O(1) por atualização e sem read-modify-write.
+
+STATUS_TTL_SECONDS = 3600
+LOG_MAX_ENTRIES = 1000
+LOG_ENTRIES_IN_STATUS = 50
+STATUS_FINAIS = {"done", "failed", "cancelled"}
+
+def _state_key(upload_id: str) -> str:
+    return f"upload:{upload_id}:state"
+
+def _log_key(upload_id: str) -> str:
+    return f"upload:{upload_id}:log"
+
+async def atualizar_status(upload_id: str, status: str, step: str, progress: int, ttl: int = STATUS_TTL_SECONDS, **contagens):
+    """Atualiza o estado e registra o passo no log. `contagens`: recebidos, indexados, ignorados, erros..."""
+    campos = {"status": status, "step": step, "progress": progress, "updated_at": int(time.time()), **contagens}
+
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(_state_key(upload_id), mapping=campos)
+        pipe.xadd(_log_key(upload_id), {"msg": step, **campos}, maxlen=LOG_MAX_ENTRIES, approximate=True)
+        pipe.expire(_state_key(upload_id), ttl)
+        pipe.expire(_log_key(upload_id), ttl)
+        await pipe.execute()
+
+def progresso_por_lote(upload_id: str):
+    """Callback `on_batch` do index_product_stream: publica as contagens acumuladas a cada lote."""
+    async def on_batch(recebidos: int, stats: dict):
+        await atualizar_status(
+            upload_id, "processing",
+            f"📦 {recebidos} produtos lidos ({stats['indexados']} indexados)",
+            min(95, 20 + recebidos // 1000),
+            recebidos=recebidos,
+            indexados=stats["indexados"],
+            ignorados=stats["ignorados"],
+            erros=stats["erros"],
+        )
+    return on_batch
+
+async def cancelar_upload(upload_id: str):
+    await atualizar_status(upload_id, "cancelled", "🛑 Cancelado pelo usuário", 0, ttl=600)
+
+def _numeros(campos: dict) -> dict:
+    return {k: int(v) if isinstance(v, str) and v.lstrip("-").isdigit() else v for k, v in campos.items()}
+
+async def get_status(upload_id: str) -> dict | None:
+    """Estado atual + últimas entradas do log (mesmo formato que o painel já consumia)."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hgetall(_state_key(upload_id))
+        pipe.xrevrange(_log_key(upload_id), count=LOG_ENTRIES_IN_STATUS)
+        estado, entradas = await pipe.execute()
+
+    if not estado:
+        return None
+
+    estado = _numeros(estado)
+    estado["log"] = [{"msg": campos.get("msg", ""), "progress": int(campos.get("progress", 0))} for _, campos in reversed(entradas)]
+    return estado
+
+async def eventos_sse(upload_id: str, last_event_id: str | None = None, heartbeat_ms: int = 15000):
+    """Gera eventos SSE a partir do log; retoma do Last-Event-ID e encerra quando o job termina."""
+    cursor = last_event_id or "0-0"
+
+    while True:
+        resposta = await redis_client.xread({_log_key(upload_id): cursor}, block=heartbeat_ms, count=100)
+
+        if not resposta:
+            estado = await redis_client.hget(_state_key(upload_id), "status")
+            if estado is None or estado in STATUS_FINAIS:
+                return
+            # Comentário SSE mantém a conexão viva através de proxies
+            yield ": keep-alive\n\n"
+            continue
+
+        for entry_id, campos in resposta[0][1]:
+            cursor = entry_id
+            yield f"id: {entry_id}\nevent: progress\ndata: {json.dumps(_numeros(campos), ensure_ascii=False)}\n\n"
+            if campos.get("status") in STATUS_FINAIS:
+                return
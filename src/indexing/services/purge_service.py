@@ -0,0 +1,183 @@
+import asyncio
+from qdrant_client import models
+from src.config import PRODUCT_CLASS, R2_DELETE_CONCURRENCY
+from src.indexing.services import image_service
+from src.indexing.services.embedding_archive_service import apagar_arquivo
+from src.indexing.services.embedding_model_service import colecao_fisica, forget_collection_model
+from src.indexing.services.progress_service import atualizar_status
+from src.infra.qdrant_client import get_async_qdrant
+from src.infra.tenant_collections import collection_for, is_shared_mode, tenant_filter, validar_client_id_purge
+from src.search.services.catalog_version_service import bump_catalog_version
+from src.utils.metrics import UPLOAD_JOBS_IN_PROGRESS
+
+# 🧨 Limpeza do catálogo (Qdrant + thumbnails no R2) como job em background,
+# com progresso no mesmo formato dos uploads (GET /upload-status/{job_id}).
+
+R2_DELETE_BATCH = 1000  # limite do DeleteObjects por request
+
+async def _apagar_lote_r2(keys: list[str], totais: dict):
+    resp = await asyncio.to_thread(
+        image_service.s3.delete_objects,
+        Bucket=image_service.BUCKET_NAME,
+        Delete={"Objects": [{"Key": k} for k in keys], "Quiet": True},
+    )
+    erros = resp.get("Errors", [])
+    for erro in erros[:5]:
+        print(f"⚠️ Falha ao apagar {erro.get('Key')}: {erro.get('Code')} {erro.get('Message')}")
+    totais["apagados"] += len(keys) - len(erros)
+    totais["erros"] += len(erros)
+
+async def apagar_prefixo_r2(prefix: str, on_page=None) -> dict:
+    """Lista o bucket paginado e apaga em lotes de 1000 chaves, com até R2_DELETE_CONCURRENCY lotes em voo."""
+    s3 = image_service.s3
+    paginas = iter(s3.get_paginator("list_objects_v2").paginate(
+        Bucket=image_service.BUCKET_NAME,
+        Prefix=prefix,
+        PaginationConfig={"PageSize": R2_DELETE_BATCH},
+    ))
+    totais = {"paginas": 0, "apagados": 0, "erros": 0}
+    pendentes: set[asyncio.Task] = set()
+
+    async def apagar_lote(keys: list[str]):
+        await _apagar_lote_r2(keys, totais)
+
+    while True:
+        page = await asyncio.to_thread(next, paginas, None)
+        if page is None:
+            break
+
+        keys = [obj["Key"] for obj in page.get("Contents", [])]
+        if keys:
+            while len(pendentes) >= R2_DELETE_CONCURRENCY:
+                concluidos, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in concluidos:
+                    tarefa.result()
+            pendentes.add(asyncio.create_task(apagar_lote(keys)))
+
+        totais["paginas"] += 1
+        if on_page:
+            await on_page(totais)
+
+    if pendentes:
+        await asyncio.gather(*pendentes)
+    return totais
+
+def chave_thumb_legada(payload: dict, client_id: str) -> str | None:
+    """
+    Chave da thumbnail referenciada no `image` do payload quando ela está fora do prefixo atual do tenant:
+    `products/thumbs/{uuid}.jpg` (antes do prefixo por tenant) ou `products/thumbs/{client_id cru}/...`
+    (antes do nome seguro, ex: client_id com ponto).
+    """
+    image = (payload or {}).get("image") or ""
+    base = f"{image_service.PUBLIC_BASE_URL}/"
+    if not image.startswith(base):
+        return None
+    key = image[len(base):]
+    if not key.startswith(image_service.THUMBS_PREFIX) or key.startswith(image_service.thumbs_prefix(client_id)):
+        return None
+    return key if key != image_service.THUMBS_PREFIX else None
+
+async def apagar_thumbs_legadas(client_id: str) -> dict:
+    """
+    Thumbnails gravadas em layouts anteriores não saem com o prefixo atual do tenant: as chaves
+    vêm do payload dos pontos do tenant, então isto precisa rodar antes de a coleção ser apagada.
+    """
+    qdrant = get_async_qdrant()
+    collection_name = collection_for(client_id)
+    totais = {"paginas": 0, "apagados": 0, "erros": 0}
+    if not await qdrant.collection_exists(collection_name):
+        return totais
+
+    offset = None
+    while True:
+        pontos, offset = await qdrant.scroll(
+            collection_name=collection_name,
+            scroll_filter=tenant_filter(client_id),
+            limit=R2_DELETE_BATCH,
+            offset=offset,
+            with_payload=["image"],
+            with_vectors=False,
+        )
+        keys = [k for k in (chave_thumb_legada(p.payload, client_id) for p in pontos) if k]
+        if keys:
+            await _apagar_lote_r2(keys, totais)
+        totais["paginas"] += 1
+        if offset is None:
+            return totais
+
+async def apagar_dados_qdrant(client_id: str = None) -> str:
+    qdrant = get_async_qdrant()
+
+    if client_id and is_shared_mode():
+        collection_name = collection_for(client_id)
+        if await qdrant.collection_exists(collection_name):
+            await qdrant.delete(
+                collection_name=collection_name,
+                points_selector=models.FilterSelector(filter=tenant_filter(client_id)),
+                wait=True,
+            )
+        return f"pontos de '{client_id}' em '{collection_name}'"
+
+    collection_name = collection_for(client_id) if client_id else PRODUCT_CLASS
+    if await qdrant.collection_exists(collection_name):
+        # Após uma migração de modelo o nome é um alias: apaga a coleção real (o alias sai junto)
+        fisica = await colecao_fisica(collection_name)
+        await qdrant.delete_collection(collection_name=fisica)
+        await forget_collection_model(collection_name)
+        if fisica != collection_name:
+            await forget_collection_model(fisica)
+        return f"coleção '{collection_name}'"
+    print(f"⚠️ A coleção '{collection_name}' não existe.")
+    return f"coleção '{collection_name}' (inexistente)"
+
+async def purge_catalog(job_id: str, client_id: str = None):
+    """
+    Apaga o catálogo de um tenant (thumbs antigas referenciadas pelos pontos, coleção/pontos e
+    thumbs/{client_id}/) ou tudo quando client_id é None.
+    """
+    escopo = client_id or "todos os tenants"
+    UPLOAD_JOBS_IN_PROGRESS.inc()
+
+    try:
+        if client_id is not None:
+            validar_client_id_purge(client_id)
+        legadas = {"apagados": 0, "erros": 0}
+        if client_id:
+            await atualizar_status(job_id, "processing", f"🪣 Limpando thumbnails antigas ({escopo})", 2)
+            legadas = await apagar_thumbs_legadas(client_id)
+
+        await atualizar_status(job_id, "processing", f"🧨 Limpando Qdrant ({escopo})", 5)
+        alvo_qdrant = await apagar_dados_qdrant(client_id)
+        # Sem isso um rebuild a partir do arquivo traria de volta os produtos apagados. Mesmo escopo do
+        # Qdrant: sem client_id só a coleção PRODUCT_CLASS sai, então só o arquivo desse tenant sai junto
+        tenant_arquivo = client_id or (None if is_shared_mode() else PRODUCT_CLASS)
+        if tenant_arquivo:
+            await asyncio.to_thread(apagar_arquivo, tenant_arquivo)
+        if client_id:
+            await bump_catalog_version(client_id)
+
+        await atualizar_status(job_id, "processing", f"🪣 Limpando imagens no R2 ({escopo})", 20)
+
+        async def on_page(totais: dict):
+            await atualizar_status(
+                job_id, "processing",
+                f"🪣 {totais['apagados']} imagens apagadas ({totais['paginas']} páginas)",
+                min(95, 20 + totais["paginas"]),
+            )
+
+        prefix = image_service.thumbs_prefix(client_id) if client_id else ""
+        totais = await apagar_prefixo_r2(prefix, on_page)
+        totais["apagados"] += legadas["apagados"]
+        totais["erros"] += legadas["erros"]
+
+        resumo = f"✅ Limpeza concluída: {alvo_qdrant} e {totais['apagados']} imagens ({totais['erros']} erros)"
+        await atualizar_status(job_id, "done", resumo, 100)
+        print(resumo)
+        return totais
+
+    except Exception as e:
+        print(f"❌ Erro durante exclusão: {e}")
+        await atualizar_status(job_id, "failed", f"❌ Erro durante exclusão: {e}", 99)
+
+    finally:
+        UPLOAD_JOBS_IN_PROGRESS.dec()
@@ -0,0 +1,96 @@
+import logging
+from qdrant_client import models
+from src.config import QDRANT_DEFAULT_STORAGE_PROFILE
+from src.infra.redis_client import redis_client
+from src.search.services.search_params_service import save_search_params
+
+logger = logging.getLogger(__name__)
+
+# 🗄️ Perfis de armazenamento das coleções no Qdrant
+# - default: float32 em RAM (comportamento original)
+# - scalar: int8 em RAM + vetores originais e payload em disco, rescoring com oversampling
+# - binary: 1 bit/dimensão em RAM + vetores originais e payload em disco (só para tenants grandes)
+STORAGE_PROFILES = {
+    "default": {
+        "quantization": None,
+        "on_disk_vectors": False,
+        "on_disk_payload": False,
+        "oversampling": None,
+    },
+    "scalar": {
+        "quantization": "scalar",
+        "on_disk_vectors": True,
+        "on_disk_payload": True,
+        "oversampling": 2.0,
+    },
+    "binary": {
+        "quantization": "binary",
+        "on_disk_vectors": True,
+        "on_disk_payload": True,
+        "oversampling": 3.0,
+    },
+}
+
+def _storage_profile_key(client_id: str) -> str:
+    return f"qdrant:storage_profile:{client_id}"
+
+def validar_perfil(profile: str) -> dict:
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Perfil de armazenamento desconhecido: '{profile}' (opções: {list(STORAGE_PROFILES)})")
+    return STORAGE_PROFILES[profile]
+
+def quantization_config(profile: str):
+    quantization = validar_perfil(profile)["quantization"]
+    if quantization == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True,
+            )
+        )
+    if quantization == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    return None
+
+def vector_params(profile: str, size: int = 384) -> models.VectorParams:
+    return models.VectorParams(
+        size=size,
+        distance=models.Distance.COSINE,
+        on_disk=validar_perfil(profile)["on_disk_vectors"],
+    )
+
+def quantization_search_params(profile: str) -> models.QuantizationSearchParams | None:
+    oversampling = validar_perfil(profile)["oversampling"]
+    if oversampling is None:
+        return None
+    return models.QuantizationSearchParams(rescore=True, oversampling=oversampling)
+
+async def get_storage_profile(client_id: str) -> str:
+    if redis_client:
+        try:
+            profile = await redis_client.get(_storage_profile_key(client_id))
+            if profile in STORAGE_PROFILES:
+                return profile
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao ler perfil de armazenamento de '{client_id}': {e}")
+    return QDRANT_DEFAULT_STORAGE_PROFILE
+
+async def save_storage_profile(client_id: str, profile: str):
+    config = validar_perfil(profile)
+    await redis_client.set(_storage_profile_key(client_id), profile)
+    # 🔎 A busca do autocomplete precisa saber o oversampling do rescoring
+    await save_search_params(client_id, {"oversampling": config["oversampling"]})
+
+def aplicar_perfil(client, collection_name: str, profile: str):
+    """Converte uma coleção existente para o perfil (o Qdrant reconstrói os segmentos em background)."""
+    config = validar_perfil(profile)
+    logger.info(f"🗄️ Aplicando perfil '{profile}' na coleção '{collection_name}'...")
+    client.update_collection(
+        collection_name=collection_name,
+        vectors_config={"": models.VectorParamsDiff(on_disk=config["on_disk_vectors"])},
+        collection_params=models.CollectionParamsDiff(on_disk_payload=config["on_disk_payload"]),
+        quantization_config=quantization_config(profile) or models.Disabled.DISABLED,
+    )
@@ -0,0 +1,166 @@
+import asyncio
+import codecs
+import gzip
+import pandas as pd
+from src.indexing.schemas.product_schema import ALL_FIELDS, mapear_colunas
+from src.utils.metrics import INDEXING_STAGE_SECONDS, medir_etapa
+
+# 📊 Leitura de catálogos tabulares (CSV, NDJSON, Parquet, Arrow) em lotes.
+# O mapeamento de aliases é resolvido uma vez no schema; cada lote sai pronto para o index_product_stream.
+
+TABULAR_BATCH_SIZE = 5000
+ENCODINGS = ["utf-8-sig", "utf-8", "windows-1252", "latin-1"]
+ENCODING_SAMPLE_BYTES = 1024 * 1024
+
+# Colunas lidas dos formatos colunares (o resto do arquivo nem é carregado)
+COLUNAS_USADAS = set(ALL_FIELDS) | {"breadcrumb"}
+
+# 🗜️ Uploads .gz/.zst são lidos descompactando em streaming (nunca expandidos em disco ou memória)
+MAGIC_COMPRESSAO = {b"\x1f\x8b": "gzip", b"\x28\xb5\x2f\xfd": "zstd"}
+
+def detectar_compressao(file_path: str) -> str | None:
+    with open(file_path, "rb") as f:
+        inicio = f.read(4)
+    return next((nome for magic, nome in MAGIC_COMPRESSAO.items() if inicio.startswith(magic)), None)
+
+def abrir_arquivo(file_path: str):
+    """Abre em modo binário, descompactando gzip/zstd de forma transparente."""
+    compressao = detectar_compressao(file_path)
+    if compressao == "gzip":
+        return gzip.open(file_path, "rb")
+    if compressao == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(file_path, "rb"), closefd=True)
+    return open(file_path, "rb")
+
+def detectar_formato(file_path: str) -> str:
+    """Identifica o formato pelo conteúdo: parquet | arrow | ndjson | xml | csv."""
+    with abrir_arquivo(file_path) as f:
+        inicio = f.read(512)
+
+    if inicio.startswith(b"PAR1"):
+        return "parquet"
+    if inicio.startswith(b"ARROW1") or inicio.startswith(b"\xff\xff\xff\xff"):
+        return "arrow"
+
+    texto = inicio.lstrip(b"\xef\xbb\xbf \t\r\n")
+    if texto.startswith(b"<"):
+        return "xml"
+    if texto.startswith(b"{"):
+        return "ndjson"
+    return "csv"
+
+def detectar_encoding(file_path: str) -> str:
+    """Escolhe o encoding decodificando só uma amostra do início do arquivo."""
+    with abrir_arquivo(file_path) as f:
+        amostra = f.read(ENCODING_SAMPLE_BYTES)
+
+    for encoding in ENCODINGS:
+        try:
+            # final=False tolera um caractere multibyte cortado no fim da amostra
+            codecs.getincrementaldecoder(encoding)().decode(amostra, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+def limpar_lote(df: pd.DataFrame) -> list[dict]:
+    if "price" in df.columns:
+        df["price"] = pd.to_numeric(df["price"], errors="coerce").fillna(0)
+    else:
+        df["price"] = 0
+
+    for col in ["description", "brand", "category"]:
+        if col in df.columns:
+            df[col] = df[col].fillna("")
+        else:
+            df[col] = ""
+
+    # Listas de colunas Arrow/Parquet chegam como ndarray
+    if "images" in df.columns:
+        df["images"] = df["images"].map(lambda v: v.tolist() if hasattr(v, "tolist") else v)
+
+    df = df[df["title"].notna() & (df["title"].astype(str).str.strip() != "")]
+    return df.to_dict(orient="records")
+
+def _lotes_pandas(file_path: str, formato: str, batch_size: int):
+    compressao = detectar_compressao(file_path)
+    if formato == "ndjson":
+        return pd.read_json(file_path, lines=True, chunksize=batch_size, dtype=False, compression=compressao)
+
+    encoding = detectar_encoding(file_path)
+    print(f"🔤 Encoding detectado: {encoding}")
+    # Parser C, uma única passada; bytes inválidos depois da amostra viram "�" em vez de reler o arquivo
+    return pd.read_csv(
+        file_path,
+        encoding=encoding,
+        encoding_errors="replace",
+        on_bad_lines="skip",
+        sep=",",
+        engine="c",
+        compression=compressao,
+        dtype=str,
+        chunksize=batch_size,
+    )
+
+def _lotes_arrow(file_path: str, formato: str, batch_size: int):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if detectar_compressao(file_path):
+        raise ValueError("Parquet/Arrow já são comprimidos internamente; envie o arquivo sem .gz/.zst")
+
+    if formato == "parquet":
+        arquivo = pq.ParquetFile(file_path)
+        nomes = arquivo.schema_arrow.names
+        renomear, erro = mapear_colunas(nomes)
+        if erro:
+            raise ValueError(erro)
+        colunas = [c for c in nomes if renomear[c] in COLUNAS_USADAS]
+        # Lê row group a row group, só as colunas usadas
+        for batch in arquivo.iter_batches(batch_size=batch_size, columns=colunas):
+            yield batch.to_pandas().rename(columns=renomear)
+        return
+
+    with pa.memory_map(file_path) as fonte:
+        try:
+            reader = pa.ipc.open_file(fonte)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            fonte.seek(0)
+            reader = pa.ipc.open_stream(fonte)
+            batches = iter(reader)
+
+        renomear, erro = mapear_colunas(reader.schema.names)
+        if erro:
+            raise ValueError(erro)
+        colunas = [c for c in reader.schema.names if renomear[c] in COLUNAS_USADAS]
+        for batch in batches:
+            for inicio in range(0, batch.num_rows, batch_size):
+                yield batch.slice(inicio, batch_size).select(colunas).to_pandas().rename(columns=renomear)
+
+def iterar_dataframes(file_path: str, formato: str, batch_size: int = TABULAR_BATCH_SIZE):
+    if formato in ("parquet", "arrow"):
+        yield from _lotes_arrow(file_path, formato, batch_size)
+        return
+
+    renomear = None
+    for df in _lotes_pandas(file_path, formato, batch_size):
+        if renomear is None:
+            print(f"📊 Colunas: {list(df.columns)}")
+            renomear, erro = mapear_colunas(df.columns.tolist())
+            if erro:
+                raise ValueError(erro)
+        yield df.rename(columns=renomear)
+
+async def iterar_lotes_tabela(file_path: str, formato: str, client_id: str = None, batch_size: int = TABULAR_BATCH_SIZE):
+    dataframes = iterar_dataframes(file_path, formato, batch_size)
+    while True:
+        # Parse fora do event loop, um lote por vez
+        with medir_etapa(INDEXING_STAGE_SECONDS, "parse", client_id):
+            df = await asyncio.to_thread(next, dataframes, None)
+        if df is None:
+            return
+        lote = limpar_lote(df)
+        if lote:
+            yield lote
@@ -1,114 +1,176 @@
+import asyncio
 import os
-import pandas as pd
-from uuid import uuid4
-from src.indexing.services.indexing import index_products
-from src.infra.redis_client import redis_client
-from src.indexing.schemas.product_schema import REQUIRED_FIELDS, detectar_e_mapear_colunas
-import json
-
-async def atualizar_status(upload_id: str, status: str, step: str, progress: int):
-    key = f"upload:{upload_id}:status"
-
-    # Recupera log anterior (se existir)
-    old_data = await redis_client.get(key)
-    log = []
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from src.config import UPLOAD_CHUNK_SIZE, UPLOAD_MAX_BYTES, UPLOAD_SPOOL_DIR
+from src.indexing.services.indexing import index_product_stream
+from src.indexing.services.tabular_service import detectar_formato, iterar_lotes_tabela
+from src.indexing.services.progress_service import atualizar_status, progresso_por_lote
+from src.indexing.services.xml_service import iterar_lotes_xml
+from src.utils.metrics import UPLOAD_JOBS_IN_PROGRESS
+
+# 📥 /upload lê o multipart direto de request.stream() (sem o SpooledTemporaryFile do Starlette no
+# diretório temporário do sistema): a parte `file` vai em blocos de UPLOAD_CHUNK_SIZE para UPLOAD_SPOOL_DIR,
+# com o limite UPLOAD_MAX_BYTES checado no Content-Length e a cada bloco. .gz/.zst são guardados como
+# vieram e descompactados em streaming pelo leitor.
+
+UPLOAD_FIELD_MAX_BYTES = 64 * 1024
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # boundaries, cabeçalhos das partes e campos simples
+
+def _muito_grande() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Arquivo excede o limite de {UPLOAD_MAX_BYTES // (1024 ** 2)} MB")
+
+class _EventosMultipart:
+    """Callbacks síncronos do MultipartParser viram eventos, tratados (com await) depois de cada write."""
+
+    def __init__(self):
+        self.eventos: list[tuple[str, object]] = []
+        self._campo = b""
+        self._valor = b""
+        self._headers: dict[bytes, bytes] = {}
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._inicio_parte,
+            "on_header_field": lambda data, start, end: self._acumular("_campo", data[start:end]),
+            "on_header_value": lambda data, start, end: self._acumular("_valor", data[start:end]),
+            "on_header_end": self._fim_header,
+            "on_headers_finished": lambda: self.eventos.append(("headers", self._headers)),
+            "on_part_data": lambda data, start, end: self.eventos.append(("data", data[start:end])),
+            "on_part_end": lambda: self.eventos.append(("end", None)),
+        }
 
-    if old_data:
-        try:
-            old_json = json.loads(old_data)
-            log = old_json.get("log", [])
-        except:
-            pass
-
-    log.append({"msg": step, "progress": progress})
-
-    # Atualiza status com log completo
-    payload = {
-        "status": status,
-        "step": step,
-        "progress": progress,
-        "log": log
-    }
-
-    await redis_client.set(key, json.dumps(payload), ex=3600)
-async def cancelar_upload(upload_id: str):
-    key = f"upload:{upload_id}:status"
-    data = {
-        "status": "cancelled",
-        "step": "🛑 Cancelado pelo usuário",
-        "progress": 0,
-        "log": [{"msg": "🛑 Cancelado pelo usuário", "progress": 0}]
-    }
-    await redis_client.set(key, json.dumps(data), ex=600)
-
-async def process_and_index_csv(file_path: str, upload_id: str, client_id: str = "default"):
-    print(f"\U0001f4c2 Começando processamento do CSV: {file_path} (upload_id={upload_id}, client_id={client_id})")
-
-    file_path = f"temp_{upload_id}.csv"
+    def _inicio_parte(self):
+        self._headers = {}
+
+    def _acumular(self, atributo: str, pedaco: bytes):
+        setattr(self, atributo, getattr(self, atributo) + pedaco)
+
+    def _fim_header(self):
+        self._headers[self._campo.lower()] = self._valor
+        self._campo, self._valor = b"", b""
+
+async def receber_upload_multipart(request: Request, upload_id: str, antes_do_arquivo=None) -> tuple[str, dict]:
+    """
+    Grava a parte `file` no spool e devolve (caminho, campos simples). `antes_do_arquivo(campos)` é
+    aguardado quando a parte do arquivo começa (ex: rate limit com o client_id enviado antes dela).
+    """
+    tamanho = request.headers.get("content-length", "")
+    if tamanho.isdigit() and int(tamanho) > UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD_BYTES:
+        raise _muito_grande()
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Envie multipart/form-data com o campo 'file'")
+
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    file_path = os.path.join(UPLOAD_SPOOL_DIR, f"{upload_id}.upload")
+    eventos = _EventosMultipart()
+    parser = MultipartParser(params[b"boundary"], eventos.callbacks())
+
+    campos: dict[str, str] = {}
+    destino = None
+    buffer = bytearray()
+    recebidos = 0
+    parte = None  # (nome, é_arquivo)
+    valor = bytearray()
+
+    async def tratar_eventos():
+        nonlocal destino, recebidos, parte, valor
+        for tipo, dado in eventos.eventos:
+            if tipo == "headers":
+                _, opcoes = parse_options_header(dado.get(b"content-disposition", b""))
+                nome = opcoes.get(b"name", b"").decode("utf-8", "replace")
+                parte = (nome, b"filename" in opcoes)
+                valor = bytearray()
+                if parte[1]:
+                    if nome != "file" or destino is not None:
+                        raise HTTPException(status_code=400, detail="Envie um único arquivo no campo 'file'")
+                    if antes_do_arquivo:
+                        await antes_do_arquivo(campos)
+                    destino = open(file_path, "wb")
+            elif tipo == "data" and parte and parte[1]:
+                recebidos += len(dado)
+                if recebidos > UPLOAD_MAX_BYTES:
+                    raise _muito_grande()
+                buffer.extend(dado)
+                if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                    await asyncio.to_thread(destino.write, bytes(buffer))
+                    buffer.clear()
+            elif tipo == "data" and parte:
+                valor.extend(dado)
+                if len(valor) > UPLOAD_FIELD_MAX_BYTES:
+                    raise HTTPException(status_code=400, detail=f"Campo '{parte[0]}' grande demais")
+            elif tipo == "end" and parte and not parte[1]:
+                campos[parte[0]] = valor.decode("utf-8", "replace")
+        eventos.eventos.clear()
 
     try:
-        await atualizar_status(upload_id, "processing", "📂 Lendo arquivo CSV", 10)
-
-        encodings = ['utf-8-sig', 'utf-8', 'latin-1', 'iso-8859-1', 'windows-1252']
-        df = None
-
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(file_path, encoding=encoding, on_bad_lines='skip', sep=',', engine='python')
-                print(f"\U0001f4ca CSV lido com {len(df)} linhas e colunas: {list(df.columns)}")
-                print("\U0001f9ea Primeira linha:")
-                print(df.head(1).to_dict(orient="records")[0] if not df.empty else "CSV vazio")
-                break
-            except UnicodeDecodeError:
-                continue
-
-        if df is None:
-            await atualizar_status(upload_id, "failed", "❌ Falha ao decodificar o arquivo", 25)
-            return {"error": "Falha ao decodificar o arquivo (encoding não reconhecido)"}
-
-        if df.empty:
-            await atualizar_status(upload_id, "failed", "❌ CSV está vazio", 40)
-            return {"error": "CSV está vazio."}
-
-        df, erro_mapeamento = detectar_e_mapear_colunas(df)
-        if erro_mapeamento:
-            await atualizar_status(upload_id, "failed", "❌ Erro no mapeamento de colunas", 50)
-            return {"error": erro_mapeamento}
-
-        if not all(col in df.columns for col in REQUIRED_FIELDS):
-            faltando = [col for col in REQUIRED_FIELDS if col not in df.columns]
-            msg = f"❌ Faltam colunas obrigatórias: {faltando}"
-            await atualizar_status(upload_id, "failed", msg, 60)
-            return {"error": msg}
-
-        if 'price' in df.columns:
-            df['price'] = pd.to_numeric(df['price'], errors='coerce').fillna(0)
-        else:
-            df['price'] = 0
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                await tratar_eventos()
+            parser.finalize()
+        except MultipartParseError as e:
+            raise HTTPException(status_code=400, detail=f"Multipart inválido: {e}")
+        await tratar_eventos()
+
+        if destino is None:
+            raise HTTPException(status_code=400, detail="Campo 'file' obrigatório")
+        if buffer:
+            await asyncio.to_thread(destino.write, bytes(buffer))
+        destino.close()
+    except BaseException:
+        if destino:
+            destino.close()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
 
-        for col in ['description', 'brand', 'category']:
-            if col in df.columns:
-                df[col] = df[col].fillna('')
-            else:
-                df[col] = ''
+    print(f"📥 Upload {upload_id} salvo em {file_path} ({recebidos / 1024 ** 2:.1f} MB)")
+    return file_path, campos
 
-        df = df[df['title'].notna() & (df['title'].str.strip() != '')]
-        
-        try:
-            response = await index_products(df.to_dict(orient="records"), client_id=client_id)
-        except Exception as e:
-            await atualizar_status(upload_id, "failed", "❌ Erro durante indexação", 90)
-            return {"error": str(e)}
+async def process_and_index_file(file_path: str, upload_id: str, client_id: str = "default"):
+    UPLOAD_JOBS_IN_PROGRESS.inc()
 
-        await atualizar_status(upload_id, "done", "✅ Finalizado com sucesso", 100)
+    try:
+        # 🧾 Feeds XML e tabelas só diferem no gerador de lotes: status, erros e limpeza são os mesmos
+        formato = detectar_formato(file_path)
+        print(f"\U0001f4c2 Começando processamento do arquivo {formato.upper()}: {file_path} (upload_id={upload_id}, client_id={client_id})")
+        if formato == "xml":
+            lotes = iterar_lotes_xml(file_path, client_id=client_id)
+            await atualizar_status(upload_id, "processing", "🧾 Lendo feed XML", 10)
+        else:
+            lotes = iterar_lotes_tabela(file_path, formato, client_id=client_id)
+            await atualizar_status(upload_id, "processing", f"📂 Lendo arquivo {formato.upper()}", 10)
+
+        response = await index_product_stream(
+            lotes,
+            client_id=client_id,
+            on_batch=progresso_por_lote(upload_id),
+            upload_id=upload_id,
+        )
+
+        if "error" in response:
+            await atualizar_status(upload_id, "failed", f"❌ {response['error']}", 90)
+            return {"upload_id": upload_id, "error": response["error"]}
+
+        await atualizar_status(
+            upload_id, "done", "✅ Finalizado com sucesso", 100,
+            recebidos=response.get("recebidos", 0),
+            indexados=response.get("adicionados", 0),
+            ignorados=response.get("ignorados", 0),
+            erros=response.get("erros", 0),
+        )
         print(f"🟢 Upload {upload_id} marcado como DONE no Redis")
 
         return {
             "upload_id": upload_id,
-            "message": "✅ Arquivo processado e indexado com sucesso!",
+            "message": "✅ Feed XML processado e indexado com sucesso!" if formato == "xml" else "✅ Arquivo processado e indexado com sucesso!",
             "details": response,
             "stats": {
-                "total_recebido": len(df),
+                "total_recebido": response.get("recebidos", 0),
                 "total_indexado": response.get("adicionados", 0)
             }
         }
@@ -118,5 +180,6 @@ async def process_and_index_csv(file_path: str, upload_id: str, client_id: str =
         return {"upload_id": upload_id, "error": f"Erro interno: {str(e)}"}
 
     finally:
+        UPLOAD_JOBS_IN_PROGRESS.dec()
         if os.path.exists(file_path):
-            os.remove(file_path)
\ No newline at end of file
+            os.remove(file_path)
@@ -0,0 +1,96 @@
+import asyncio
+import re
+from itertools import islice
+from typing import Iterator
+from xml.etree.ElementTree import iterparse
+from src.indexing.services.tabular_service import abrir_arquivo
+from src.utils.metrics import INDEXING_STAGE_SECONDS, medir_etapa
+
+# 🧾 Feeds XML (RSS 2.0 / Atom do Google Merchant e similares) lidos com iterparse:
+# cada <item>/<entry> é convertido, entregue e descartado — memória constante para feeds de GB.
+
+XML_BATCH_SIZE = 500
+ITEM_TAGS = {"item", "entry", "product", "offer"}
+
+# Nome local (sem namespace `g:`) → campo de ALL_FIELDS; o primeiro alias presente vence
+XML_FIELD_ALIASES = {
+    "title": ["title", "name"],
+    "price": ["sale_price", "price"],
+    "brand": ["brand", "manufacturer"],
+    "category": ["product_type", "google_product_category", "category"],
+    "url": ["link", "url"],
+    "description": ["description", "summary", "content"],
+}
+XML_IMAGE_TAGS = ["image_link", "image", "additional_image_link"]
+
+_PRICE_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1].lower()
+
+def _preco(texto: str) -> str:
+    """'1.299,90 BRL' / '19.90 USD' → '1299.90' / '19.90'."""
+    match = _PRICE_RE.search(texto or "")
+    if not match:
+        return "0"
+    numero = match.group(0)
+    if "," in numero and "." in numero:
+        decimal = "," if numero.rfind(",") > numero.rfind(".") else "."
+        numero = numero.replace("." if decimal == "," else ",", "").replace(decimal, ".")
+    return numero.replace(",", ".")
+
+def mapear_item_xml(campos: dict[str, list[str]]) -> dict:
+    produto = {}
+    for campo, aliases in XML_FIELD_ALIASES.items():
+        produto[campo] = next((campos[a][0] for a in aliases if campos.get(a)), "")
+
+    produto["price"] = _preco(produto["price"])
+    # "Casa > Cozinha > Panelas" → "Panelas"
+    produto["category"] = produto["category"].split(">")[-1].strip()
+    produto["images"] = [img for tag in XML_IMAGE_TAGS for img in campos.get(tag, [])]
+    if campos.get("id"):
+        produto["id"] = campos["id"][0]
+    return produto
+
+def iterar_produtos_xml(fonte) -> Iterator[dict]:
+    """Gera um dict por item do feed. `fonte` é um caminho ou arquivo binário."""
+    eventos = iterparse(fonte, events=("start", "end"))
+    pilha = []  # elementos abertos, para remover cada item do pai depois de lido
+    item = None
+
+    for evento, elem in eventos:
+        if evento == "start":
+            if item is None and _local(elem.tag) in ITEM_TAGS:
+                item = elem
+            pilha.append(elem)
+            continue
+
+        pilha.pop()
+        if elem is not item:
+            continue
+
+        campos: dict[str, list[str]] = {}
+        for filho in elem:
+            nome = _local(filho.tag)
+            # Atom: <link href="..."/>
+            valor = (filho.text or "").strip() or filho.get("href", "").strip()
+            if valor:
+                campos.setdefault(nome, []).append(valor)
+
+        item = None
+        # Libera o item e tira do pai (<channel>/<feed>), que senão acumularia todos os irmãos
+        elem.clear()
+        if pilha:
+            pilha[-1].remove(elem)
+        yield mapear_item_xml(campos)
+
+async def iterar_lotes_xml(file_path: str, batch_size: int = XML_BATCH_SIZE, client_id: str = None):
+    with abrir_arquivo(file_path) as fonte:
+        itens = iterar_produtos_xml(fonte)
+        while True:
+            # O parse é CPU-bound: roda fora do event loop, um lote por vez
+            with medir_etapa(INDEXING_STAGE_SECONDS, "parse", client_id):
+                lote = await asyncio.to_thread(lambda: list(islice(itens, batch_size)))
+            if not lote:
+                return
+            yield lote
@@ -1,13 +1,17 @@
 import httpx
+from src.config import EMBEDDING_DEFAULT_MODEL, EMBEDDING_SERVICE_URL
 
-async def encode_text(text: str) -> list:
+async def encode_texts(texts: list[str], model: str = None, timeout: float = 5) -> list:
     try:
-        async with httpx.AsyncClient(timeout=5) as client:
+        async with httpx.AsyncClient(timeout=timeout) as client:
             resp = await client.post(
-                "http://localhost:8001/embed",
-                json={"texts": [text]}
+                f"{EMBEDDING_SERVICE_URL}/embed",
+                json={"texts": texts, "model": model or EMBEDDING_DEFAULT_MODEL}
             )
             resp.raise_for_status()
-            return resp.json()["vectors"][0]
+            return resp.json()["vectors"]
     except Exception as e:
         raise RuntimeError(f"Erro ao chamar microserviço de embedding: {e}")
+
+async def encode_text(text: str, model: str = None) -> list:
+    return (await encode_texts([text], model))[0]
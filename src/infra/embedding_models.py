@@ -0,0 +1,36 @@
+# 🧠 Registro dos modelos de embedding. O ID versionado (ex: "minilm-v1") é o que fica gravado
+# por coleção: trocar o modelo de um ID existente invalidaria os vetores já indexados — crie um ID novo.
+import threading
+
+EMBEDDING_MODELS = {
+    "minilm-v1": {"name": "all-MiniLM-L6-v2", "size": 384},
+    "multilingual-minilm-v1": {"name": "paraphrase-multilingual-MiniLM-L12-v2", "size": 384},
+    "multilingual-mpnet-v1": {"name": "paraphrase-multilingual-mpnet-base-v2", "size": 768},
+}
+
+# Coleções criadas antes do registro foram indexadas com este modelo
+LEGACY_MODEL = "minilm-v1"
+
+def get_model_spec(model_id: str) -> dict:
+    if model_id not in EMBEDDING_MODELS:
+        raise ValueError(f"Modelo de embedding desconhecido: '{model_id}' (opções: {list(EMBEDDING_MODELS)})")
+    return EMBEDDING_MODELS[model_id]
+
+_loaded: dict = {}
+_lock = threading.Lock()
+
+def carregar_modelo(model_id: str):
+    """SentenceTransformer carregado sob demanda, uma vez por processo."""
+    if model_id not in _loaded:
+        spec = get_model_spec(model_id)
+        with _lock:
+            if model_id not in _loaded:
+                from sentence_transformers import SentenceTransformer
+                _loaded[model_id] = SentenceTransformer(spec["name"], device="cpu")
+    return _loaded[model_id]
+
+def modelos_carregados() -> list[str]:
+    return list(_loaded)
+
+def encode_local(texts: list[str], model_id: str) -> list[list[float]]:
+    return carregar_modelo(model_id).encode(texts).tolist()
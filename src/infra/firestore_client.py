@@ -1,3 +1,152 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from firebase_admin import firestore
+import src.firebase.firebase_admin  # garante initialize_app antes do firestore.client()
+from src.infra.redis_client import redis_client
 
 db = firestore.client()
+
+# 🔥 Acesso ao Firestore fora do event loop: o SDK é síncrono, então toda chamada
+# roda num executor limitado (não compete com o pool padrão do asyncio).
+FIRESTORE_MAX_WORKERS = int(os.getenv("FIRESTORE_MAX_WORKERS", "8"))
+_executor = ThreadPoolExecutor(max_workers=FIRESTORE_MAX_WORKERS, thread_name_prefix="firestore")
+
+# 🗂️ Cache TTL write-through de users/* e configs/* (None = documento não existe)
+FIRESTORE_CACHE_TTL_SECONDS = int(os.getenv("FIRESTORE_CACHE_TTL_SECONDS", "300"))
+# Sem Redis não há como saber de escritas de outros workers: a entrada só vale por alguns segundos
+FIRESTORE_CACHE_FALLBACK_TTL_SECONDS = int(os.getenv("FIRESTORE_CACHE_FALLBACK_TTL_SECONDS", "5"))
+FIRESTORE_CACHE_MAX_ENTRIES = 10000
+CACHED_COLLECTIONS = {"users", "configs"}
+
+# path → (expira em, geração no Redis quando foi lido, lido em, dados)
+_cache: OrderedDict[str, tuple[float, int | None, float, dict | None]] = OrderedDict()
+
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+# 🔢 Geração por documento no Redis, incrementada a cada escrita: a escrita de um worker invalida
+# o cache de todos os outros (1 GET/MGET por leitura, bem mais barato que o Firestore)
+def _geracao_key(path: str) -> str:
+    return f"firestore:gen:{path}"
+
+async def _geracoes(paths: list[str]) -> list[int | None]:
+    if not redis_client or not paths:
+        return [None] * len(paths)
+    try:
+        return [int(v or 0) for v in await redis_client.mget([_geracao_key(p) for p in paths])]
+    except Exception as e:
+        print(f"⚠️ Redis indisponível para o cache do Firestore: {e}")
+        return [None] * len(paths)
+
+async def _nova_geracao(path: str) -> int | None:
+    if not redis_client:
+        return None
+    try:
+        return int(await redis_client.incr(_geracao_key(path)))
+    except Exception as e:
+        print(f"⚠️ Não foi possível invalidar '{path}' nos outros workers: {e}")
+        return None
+
+def _cache_valido(path: str, geracao: int | None):
+    cached = _cache.get(path)
+    if not cached:
+        return None
+    expira, geracao_lida, lido_em, _ = cached
+    now = time.monotonic()
+    if expira <= now:
+        return None
+    if geracao is None or geracao_lida is None:
+        if now - lido_em >= FIRESTORE_CACHE_FALLBACK_TTL_SECONDS:
+            return None
+    elif geracao != geracao_lida:
+        return None
+    _cache.move_to_end(path)
+    return cached
+
+def _cache_put(collection: str, doc_id: str, data: dict | None, geracao: int | None):
+    if collection not in CACHED_COLLECTIONS:
+        return
+    path = f"{collection}/{doc_id}"
+    now = time.monotonic()
+    _cache[path] = (now + FIRESTORE_CACHE_TTL_SECONDS, geracao, now, data)
+    _cache.move_to_end(path)
+    while len(_cache) > FIRESTORE_CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+def invalidate(collection: str, doc_id: str):
+    _cache.pop(f"{collection}/{doc_id}", None)
+
+async def get_doc(collection: str, doc_id: str, fresh: bool = False) -> dict | None:
+    """`fresh=True` ignora o cache (a leitura atualiza o cache do processo)."""
+    path = f"{collection}/{doc_id}"
+    # Geração lida antes do documento: uma escrita concorrente deixa esta entrada já vencida
+    geracao = (await _geracoes([path]))[0] if collection in CACHED_COLLECTIONS else None
+    cached = None if fresh else _cache_valido(path, geracao)
+    if cached:
+        return cached[3]
+
+    snapshot = await _run(db.collection(collection).document(doc_id).get)
+    data = snapshot.to_dict() if snapshot.exists else None
+    _cache_put(collection, doc_id, data, geracao)
+    return data
+
+async def get_docs(paths: list[tuple[str, str]]) -> list[dict | None]:
+    """Lê vários documentos (collection, doc_id) com um único get_all para os que não estão em cache."""
+    geracoes = dict(zip(paths, await _geracoes([f"{c}/{d}" for c, d in paths if c in CACHED_COLLECTIONS])))
+    resultado: dict[tuple[str, str], dict | None] = {}
+    faltando = []
+    for collection, doc_id in paths:
+        cached = _cache_valido(f"{collection}/{doc_id}", geracoes.get((collection, doc_id)))
+        if cached:
+            resultado[(collection, doc_id)] = cached[3]
+        else:
+            faltando.append((collection, doc_id))
+
+    if faltando:
+        refs = [db.collection(collection).document(doc_id) for collection, doc_id in faltando]
+        snapshots = await _run(lambda: list(db.get_all(refs)))
+        lidos = {s.reference.path: (s.to_dict() if s.exists else None) for s in snapshots}
+        for collection, doc_id in faltando:
+            data = lidos.get(f"{collection}/{doc_id}")
+            resultado[(collection, doc_id)] = data
+            _cache_put(collection, doc_id, data, geracoes.get((collection, doc_id)))
+
+    return [resultado[p] for p in paths]
+
+def _write_and_read(ref, write):
+    write()
+    snapshot = ref.get()
+    return snapshot.to_dict() if snapshot.exists else None
+
+async def set_doc(collection: str, doc_id: str, data: dict, merge: bool = False):
+    ref = db.collection(collection).document(doc_id)
+    if collection not in CACHED_COLLECTIONS:
+        await _run(lambda: ref.set(data, merge=merge))
+        return
+
+    if merge:
+        # merge/field paths são resolvidos pelo servidor: relê o documento para manter o cache fiel
+        data = await _run(_write_and_read, ref, lambda: ref.set(data, merge=True))
+    else:
+        await _run(ref.set, data)
+    _cache_put(collection, doc_id, data, await _nova_geracao(f"{collection}/{doc_id}"))
+
+async def update_doc(collection: str, doc_id: str, data: dict):
+    ref = db.collection(collection).document(doc_id)
+    if collection not in CACHED_COLLECTIONS:
+        await _run(ref.update, data)
+        return
+    data = await _run(_write_and_read, ref, lambda: ref.update(data))
+    _cache_put(collection, doc_id, data, await _nova_geracao(f"{collection}/{doc_id}"))
+
+async def get_user_doc(uid: str) -> dict | None:
+    return await get_doc("users", uid)
+
+async def get_config_doc(client_id: str, fresh: bool = False) -> dict | None:
+    return await get_doc("configs", client_id, fresh=fresh)
+
+def invalidate_user(uid: str):
+    invalidate("users", uid)
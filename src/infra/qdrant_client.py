@@ -1,16 +1,67 @@
-# src/services/qdrant_client.py
+# src/infra/qdrant_client.py
+# 🧭 Registro único dos clientes Qdrant (sync e async), compartilhados por todo o app.
+# Cada cliente mantém o próprio pool de conexões; nada deve instanciar QdrantClient por request.
+import logging
+import httpx
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from src.config import (
+    QDRANT_URL, QDRANT_API_KEY,
+    QDRANT_PREFER_GRPC, QDRANT_GRPC_PORT,
+    QDRANT_TIMEOUT, QDRANT_POOL_SIZE, QDRANT_RETRIES,
+)
 
-import os
-from dotenv import load_dotenv
-from qdrant_client import QdrantClient
+logger = logging.getLogger(__name__)
 
-load_dotenv()
+_sync_client: QdrantClient | None = None
+_async_client: AsyncQdrantClient | None = None
 
-QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
-QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")  # pode ser None se for local
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=QDRANT_POOL_SIZE, max_keepalive_connections=QDRANT_POOL_SIZE)
 
-# Inicializa o cliente
-qdrant = QdrantClient(
-    url=QDRANT_URL,
-    api_key=QDRANT_API_KEY
-)
+def _client_kwargs() -> dict:
+    return {
+        "url": QDRANT_URL,
+        "api_key": QDRANT_API_KEY,
+        "prefer_grpc": QDRANT_PREFER_GRPC,
+        "grpc_port": QDRANT_GRPC_PORT,
+        "timeout": QDRANT_TIMEOUT,
+    }
+
+def get_qdrant() -> QdrantClient:
+    global _sync_client
+    if _sync_client is None:
+        # retries do transporte httpx cobrem falhas de conexão (REST); o pool é limitado por QDRANT_POOL_SIZE
+        _sync_client = QdrantClient(
+            **_client_kwargs(),
+            transport=httpx.HTTPTransport(retries=QDRANT_RETRIES, limits=_limits()),
+        )
+        logger.info(f"🔍 Cliente Qdrant (sync) criado: {QDRANT_URL} grpc={QDRANT_PREFER_GRPC}")
+    return _sync_client
+
+def get_async_qdrant() -> AsyncQdrantClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncQdrantClient(
+            **_client_kwargs(),
+            transport=httpx.AsyncHTTPTransport(retries=QDRANT_RETRIES, limits=_limits()),
+        )
+        logger.info(f"🔍 Cliente Qdrant (async) criado: {QDRANT_URL} grpc={QDRANT_PREFER_GRPC}")
+    return _async_client
+
+def set_qdrant(client: QdrantClient | None = None, async_client: AsyncQdrantClient | None = None):
+    """Substitui os clientes do registro (benchmarks/scripts com Qdrant em memória)."""
+    global _sync_client, _async_client
+    if client is not None:
+        _sync_client = client
+    if async_client is not None:
+        _async_client = async_client
+
+async def close_qdrant_clients():
+    global _sync_client, _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+    logger.info("🔌 Clientes Qdrant fechados")
@@ -0,0 +1,52 @@
+import hashlib
+import re
+from qdrant_client import models
+from src.config import QDRANT_STORAGE_MODE, QDRANT_SHARED_COLLECTION
+
+# 🏢 Resolve onde ficam os pontos de cada tenant:
+# - per_tenant: uma coleção por client_id (comportamento original)
+# - shared: uma coleção única, com client_id como índice de payload de tenant
+
+# 🔒 client_id vem da requisição: vira caminho em disco/prefixo no R2 só como nome seguro ([A-Za-z0-9_-]).
+# Outros valores viram "h-{sha256}" ("h-" é reservado), então nenhum tenant é prefixo de outro.
+_NOME_SEGURO = re.compile(r"(?!h-)[A-Za-z0-9_-]{1,64}")
+
+def nome_seguro(valor: str) -> str:
+    valor = str(valor)
+    if _NOME_SEGURO.fullmatch(valor):
+        return valor
+    return "h-" + hashlib.sha256(valor.encode("utf-8")).hexdigest()[:32]
+
+def validar_client_id_purge(client_id: str) -> str:
+    """Purge por tenant: vazio viraria "todos os tenants" e "/" (layout antigo do R2) alcançaria outro tenant."""
+    if not client_id or not client_id.strip() or "/" in client_id:
+        raise ValueError(f"client_id inválido para limpeza: {client_id!r}")
+    return client_id
+
+def is_shared_mode() -> bool:
+    return QDRANT_STORAGE_MODE == "shared"
+
+def collection_for(client_id: str) -> str:
+    return QDRANT_SHARED_COLLECTION if is_shared_mode() else client_id
+
+def tenant_filter(client_id: str, base: models.Filter | None = None) -> models.Filter | None:
+    """Injeta o filtro de client_id no modo compartilhado (mantendo as condições de `base`)."""
+    if not is_shared_mode():
+        return base
+
+    condition = models.FieldCondition(key="client_id", match=models.MatchValue(value=client_id))
+    if base is None:
+        return models.Filter(must=[condition])
+    must = base.must if isinstance(base.must, list) else [base.must] if base.must else []
+    return models.Filter(
+        must=[condition, *must],
+        should=base.should,
+        must_not=base.must_not,
+        min_should=base.min_should,
+    )
+
+# Índice de tenant: o Qdrant agrupa os pontos por client_id no armazenamento
+CLIENT_ID_INDEX = models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True)
+
+# HNSW só por tenant (payload_m) em vez de um grafo global na coleção compartilhada
+SHARED_HNSW_CONFIG = models.HnswConfigDiff(payload_m=16, m=0)
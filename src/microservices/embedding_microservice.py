@@ -1,25 +1,67 @@
 # src/services/embedding_microservice.py
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
 from typing import List
 import asyncio
+import time
+from prometheus_client import Gauge, Histogram
+from src.config import EMBEDDING_DEFAULT_MODEL, EMBEDDING_MODELS_PRELOAD
+from src.infra.embedding_models import EMBEDDING_MODELS, carregar_modelo, get_model_spec, modelos_carregados
+from src.utils.metrics import LATENCY_BUCKETS, metrics_response
 
 app = FastAPI()
-model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
 semaphore = asyncio.Semaphore(3)
 
+# 🧠 Vários modelos lado a lado: os de EMBEDDING_MODELS_PRELOAD sobem com o serviço,
+# os demais são carregados no primeiro request que os pede (coleções em migração, por exemplo)
+for model_id in EMBEDDING_MODELS_PRELOAD:
+    carregar_modelo(model_id)
+
+# 📈 Métricas do microserviço
+EMBED_SECONDS = Histogram("buscoo_embedding_encode_seconds", "Tempo de encode por request", ["model"], buckets=LATENCY_BUCKETS)
+EMBED_BATCH_SIZE = Histogram("buscoo_embedding_batch_size", "Textos por request", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+EMBED_QUEUE_DEPTH = Gauge("buscoo_embedding_queue_depth", "Requests aguardando o semáforo do modelo", multiprocess_mode="livesum")
+
 class EmbedRequest(BaseModel):
     texts: List[str]
+    model: str = EMBEDDING_DEFAULT_MODEL
 
 class EmbedResponse(BaseModel):
     vectors: List[List[float]]
+    model: str
 
 @app.post("/embed", response_model=EmbedResponse)
 async def embed(req: EmbedRequest):
-    async with semaphore:
-        vectors = model.encode(req.texts).tolist()
-        return {"vectors": vectors}
+    try:
+        get_model_spec(req.model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Carregar um modelo novo leva segundos: fora do event loop
+    model = await asyncio.to_thread(carregar_modelo, req.model)
+
+    EMBED_QUEUE_DEPTH.inc()
+    try:
+        await semaphore.acquire()
+    finally:
+        EMBED_QUEUE_DEPTH.dec()
+    try:
+        inicio = time.perf_counter()
+        # Encode fora do event loop: /, /models, /metrics e os requests na fila seguem respondendo
+        vectors = await asyncio.to_thread(lambda: model.encode(req.texts).tolist())
+        EMBED_SECONDS.labels(model=req.model).observe(time.perf_counter() - inicio)
+        EMBED_BATCH_SIZE.observe(len(req.texts))
+        return {"vectors": vectors, "model": req.model}
+    finally:
+        semaphore.release()
+
+@app.get("/models")
+async def listar_modelos():
+    return {"default": EMBEDDING_DEFAULT_MODEL, "loaded": modelos_carregados(), "models": EMBEDDING_MODELS}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
 
 @app.get("/")
 async def health():
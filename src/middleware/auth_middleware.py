@@ -1,23 +1,49 @@
 # src/middleware/auth_middleware.py
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
 from fastapi import Request, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from firebase_admin import firestore
 from src.firebase.firebase_admin import firebase_auth
+from src.infra.firestore_client import get_user_doc
 
 security = HTTPBearer()
 
+# 🔑 Tokens já verificados, indexados pelo hash do token e válidos até o `exp` do próprio token
+TOKEN_CACHE_MAX_ENTRIES = 10000
+_token_cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+async def _verify_id_token_cached(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).hexdigest()
+    now = time.time()
+
+    cached = _token_cache.get(key)
+    if cached and cached[0] > now:
+        _token_cache.move_to_end(key)
+        return dict(cached[1])
+
+    # Verificação de assinatura (e eventual download de certificados) fora do event loop
+    decoded_token = await asyncio.to_thread(firebase_auth.verify_id_token, token)
+
+    _token_cache[key] = (float(decoded_token.get("exp", now)), dict(decoded_token))
+    _token_cache.move_to_end(key)
+    while len(_token_cache) > TOKEN_CACHE_MAX_ENTRIES:
+        _token_cache.popitem(last=False)
+    return decoded_token
+
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     try:
-        decoded_token = firebase_auth.verify_id_token(token)
+        decoded_token = await _verify_id_token_cached(token)
         uid = decoded_token["uid"]
 
-        # Consulta o Firestore para trazer mais dados
-        db = firestore.client()
-        user_doc = db.collection("users").document(uid).get()
+        # Consulta o Firestore (com cache) para trazer mais dados
+        user_data = await get_user_doc(uid)
+        decoded_token["user_exists"] = user_data is not None
 
-        if user_doc.exists:
-            decoded_token.update(user_doc.to_dict())
+        if user_data:
+            decoded_token.update(user_data)
 
         return decoded_token
     except Exception as e:
@@ -1,38 +1,66 @@
 #TODO modularizar as rotas  
-from fastapi import APIRouter, HTTPException, UploadFile, File, Query, BackgroundTasks, Form, Depends
-from src.indexing.services.upload_service import process_and_index_csv
+import os
+from fastapi import APIRouter, HTTPException, Query, BackgroundTasks, Depends, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from src.indexing.services.upload_service import process_and_index_file, atualizar_status, receber_upload_multipart
+from src.indexing.services.purge_service import purge_catalog
+from src.indexing.services.progress_service import cancelar_upload, eventos_sse, get_status
 from src.search.services.search_service import search_products
 from src.search.services.autocomplete_service import get_autocomplete_suggestions, get_initial_autocomplete_suggestions
-from src.infra.redis_client import redis_client
-from qdrant_client import QdrantClient
 from uuid import uuid4
-import boto3
 from src.indexing.services.feed_url_service import process_feed_url
 from src.indexing.schemas.feed_schema import FeedURLRequest
-import json
 from src.middleware.auth_middleware import verify_token
-from firebase_admin import firestore
-
-from src.config import (
-    QDRANT_URL, QDRANT_API_KEY, 
-    R2_ACCESS_KEY, R2_SECRET_KEY, 
-    R2_ENDPOINT_URL, R2_BUCKET_NAME, 
-    PRODUCT_CLASS
-)
 from src.admin.routes.auth_routes import router_auth
+from src.admin.services.widget_config_service import etag_confere, get_published_config
+from src.utils.rate_limit import limitar_tenant
+from src.infra.tenant_collections import validar_client_id_purge
+
+# Navegadores/CDN podem reutilizar por 1 min e revalidar com If-None-Match (304) depois
+WIDGET_CONFIG_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
 
 router = APIRouter()
 router.include_router(router_auth)
 
-@router.post("/upload", summary="Upload de CSV com produtos", description="Recebe um arquivo CSV e inicia o processamento em segundo plano para indexar os produtos no Qdrant.")
-async def upload_csv(background_tasks: BackgroundTasks, file: UploadFile = File(...), client_id: str = Form("default")):
+# O body é lido em streaming pela rota (receber_upload_multipart): o schema do form vai só para a documentação
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {
+                "client_id": {"type": "string", "default": "default", "description": "Envie antes de `file` para o rate limit valer antes do upload"},
+                "file": {"type": "string", "format": "binary"},
+            },
+        }}},
+    }
+}
+
+@router.post("/upload", summary="Upload de catálogo de produtos", description="Recebe um arquivo CSV, NDJSON, Parquet, Arrow ou feed XML (RSS/Atom, Google Shopping) e inicia o processamento em segundo plano para indexar os produtos no Qdrant.", openapi_extra=UPLOAD_OPENAPI)
+async def upload_csv(request: Request, background_tasks: BackgroundTasks):
     upload_id = str(uuid4())
-    file_path = f"temp_{upload_id}.csv"
+    tenant_verificado = False
+
+    async def antes_do_arquivo(campos: dict):
+        nonlocal tenant_verificado
+        if campos.get("client_id"):
+            await limitar_tenant(request, campos["client_id"])
+            tenant_verificado = True
 
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+    file_path, campos = await receber_upload_multipart(request, upload_id, antes_do_arquivo)
+    client_id = campos.get("client_id") or request.query_params.get("client_id") or "default"
+    if not tenant_verificado:
+        # client_id depois do arquivo (ou só na query): o limite só pode ser checado agora
+        try:
+            await limitar_tenant(request, client_id)
+        except HTTPException:
+            os.remove(file_path)
+            raise
 
-    background_tasks.add_task(process_and_index_csv, file_path, upload_id, client_id)
+    await atualizar_status(upload_id, "processing", "📦 Arquivo recebido", 5)
+
+    background_tasks.add_task(process_and_index_file, file_path, upload_id, client_id)
 
     return {
         "upload_id": upload_id,
@@ -42,34 +70,28 @@ async def upload_csv(background_tasks: BackgroundTasks, file: UploadFile = File(
 
 @router.get("/upload-status/{upload_id}", summary="Status do upload", description="Retorna o status do processamento do upload baseado no ID fornecido.")
 async def get_upload_status(upload_id: str):
-    raw_status = await redis_client.get(f"upload:{upload_id}:status")
+    status = await get_status(upload_id)
 
-    if raw_status is None:
+    if status is None:
         raise HTTPException(status_code=404, detail="Upload ID não encontrado")
 
-    if isinstance(raw_status, bytes):
-        raw_status = raw_status.decode()
+    return status
 
-    try:
-        parsed = json.loads(raw_status)
-    except json.JSONDecodeError:
-        parsed = {"status": raw_status, "step": "", "progress": 0}
+@router.get("/upload-events/{upload_id}", summary="Progresso do upload em tempo real (SSE)", description="Server-Sent Events com cada passo do upload e as contagens por lote (recebidos, indexados, ignorados, erros). Suporta retomada via Last-Event-ID.")
+async def stream_upload_events(upload_id: str, request: Request):
+    if await get_status(upload_id) is None:
+        raise HTTPException(status_code=404, detail="Upload ID não encontrado")
 
-    return parsed
+    return StreamingResponse(
+        eventos_sse(upload_id, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.post("/upload/url", summary="Upload via URL", description="Recebe uma URL contendo o feed de produtos (CSV ou XML) e inicia o processamento remoto.")
-async def subir_via_url(request: FeedURLRequest):
-    return await process_feed_url(request.feed_url, request.client_id)
-
-async def cancelar_upload(upload_id: str):
-    key = f"upload:{upload_id}:status"
-    data = {
-        "status": "cancelled",
-        "step": "🛑 Cancelado pelo usuário",
-        "progress": 0,
-        "log": [{"msg": "🛑 Cancelado pelo usuário", "progress": 0}]
-    }
-    await redis_client.set(key, json.dumps(data), ex=600)
+async def subir_via_url(request: FeedURLRequest, http_request: Request):
+    await limitar_tenant(http_request, request.client_id)
+    return await process_feed_url(request.feed_url, request.client_id, force=request.force)
 
 @router.post("/upload-cancel/{upload_id}", summary="Cancelar upload", description="Cancela o processamento de um upload já iniciado com base no ID do upload.")
 async def cancelar(upload_id: str):
@@ -83,56 +105,27 @@ def search(query: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.delete("/delete-all", summary="Resetar base de dados", description="Remove a coleção de produtos do Qdrant e limpa todas as imagens do bucket R2 da Cloudflare.")
-async def delete_all_products():
-    try:
-        print("🔄 Iniciando processo de exclusão...")
-
-        qdrant = QdrantClient(
-            url=QDRANT_URL,
-            api_key=QDRANT_API_KEY,
-        )
-
-        collections = qdrant.get_collections()
-        collection_names = [c.name for c in collections.collections]
-
-        if PRODUCT_CLASS in collection_names:
-            print(f"🧨 Deletando a coleção '{PRODUCT_CLASS}' do Qdrant Cloud...")
-            qdrant.delete_collection(collection_name=PRODUCT_CLASS)
-            print("✅ Coleção deletada com sucesso.")
-        else:
-            print(f"⚠️ A coleção '{PRODUCT_CLASS}' não existe.")
-
-        print("🪣 Conectando ao bucket R2...")
-        s3 = boto3.client(
-            "s3",
-            region_name="auto",
-            endpoint_url=R2_ENDPOINT_URL,
-            aws_access_key_id=R2_ACCESS_KEY,
-            aws_secret_access_key=R2_SECRET_KEY,
-        )
-
-        response = s3.list_objects_v2(Bucket=R2_BUCKET_NAME)
-        deleted_files = []
-
-        if "Contents" in response:
-            for obj in response["Contents"]:
-                print(f"❌ Deletando: {obj['Key']}")
-                s3.delete_object(Bucket=R2_BUCKET_NAME, Key=obj["Key"])
-                deleted_files.append(obj["Key"])
-            print("✅ Todos os objetos foram deletados do R2.")
-        else:
-            print("ℹ️ Bucket já estava vazio.")
-
-        return {
-            "message": f"Coleção '{PRODUCT_CLASS}' e imagens R2 deletadas com sucesso.",
-            "qdrant_deleted": True,
-            "images_deleted": deleted_files
-        }
+@router.delete("/delete-all", summary="Resetar base de dados", description="Inicia em background a remoção dos produtos no Qdrant e das imagens no R2 (de um client_id ou de todos). Acompanhe pelo /upload-status/{job_id}.")
+async def delete_all_products(
+    background_tasks: BackgroundTasks,
+    client_id: str | None = Query(None, description="Limita a limpeza à coleção e às imagens de um cliente")
+):
+    if client_id is not None:
+        try:
+            validar_client_id_purge(client_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-    except Exception as e:
-        print(f"❌ Erro durante exclusão: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    job_id = str(uuid4())
+    await atualizar_status(job_id, "processing", "🔄 Iniciando processo de exclusão...", 0)
+    background_tasks.add_task(purge_catalog, job_id, client_id)
+
+    return {
+        "job_id": job_id,
+        "status": "processing",
+        "message": "🧨 Limpeza iniciada em background.",
+        "status_url": f"/api/upload-status/{job_id}"
+    }
 
 @router.get("/autocomplete", summary="Sugestões de autocomplete", description="Fornece sugestões de produtos, marcas e categorias com base em uma query textual.")
 async def autocomplete(
@@ -153,18 +146,18 @@ async def autocomplete_suggestions(
     return await get_initial_autocomplete_suggestions(client_id)
 
 @router.get("/widget/autocomplete-config")
-async def get_autocomplete_config(client_id: str = Query(..., description="Identificador único do cliente")):
-    db = firestore.client()
-    config_doc = db.collection("configs").document(client_id).get()
+async def get_autocomplete_config(
+    request: Request,
+    client_id: str = Query(..., description="Identificador único do cliente")
+):
+    entry = await get_published_config(client_id)
 
-    if not config_doc.exists:
+    if entry["body"] is None:
         raise HTTPException(status_code=404, detail="Configuração não encontrada")
 
-    autocomplete = config_doc.to_dict().get("autocomplete", {})
-    is_enabled = autocomplete.get("is_enabled", False)
+    headers = {"ETag": entry["etag"], "Cache-Control": WIDGET_CONFIG_CACHE_CONTROL}
+    if etag_confere(request.headers.get("if-none-match"), entry["etag"]):
+        return Response(status_code=304, headers=headers)
 
-    return {
-        "enabled": is_enabled,
-        "published": autocomplete.get("published", {})
-    }
+    return JSONResponse(entry["body"], headers=headers)
     
\ No newline at end of file
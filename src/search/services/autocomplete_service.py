@@ -4,7 +4,7 @@ import logging
 from fastapi import HTTPException
 from src.infra.embedding_client import encode_text
 from src.infra.redis_client import redis_client
-from src.infra.qdrant_client import qdrant
+from src.infra.qdrant_client import get_async_qdrant
 from collections import Counter
 import httpx
 from bs4 import BeautifulSoup
@@ -12,9 +12,22 @@ from functools import lru_cache
 import asyncio
 import time
 from qdrant_client.http.models import SearchRequest
-from qdrant_client.http.models import SearchParams
+from qdrant_client.http.models import SearchParams, QuantizationSearchParams
+from src.config import SEMANTIC_CACHE_ENABLED
+from src.search.services.semantic_cache import semantic_cache
+from src.search.services.catalog_version_service import get_catalog_version
+from src.indexing.services.embedding_model_service import resolver_colecao
+from src.indexing.schemas.product_schema import SUGGEST_FIELDS, montar_payload_suggest
+from src.infra.tenant_collections import collection_for, tenant_filter
+from src.search.services.search_params_service import get_search_params, min_score_para_tamanho
+from src.utils.metrics import AUTOCOMPLETE_STAGE_SECONDS, medir_etapa, registrar_cache, tenant_label
 
 logger = logging.getLogger(__name__)
+
+# 📦 Só o payload compacto `suggest`, pré-montado na indexação; pontos indexados antes dele existir
+# são completados com os campos soltos (SUGGEST_FIELDS) num retrieve à parte
+AUTOCOMPLETE_PAYLOAD_FIELDS = ["suggest"]
+
 async_client = httpx.AsyncClient(timeout=10.0)
 
 async def extract_image_from_url(url: str) -> str:
@@ -22,6 +35,7 @@ async def extract_image_from_url(url: str) -> str:
         cache_key = f"image-cache:{url}"
         if redis_client:
             cached = await redis_client.get(cache_key)
+            registrar_cache("image", bool(cached))
             if cached:
                 return cached
 
@@ -128,6 +142,15 @@ async def fix_product_image(product: dict) -> dict:
 
 async def get_autocomplete_suggestions(q: str, client_id: str = "default"):
     start = time.perf_counter()
+    try:
+        return await _buscar_sugestoes(q, client_id)
+    finally:
+        # ⏱️ Todas as saídas (cache hit, query inválida, erro) entram no histograma
+        elapsed = time.perf_counter() - start
+        AUTOCOMPLETE_STAGE_SECONDS.labels(stage="total", tenant=tenant_label(client_id)).observe(elapsed)
+        logger.info(f"⏱️ Tempo total de autocomplete('{q}'): {elapsed:.3f}s")
+
+async def _buscar_sugestoes(q: str, client_id: str):
     if not q:
         raise HTTPException(status_code=400, detail="Query 'q' é obrigatória")
 
@@ -141,66 +164,107 @@ async def get_autocomplete_suggestions(q: str, client_id: str = "default"):
         "suggestionsFound": False,
     }
 
+    # 🏷️ Chaves por tenant e versão do catálogo: indexações e atualizações de preço/estoque
+    # incrementam a versão e invalidam todas as respostas em cache daquele cliente
+    # (o modelo de embedding da coleção também entra: a query é codificada com ele)
+    catalog_version = await get_catalog_version(client_id)
+    # Busca na coleção física resolvida junto com o modelo: uma troca de alias não mistura os dois
+    collection_name, model_id = await resolver_colecao(collection_for(client_id))
+    cache_prefix = f"autocomplete:{client_id}:{model_id}:v{catalog_version}"
+
+    cache_key = f"{cache_prefix}:{q.lower()}"
+    cached = None
     if redis_client:
-        typo_fallback = await redis_client.get(f"autocomplete:typo_cache:{q.lower()}")
-        if typo_fallback and typo_fallback != q.lower():
-            fallback_data = await redis_client.get(f"autocomplete:{typo_fallback}")
-            if fallback_data:
-                logger.info(f"🧠 Fallback cache HIT para '{q}' usando '{typo_fallback}'")
-                return json.loads(fallback_data)
+        # Uma etapa só para as duas consultas (fallback de typo e chave exata)
+        with medir_etapa(AUTOCOMPLETE_STAGE_SECONDS, "cache_lookup", client_id):
+            typo_fallback = await redis_client.get(f"{cache_prefix}:typo_cache:{q.lower()}")
+            fallback_data = None
+            if typo_fallback and typo_fallback != q.lower():
+                fallback_data = await redis_client.get(f"{cache_prefix}:{typo_fallback}")
+            if not fallback_data:
+                cached = await redis_client.get(cache_key)
+        registrar_cache("autocomplete_typo", bool(fallback_data), client_id)
+        if fallback_data:
+            logger.info(f"🧠 Fallback cache HIT para '{q}' usando '{typo_fallback}'")
+            return json.loads(fallback_data)
 
     if not is_query_valid(q):
         logger.info(f"⚠️ Query inválida ou muito ruidosa: '{q}' — ignorada")
         return suggestions
 
-    cache_key = f"autocomplete:{q.lower()}"
     try:
         if redis_client:
-            cached = await redis_client.get(cache_key)
-            if cached:
-                data = json.loads(cached)
-                if data.get("suggestionsFound"):
-                    logger.info(f"✅ Cache HIT válido para '{q}'")
-                    return data
+            data = json.loads(cached) if cached else None
+            hit = bool(data and data.get("suggestionsFound"))
+            registrar_cache("autocomplete", hit, client_id)
+            if hit:
+                logger.info(f"✅ Cache HIT válido para '{q}'")
+                return data
 
         q_clean = q.strip().lower()
-        vector = await encode_text(q_clean)
+        with medir_etapa(AUTOCOMPLETE_STAGE_SECONDS, "embedding", client_id):
+            vector = await encode_text(q_clean, model=model_id)
         q_length = len(q_clean)
-        threshold = 0.05
-        hnsw = 128
+
+        # 🧠 Cache semântico: queries parafraseadas reaproveitam a resposta mais próxima
+        if SEMANTIC_CACHE_ENABLED:
+            with medir_etapa(AUTOCOMPLETE_STAGE_SECONDS, "semantic_cache_lookup", client_id):
+                semantic_hit = semantic_cache.lookup(client_id, vector, f"{model_id}:v{catalog_version}")
+            registrar_cache("semantic", semantic_hit is not None, client_id)
+            if semantic_hit:
+                semantic_hit["queries"] = suggestions["queries"]
+                return semantic_hit
+
+        # ⚙️ ef/limit/threshold calibrados por tenant (scripts/tune_hnsw.py) ou padrão
+        params = await get_search_params(client_id)
 
         search_args = {
-            "collection_name": f"{client_id}",
+            "collection_name": collection_name,
             "query_vector": vector,
-            "limit": 7,
-            "with_payload": True,
-            "search_params": SearchParams(hnsw_ef=hnsw, exact=False),
-            "score_threshold": threshold,
+            "query_filter": tenant_filter(client_id),
+            "limit": params["limit"],
+            "with_payload": AUTOCOMPLETE_PAYLOAD_FIELDS,
+            "search_params": SearchParams(
+                hnsw_ef=params["hnsw_ef"],
+                exact=params["exact"],
+                quantization=(
+                    QuantizationSearchParams(rescore=True, oversampling=params["oversampling"])
+                    if params["oversampling"] else None
+                ),
+            ),
+            "score_threshold": params["score_threshold"],
         }
 
-        result = qdrant.search(**search_args)
+        with medir_etapa(AUTOCOMPLETE_STAGE_SECONDS, "qdrant_search", client_id):
+            result = await get_async_qdrant().search(**search_args)
+
+        if params["use_min_score"]:
+            min_score = min_score_para_tamanho(q_length)
+            result = [p for p in result if p.score >= min_score]
 
         if not result:
             logger.info(f"🔍 Nenhum resultado para '{q}'")
             return suggestions
 
-        if q_length <= 2:
-            min_score = 0.14
-        elif q_length <= 4:
-            min_score = 0.08
-        elif q_length <= 6:
-            min_score = 0.13
-        else:
-            min_score = 0.2
+        sem_suggest = [p.id for p in result if not (p.payload or {}).get("suggest")]
+        legados = {}
+        if sem_suggest:
+            with medir_etapa(AUTOCOMPLETE_STAGE_SECONDS, "qdrant_retrieve_legacy", client_id):
+                legados = {
+                    r.id: montar_payload_suggest(r.payload or {})
+                    for r in await get_async_qdrant().retrieve(collection_name, ids=sem_suggest, with_payload=SUGGEST_FIELDS, with_vectors=False)
+                }
 
         seen = set()
         seen_titles = set()
         raw_products = []
 
         for p in result:
-            payload = p.payload or {}
-            url = payload.get("url", "")
-            title = payload.get("title", "")
+            product_data = (p.payload or {}).get("suggest") or legados.get(p.id)
+            if not product_data:
+                continue
+            url = product_data["url"]
+            title = product_data["title"]
 
             if url in seen or title in seen_titles:
                 continue
@@ -210,53 +274,41 @@ async def get_autocomplete_suggestions(q: str, client_id: str = "default"):
             score = p.score
             logger.info(f"[similaridade] Score para '{title}': {score}")
 
-            # Conversão segura de price para float
-            raw_price = payload.get("price", 0)
-            try:
-                price = float(raw_price)
-            except (ValueError, TypeError):
-                price = 0.0
-
-            product_data = {
-                "title": title,
-                "price": price,
-                "priceText": payload.get("priceText", "Indisponível"),
-                "brand": payload.get("brand", ""),
-                "category": payload.get("category", ""),
-                "image": payload.get("image", ""),
-                "url": url,
-            }
-
             raw_products.append(product_data)
 
-        products = await asyncio.gather(*[fix_product_image(p) for p in raw_products])
+        with medir_etapa(AUTOCOMPLETE_STAGE_SECONDS, "image_fix", client_id):
+            products = await asyncio.gather(*[fix_product_image(p) for p in raw_products])
 
-        categories = list({p["category"] for p in products if p["category"]})
-        brands = list({p["brand"] for p in products if p["brand"]})
+        with medir_etapa(AUTOCOMPLETE_STAGE_SECONDS, "serialization", client_id):
+            categories = list({p["category"] for p in products if p["category"]})
+            brands = list({p["brand"] for p in products if p["brand"]})
 
-        suggestions["catalogues"] = [{"name": c} for c in categories]
-        suggestions["brands"] = [{"name": b} for b in brands]
-        suggestions["products"] = products
-        suggestions["total"]["product"] = len(products)
-        suggestions["suggestionsFound"] = bool(products)
+            suggestions["catalogues"] = [{"name": c} for c in categories]
+            suggestions["brands"] = [{"name": b} for b in brands]
+            suggestions["products"] = products
+            suggestions["total"]["product"] = len(products)
+            suggestions["suggestionsFound"] = bool(products)
+            serialized = json.dumps(suggestions) if products else None
 
         if redis_client and products:
-            await redis_client.set(cache_key, json.dumps(suggestions), ex=300)
-            await redis_client.set(f"autocomplete:typo_cache:{q.lower()}", q.lower(), ex=900)
+            with medir_etapa(AUTOCOMPLETE_STAGE_SECONDS, "cache_store", client_id):
+                await redis_client.set(cache_key, serialized, ex=300)
+                await redis_client.set(f"{cache_prefix}:typo_cache:{q.lower()}", q.lower(), ex=900)
+
+        if SEMANTIC_CACHE_ENABLED and products:
+            semantic_cache.store(client_id, q_clean, vector, suggestions, f"{model_id}:v{catalog_version}")
 
     except Exception as e:
         logger.error(f"❌ Erro no autocomplete: {str(e)}", exc_info=True)
         return suggestions
 
-    elapsed = time.perf_counter() - start
-    logger.info(f"⏱️ Tempo total de autocomplete('{q}'): {elapsed:.3f}s")
-
     return suggestions
 
 async def get_top_items_from_qdrant(client_id: str) -> dict:
     try:
-        records = qdrant.scroll(
-            collection_name=client_id,
+        records = await get_async_qdrant().scroll(
+            collection_name=collection_for(client_id),
+            scroll_filter=tenant_filter(client_id),
             with_payload=True,
             limit=50
         )
@@ -0,0 +1,29 @@
+import logging
+from src.infra.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 🏷️ Versão do catálogo por tenant — muda a cada indexação e invalida caches derivados
+def _catalog_version_key(client_id: str) -> str:
+    return f"catalog:version:{client_id}"
+
+async def get_catalog_version(client_id: str) -> int:
+    if not redis_client:
+        return 0
+    try:
+        raw = await redis_client.get(_catalog_version_key(client_id))
+        return int(raw) if raw else 0
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao ler versão do catálogo de '{client_id}': {e}")
+        return 0
+
+async def bump_catalog_version(client_id: str) -> int:
+    if not redis_client:
+        return 0
+    try:
+        version = await redis_client.incr(_catalog_version_key(client_id))
+        logger.info(f"🏷️ Catálogo '{client_id}' agora na versão {version}")
+        return version
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao incrementar versão do catálogo de '{client_id}': {e}")
+        return 0
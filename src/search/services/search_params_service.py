@@ -0,0 +1,72 @@
+import json
+import logging
+import time
+from src.infra.redis_client import redis_client
+from src.infra.tenant_collections import collection_for
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Parâmetros padrão da busca do autocomplete (usados quando o tenant não foi calibrado)
+DEFAULT_SEARCH_PARAMS = {
+    "hnsw_ef": 128,
+    "exact": False,
+    "limit": 7,
+    "score_threshold": 0.05,
+    "use_min_score": False,
+    # oversampling do rescoring quando a coleção usa quantização (ver storage_profile_service)
+    "oversampling": None,
+}
+
+# ⏱️ Evita uma ida ao Redis por keystroke — parâmetros mudam só quando o tuning roda
+_PARAMS_TTL_SECONDS = 30
+_params_cache: dict[str, tuple[float, dict]] = {}
+
+def _search_params_key(client_id: str) -> str:
+    return f"autocomplete:search_params:{client_id}"
+
+def min_score_para_tamanho(q_length: int) -> float:
+    """Score mínimo esperado conforme o tamanho da query (queries curtas são mais ambíguas)."""
+    if q_length <= 2:
+        return 0.14
+    elif q_length <= 4:
+        return 0.08
+    elif q_length <= 6:
+        return 0.13
+    return 0.2
+
+async def get_search_params(client_id: str) -> dict:
+    now = time.monotonic()
+    cached = _params_cache.get(client_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    # Import local: storage_profile_service grava o oversampling por aqui (save_search_params)
+    from src.indexing.services.storage_profile_service import STORAGE_PROFILES, get_storage_profile
+
+    params = dict(DEFAULT_SEARCH_PARAMS)
+    salvos = {}
+    if redis_client:
+        try:
+            raw = await redis_client.get(_search_params_key(client_id))
+            salvos = json.loads(raw) if raw else {}
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao ler parâmetros de busca de '{client_id}': {e}")
+    params.update(salvos)
+
+    if "oversampling" not in salvos:
+        # Perfil vindo de QDRANT_DEFAULT_STORAGE_PROFILE nunca passou por save_storage_profile:
+        # sem isso, coleções quantizadas seriam buscadas sem rescoring nem oversampling
+        profile = await get_storage_profile(collection_for(client_id))
+        params["oversampling"] = STORAGE_PROFILES[profile]["oversampling"]
+
+    _params_cache[client_id] = (now + _PARAMS_TTL_SECONDS, params)
+    return params
+
+async def save_search_params(client_id: str, params: dict):
+    # Mescla com o que já está salvo: tuning de ef e perfil de armazenamento gravam chaves diferentes
+    raw = await redis_client.get(_search_params_key(client_id))
+    merged = json.loads(raw) if raw else {}
+    merged.update({k: v for k, v in params.items() if k in DEFAULT_SEARCH_PARAMS})
+    await redis_client.set(_search_params_key(client_id), json.dumps(merged))
+    _params_cache.pop(client_id, None)
+    logger.info(f"💾 Parâmetros de busca salvos para '{client_id}': {merged}")
@@ -0,0 +1,103 @@
+import copy
+import logging
+import numpy as np
+from src.config import SEMANTIC_CACHE_MAX_DISTANCE, SEMANTIC_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+class _TenantSemanticCache:
+    """Matriz de vetores de queries recentes de um tenant + respostas associadas."""
+
+    def __init__(self, capacity: int, dim: int, version: int | str):
+        self.capacity = capacity
+        self.version = version
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.responses: list = [None] * capacity
+        self.queries: list = [None] * capacity
+        self.size = 0
+
+    def clear(self, version: int | str):
+        self.version = version
+        self.last_used[:] = 0
+        self.responses = [None] * self.capacity
+        self.queries = [None] * self.capacity
+        self.size = 0
+
+class SemanticCache:
+    """
+    Cache de respostas do autocomplete indexado pelo embedding da query.
+    Uma query nova reaproveita a resposta da query em cache mais próxima
+    quando a distância de cosseno fica abaixo de `max_distance`.
+    """
+
+    def __init__(self, max_distance: float = SEMANTIC_CACHE_MAX_DISTANCE, capacity: int = SEMANTIC_CACHE_SIZE):
+        self.max_distance = max_distance
+        self.capacity = capacity
+        self._tenants: dict[str, _TenantSemanticCache] = {}
+        self._clock = 0
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray | None:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        if norm == 0:
+            return None
+        return v / norm
+
+    def _tenant(self, client_id: str, dim: int, version: int | str) -> _TenantSemanticCache:
+        cache = self._tenants.get(client_id)
+        if cache is None or cache.vectors.shape[1] != dim:
+            cache = _TenantSemanticCache(self.capacity, dim, version)
+            self._tenants[client_id] = cache
+        elif cache.version != version:
+            logger.info(f"🧹 Cache semântico de '{client_id}' invalidado (versão {cache.version} → {version})")
+            cache.clear(version)
+        return cache
+
+    def lookup(self, client_id: str, vector, version: int | str) -> dict | None:
+        v = self._normalize(vector)
+        if v is None:
+            return None
+
+        cache = self._tenant(client_id, v.shape[0], version)
+        if cache.size == 0:
+            return None
+
+        # 🔢 Similaridade de cosseno contra todas as entradas de uma vez
+        sims = cache.vectors[:cache.size] @ v
+        best = int(np.argmax(sims))
+        distance = 1.0 - float(sims[best])
+        if distance > self.max_distance:
+            return None
+
+        cache.last_used[best] = self._tick()
+        logger.info(f"🧠 Cache semântico HIT para '{client_id}' via '{cache.queries[best]}' (distância {distance:.3f})")
+        return copy.deepcopy(cache.responses[best])
+
+    def store(self, client_id: str, query: str, vector, response: dict, version: int | str):
+        v = self._normalize(vector)
+        if v is None:
+            return
+
+        cache = self._tenant(client_id, v.shape[0], version)
+        if cache.size < cache.capacity:
+            slot = cache.size
+            cache.size += 1
+        else:
+            # ♻️ LRU: substitui a entrada usada há mais tempo
+            slot = int(np.argmin(cache.last_used))
+
+        cache.vectors[slot] = v
+        cache.responses[slot] = copy.deepcopy(response)
+        cache.queries[slot] = query
+        cache.last_used[slot] = self._tick()
+
+    def invalidate(self, client_id: str):
+        self._tenants.pop(client_id, None)
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+)
+from starlette.responses import Response
+from src.utils.timing import registrar_tempo
+
+# 📈 Métricas Prometheus expostas em /metrics (API e microserviço de embedding)
+
+# Limite de tenants com label próprio — o resto vira "other" para não explodir a cardinalidade
+METRICS_MAX_TENANTS = int(os.getenv("METRICS_MAX_TENANTS", "50"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+AUTOCOMPLETE_STAGE_SECONDS = Histogram(
+    "buscoo_autocomplete_stage_seconds",
+    "Duração de cada etapa do autocomplete",
+    ["stage", "tenant"],
+    buckets=LATENCY_BUCKETS,
+)
+
+INDEXING_STAGE_SECONDS = Histogram(
+    "buscoo_indexing_stage_seconds",
+    "Duração de cada etapa da indexação",
+    ["stage", "tenant"],
+    buckets=LATENCY_BUCKETS + (30, 60, 300),
+)
+
+CACHE_LOOKUPS = Counter(
+    "buscoo_cache_lookups_total",
+    "Consultas a caches por resultado (hit/miss) — hit ratio = hit / (hit + miss)",
+    ["cache", "result", "tenant"],
+)
+
+INDEXED_PRODUCTS = Counter(
+    "buscoo_indexed_products_total",
+    "Produtos processados pela indexação por resultado",
+    ["result", "tenant"],
+)
+
+UPLOAD_JOBS_IN_PROGRESS = Gauge(
+    "buscoo_upload_jobs_in_progress",
+    "Uploads/feeds sendo processados em background",
+    multiprocess_mode="livesum",
+)
+
+_tenants_lock = threading.Lock()
+_known_tenants: set[str] = set()
+
+def tenant_label(client_id: str | None) -> str:
+    if not client_id:
+        return "unknown"
+    if client_id in _known_tenants:
+        return client_id
+    with _tenants_lock:
+        if len(_known_tenants) < METRICS_MAX_TENANTS:
+            _known_tenants.add(client_id)
+            return client_id
+    return "other"
+
+@contextmanager
+def medir_etapa(histogram: Histogram, stage: str, client_id: str | None = None):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        histogram.labels(stage=stage, tenant=tenant_label(client_id)).observe(duracao)
+        registrar_tempo(stage, duracao)
+
+def registrar_cache(cache: str, hit: bool, client_id: str | None = None):
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss", tenant=tenant_label(client_id)).inc()
+
+def metrics_response() -> Response:
+    # Com vários workers do uvicorn, PROMETHEUS_MULTIPROC_DIR agrega as métricas de todos os processos
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# 🔥 Profiler por amostragem do worker atual: a cada `intervalo` lê as pilhas de todas as
+# threads (sys._current_frames) e devolve no formato "folded" (pilha;pilha;... contagem),
+# aceito por flamegraph.pl, speedscope e inferno.
+
+_profiler_lock = threading.Lock()
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})".replace(";", ":")
+
+def _amostrar(segundos: float, intervalo: float) -> Counter:
+    proprio = threading.get_ident()
+    nomes = {t.ident: t.name for t in threading.enumerate()}
+    pilhas = Counter()
+    fim = time.monotonic() + segundos
+
+    while time.monotonic() < fim:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == proprio:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(nomes.get(thread_id, f"thread-{thread_id}"))
+            pilhas[";".join(reversed(stack))] += 1
+        time.sleep(intervalo)
+
+    return pilhas
+
+async def perfilar(segundos: float, intervalo: float = 0.005) -> str:
+    """Amostra o processo por `segundos` sem bloquear o event loop (que também é amostrado)."""
+    if not _profiler_lock.acquire(blocking=False):
+        raise RuntimeError("Já existe um profiling em andamento neste worker")
+    try:
+        pilhas = await asyncio.to_thread(_amostrar, segundos, intervalo)
+    finally:
+        _profiler_lock.release()
+    return "\n".join(f"{stack} {count}" for stack, count in pilhas.most_common())
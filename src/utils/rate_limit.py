@@ -1,32 +1,233 @@
-
+import logging
+import math
+import time
+from collections import OrderedDict
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
-from fastapi import status
-import time
+from fastapi import HTTPException, status
+from src.config import RATE_LIMIT_ENABLED, RATE_LIMIT_RULES
+from src.infra.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 🪣 Token bucket atômico para várias chaves: só consome se TODAS tiverem ficha.
+# ARGV = [taxa1, burst1, taxa2, burst2, ...]; retorna "0" ou os segundos até liberar.
+TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local retry = 0
+local tokens = {}
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local available = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    available = math.min(burst, available + math.max(0, now - ts) * rate)
+    if available < 1 then
+        retry = math.max(retry, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+if retry > 0 then
+    return tostring(retry)
+end
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    redis.call('HSET', KEYS[i], 'tokens', tokens[i] - 1, 'ts', now)
+    redis.call('EXPIRE', KEYS[i], math.ceil(burst / rate) + 1)
+end
+return "0"
+"""
+
+def parse_limit(raw: str) -> tuple[float, float]:
+    """ "taxa/s,burst" → (taxa, burst); taxa e burst precisam ser positivos (o Lua divide por eles)."""
+    rate, burst = (float(v) for v in raw.split(","))
+    if rate <= 0 or burst <= 0:
+        raise ValueError(f"Limite inválido '{raw}': taxa e burst precisam ser > 0")
+    return rate, burst
+
+class _LocalBuckets:
+    """Buckets em memória (LRU limitado): fallback quando o Redis está fora e cache de bloqueios."""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self.blocked_until: OrderedDict[str, float] = OrderedDict()
+
+    def _bound(self, d: OrderedDict):
+        while len(d) > self.max_keys:
+            d.popitem(last=False)
+
+    def blocked(self, key: str, now: float) -> float:
+        until = self.blocked_until.get(key)
+        if until is None:
+            return 0
+        if until <= now:
+            del self.blocked_until[key]
+            return 0
+        return until - now
+
+    def block(self, key: str, until: float):
+        self.blocked_until[key] = until
+        self.blocked_until.move_to_end(key)
+        self._bound(self.blocked_until)
+
+    def take(self, limits: list[tuple[str, float, float]], now: float) -> float:
+        retry = 0.0
+        states = []
+        for key, rate, burst in limits:
+            tokens, ts = self.buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - ts) * rate)
+            if tokens < 1:
+                retry = max(retry, (1 - tokens) / rate)
+            states.append((key, tokens))
+        if retry:
+            return retry
+        for key, tokens in states:
+            self.buckets[key] = (tokens - 1, now)
+            self.buckets.move_to_end(key)
+        self._bound(self.buckets)
+        return 0
+
+class RateLimiter:
+    """
+    Rate limit compartilhado entre workers (token bucket em Redis) com limites por endpoint,
+    por IP e por client_id. Quotas específicas de um tenant podem ser gravadas no hash
+    `ratelimit:quota:{client_id}` (campo = endpoint, valor = "taxa,burst").
+    """
+
+    QUOTA_TTL_SECONDS = 60
+
+    def __init__(self, rules: dict = None):
+        self.rules = {
+            path: {scope: parse_limit(raw) for scope, raw in rule.items()}
+            for path, rule in (rules or RATE_LIMIT_RULES).items()
+        }
+        self.local = _LocalBuckets()
+        self.quotas: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.script = redis_client.register_script(TOKEN_BUCKET_LUA) if redis_client else None
+
+    def match_rule(self, path: str) -> str | None:
+        for rule in self.rules:
+            if path == rule or path.startswith(rule + "/"):
+                return rule
+        return None
+
+    async def _tenant_quota(self, client_id: str, rule: str) -> tuple[float, float] | None:
+        now = time.monotonic()
+        cached = self.quotas.get(client_id)
+        if not cached or cached[0] <= now:
+            quotas = {}
+            try:
+                raw = await redis_client.hgetall(f"ratelimit:quota:{client_id}")
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao ler quota de '{client_id}': {e}")
+                raw = {}
+            for path, value in raw.items():
+                try:
+                    quotas[path] = parse_limit(value)
+                except ValueError as e:
+                    logger.warning(f"⚠️ Quota ignorada de '{client_id}' em {path}: {e}")
+            cached = (now + self.QUOTA_TTL_SECONDS, quotas)
+            self.quotas[client_id] = cached
+            self._bound_quotas()
+        return cached[1].get(rule)
+
+    def _bound_quotas(self):
+        while len(self.quotas) > self.local.max_keys:
+            self.quotas.popitem(last=False)
+
+    def ip_limits(self, request: Request, rule: str) -> list[tuple[str, float, float]]:
+        config = self.rules[rule]
+        if "per_ip" not in config:
+            return []
+        ip = request.client.host if request.client else "unknown"
+        return [(f"ratelimit:{rule}:ip:{ip}", *config["per_ip"])]
+
+    async def tenant_limits(self, client_id: str | None, rule: str) -> list[tuple[str, float, float]]:
+        config = self.rules[rule]
+        if not client_id or "per_tenant" not in config:
+            return []
+        quota = await self._tenant_quota(client_id, rule) if redis_client else None
+        return [(f"ratelimit:{rule}:tenant:{client_id}", *(quota or config["per_tenant"]))]
+
+    async def retry_after(self, limits: list[tuple[str, float, float]]) -> float:
+        if not limits:
+            return 0
+        now = time.time()
+        combo = "|".join(key for key, _, _ in limits)
+
+        # ⚡ Caminho rápido: combinação já sabidamente bloqueada não vai ao Redis
+        blocked = self.local.blocked(combo, now)
+        if blocked:
+            return blocked
+
+        if self.script:
+            try:
+                args = [v for _, rate, burst in limits for v in (rate, burst)]
+                retry = float(await self.script(keys=[k for k, _, _ in limits], args=args))
+                if retry:
+                    self.local.block(combo, now + retry)
+                return retry
+            except Exception as e:
+                logger.warning(f"⚠️ Rate limit no Redis indisponível, usando limite local: {e}")
+
+        return self.local.take(limits, now)
+
+rate_limiter = RateLimiter()
+
+def _retry_headers(retry: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(retry)))}
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, max_requests: int = 5, window_seconds: int = 1):
+    """Aplica os limites por IP e, quando o client_id vem na query ou no header x-client-id, por tenant."""
+
+    def __init__(self, app, limiter: RateLimiter = None, enabled: bool = RATE_LIMIT_ENABLED):
         super().__init__(app)
-        self.max_requests = max_requests
-        self.window = window_seconds
-        self.clients = {}
+        self.enabled = enabled
+        self.limiter = limiter or rate_limiter
 
-    async def dispatch(self, request: Request, call_next):
-        client_ip = request.client.host
-        now = time.time()
-        request_times = self.clients.get(client_ip, [])
+    @staticmethod
+    def _client_id(request: Request) -> str | None:
+        # O body não é lido aqui: rotas com client_id no form/JSON chamam limitar_tenant depois do parse
+        return request.query_params.get("client_id") or request.headers.get("x-client-id")
 
-        # Remove requisições antigas fora da janela
-        request_times = [t for t in request_times if now - t < self.window]
+    async def dispatch(self, request: Request, call_next):
+        rule = self.limiter.match_rule(request.url.path) if self.enabled else None
+        if rule is None or request.method == "OPTIONS":
+            return await call_next(request)
 
-        if len(request_times) >= self.max_requests:
+        client_id = self._client_id(request)
+        limits = self.limiter.ip_limits(request, rule) + await self.limiter.tenant_limits(client_id, rule)
+        retry = await self.limiter.retry_after(limits)
+        if retry:
             return Response(
                 content="⚠️ Muitos requests. tente novamente depois.",
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers=_retry_headers(retry),
             )
 
-        request_times.append(now)
-        self.clients[client_ip] = request_times
-        response = await call_next(request)
-        return response
+        # Lido por limitar_tenant: a regra do endpoint e se o tenant já foi contado aqui
+        request.state.rate_limit_rule = rule
+        request.state.rate_limit_tenant = client_id
+        return await call_next(request)
+
+async def limitar_tenant(request: Request, client_id: str):
+    """
+    Limite por tenant para rotas que só conhecem o client_id depois de ler o body (form de /upload,
+    JSON de /upload/url). Não conta de novo quando o middleware já viu o client_id na query/header.
+    """
+    rule = getattr(request.state, "rate_limit_rule", None)
+    if rule is None or getattr(request.state, "rate_limit_tenant", None):
+        return
+
+    retry = await rate_limiter.retry_after(await rate_limiter.tenant_limits(client_id, rule))
+    if retry:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="⚠️ Muitos requests. tente novamente depois.",
+            headers=_retry_headers(retry),
+        )
@@ -0,0 +1,49 @@
+import time
+from contextvars import ContextVar
+
+# ⏱️ Tempos por etapa da request atual, devolvidos no header Server-Timing
+_request_timings: ContextVar[dict | None] = ContextVar("request_timings", default=None)
+
+def registrar_tempo(stage: str, seconds: float):
+    timings = _request_timings.get()
+    # Depois que os headers saíram (ex: background tasks) não há mais onde reportar
+    if timings is None or not timings["open"]:
+        return
+    total, count = timings["stages"].get(stage, (0.0, 0))
+    timings["stages"][stage] = (total + seconds, count + 1)
+
+def _server_timing_header(timings: dict) -> str:
+    partes = []
+    for stage, (total, count) in timings["stages"].items():
+        desc = f';desc="{count}x"' if count > 1 else ""
+        partes.append(f"{stage};dur={total * 1000:.1f}{desc}")
+    return ", ".join(partes)
+
+class ServerTimingMiddleware:
+    """Middleware ASGI que abre um contexto de tempos por request e adiciona o header Server-Timing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = {"open": True, "stages": {}}
+        token = _request_timings.set(timings)
+        inicio = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                registrar_tempo("app", time.perf_counter() - inicio)
+                timings["open"] = False
+                header = _server_timing_header(timings)
+                if header:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
@@ -0,0 +1,266 @@
+import asyncio
+import gzip
+import os
+from uuid import UUID
+import numpy as np
+import pytest
+from src.indexing.schemas.product_schema import chave_produto, mapear_colunas, product_point_id
+from src.indexing.services import embedding_archive_service as arquivo
+from src.indexing.services import tabular_service
+from src.indexing.services.xml_service import _preco
+from src.infra.tenant_collections import nome_seguro, validar_client_id_purge
+
+# 🗃️ Arquivo de embeddings: ordem pela sequência da escrita (não do flush), compactação e caminhos seguros
+
+@pytest.fixture
+def dir_arquivo(tmp_path, monkeypatch):
+    monkeypatch.setattr(arquivo, "EMBEDDING_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(arquivo, "EMBEDDING_ARCHIVE_ENABLED", True)
+    # Sem Redis nos testes: sequência pelo relógio local monotônico
+    monkeypatch.setattr(arquivo, "_script_sequencia", None)
+    return tmp_path
+
+def _ponto(point_id: str, price: float, dim: int = 4):
+    vetor = np.full(dim, price, dtype=np.float32)
+    return point_id, f"texto {point_id}", vetor, {"title": point_id, "price": price, "suggest": {"price": price}}
+
+def _estado_final(client_id: str, model_id: str = "m1") -> dict:
+    pontos = {}
+    for ids, vetores, _, payloads, _ in arquivo.iterar_pontos(arquivo.diretorio_arquivo(client_id, model_id)):
+        for point_id, vetor, payload in zip(ids, vetores, payloads):
+            pontos[point_id] = (vetor, payload)
+    return pontos
+
+def test_patch_e_remocao_vencem_upsert_em_buffer(dir_arquivo):
+    async def cenario():
+        lento = arquivo.ArquivoEmbeddings("loja", "m1")
+        rapido = arquivo.ArquivoEmbeddings("loja", "m1")
+
+        # Worker lento indexa p1/p2 mas só grava o segmento no fim
+        await lento.registrar([_ponto("p1", 10.0), _ponto("p2", 20.0)])
+        # Enquanto isso outro worker atualiza o preço de p1, remove p2 e grava primeiro
+        await rapido.registrar_patches([("p1", {"price": 12.5, "priceText": "12.5"})])
+        await rapido.registrar_remocoes(["p2"])
+        await rapido.flush()
+        await lento.flush()
+
+    asyncio.run(cenario())
+
+    vivos, patches, remocoes = arquivo.resolver_estado(arquivo.diretorio_arquivo("loja", "m1"))
+    assert set(vivos) == {"p1"}
+    assert patches["p1"][1] == {"price": 12.5, "priceText": "12.5"}
+    assert set(remocoes) == {"p2"}
+
+    pontos = _estado_final("loja")
+    vetor, payload = pontos["p1"]
+    assert payload["price"] == 12.5
+    assert payload["suggest"]["price"] == 12.5
+    assert payload["embedding_text"] == "texto p1"
+    assert np.allclose(vetor, 10.0)
+
+def test_upsert_posterior_ressuscita_produto_removido(dir_arquivo):
+    async def cenario():
+        escrita = arquivo.ArquivoEmbeddings("loja", "m1")
+        await escrita.registrar([_ponto("p1", 10.0)])
+        await escrita.registrar_remocoes(["p1"])
+        await escrita.registrar([_ponto("p1", 30.0)])
+        await escrita.flush()
+
+    asyncio.run(cenario())
+
+    vetor, payload = _estado_final("loja")["p1"]
+    assert payload["price"] == 30.0
+    assert np.allclose(vetor, 30.0)
+
+def test_compactar_preserva_patches_e_remocoes_recentes(dir_arquivo):
+    async def cenario():
+        lento = arquivo.ArquivoEmbeddings("loja", "m1")
+        rapido = arquivo.ArquivoEmbeddings("loja", "m1")
+
+        await rapido.registrar([_ponto("p1", 10.0), _ponto("p2", 20.0), _ponto("p3", 30.0)])
+        await rapido.flush()
+        # Upsert antigo de p3 ainda no buffer de outro worker durante a compactação
+        await lento.registrar([_ponto("p3", 99.0)])
+        await rapido.registrar_patches([("p1", {"price": 11.0})])
+        await rapido.registrar_remocoes(["p3"])
+        await rapido.flush()
+
+        assert arquivo.compactar("loja", "m1") == 2
+        assert len(arquivo._segmentos(arquivo.diretorio_arquivo("loja", "m1"))) == 1
+
+        await lento.flush()
+
+    asyncio.run(cenario())
+
+    pontos = _estado_final("loja")
+    assert set(pontos) == {"p1", "p2"}
+    assert pontos["p1"][1]["price"] == 11.0
+    assert np.allclose(pontos["p2"][0], 20.0)
+
+def test_compactar_descarta_remocoes_antigas(dir_arquivo, monkeypatch):
+    async def cenario():
+        escrita = arquivo.ArquivoEmbeddings("loja", "m1")
+        await escrita.registrar([_ponto("p1", 10.0), _ponto("p2", 20.0)])
+        await escrita.flush()
+        await escrita.registrar_remocoes(["p2"])
+        await escrita.flush()
+
+    asyncio.run(cenario())
+    monkeypatch.setattr(arquivo, "EMBEDDING_ARCHIVE_TOMBSTONE_DAYS", 0)
+    arquivo.compactar("loja", "m1")
+
+    _, _, remocoes = arquivo.resolver_estado(arquivo.diretorio_arquivo("loja", "m1"))
+    assert remocoes == {}
+    assert set(_estado_final("loja")) == {"p1"}
+
+def test_compactacao_automatica_ao_passar_do_limite(dir_arquivo, monkeypatch):
+    monkeypatch.setattr(arquivo, "EMBEDDING_ARCHIVE_MAX_SEGMENTS", 2)
+
+    async def cenario():
+        escrita = arquivo.ArquivoEmbeddings("loja", "m1")
+        for i in range(3):
+            await escrita.registrar([_ponto(f"p{i}", float(i))])
+            await escrita.flush()
+
+    asyncio.run(cenario())
+
+    assert len(arquivo._segmentos(arquivo.diretorio_arquivo("loja", "m1"))) == 1
+    assert set(_estado_final("loja")) == {"p0", "p1", "p2"}
+
+@pytest.mark.parametrize("client_id", ["../fora", "/etc", "..", "a/../../b", "h-forjado"])
+def test_client_id_nunca_sai_da_raiz(dir_arquivo, client_id):
+    diretorio = arquivo.diretorio_arquivo(client_id, "m1")
+    raiz = os.path.realpath(dir_arquivo)
+    assert os.path.commonpath([raiz, diretorio]) == raiz
+    assert os.path.basename(os.path.dirname(diretorio)).startswith("h-")
+
+def test_listar_tenants_devolve_client_id_original(dir_arquivo):
+    async def cenario():
+        for client_id in ("loja", "loja/com barra"):
+            escrita = arquivo.ArquivoEmbeddings(client_id, "m1")
+            await escrita.registrar([_ponto("p1", 1.0)])
+            await escrita.flush()
+
+    asyncio.run(cenario())
+
+    assert arquivo.listar_tenants() == ["loja", "loja/com barra"]
+    arquivo.apagar_arquivo("loja/com barra")
+    assert arquivo.listar_tenants() == ["loja"]
+
+def test_apagar_arquivo_exige_client_id(dir_arquivo):
+    with pytest.raises(ValueError):
+        arquivo.apagar_arquivo("")
+
+# 📊 Catálogos tabulares: formato/encoding pelo conteúdo, aliases pelo schema e chave estável do produto
+
+def _arquivo(tmp_path, nome: str, conteudo: bytes) -> str:
+    caminho = tmp_path / nome
+    caminho.write_bytes(conteudo)
+    return str(caminho)
+
+@pytest.mark.parametrize("conteudo, formato", [
+    (b"PAR1\x15\x04", "parquet"),
+    (b"ARROW1\x00\x00", "arrow"),
+    (b"\xff\xff\xff\xff\x10\x00", "arrow"),
+    (b'\xef\xbb\xbf  {"title": "x"}\n', "ndjson"),
+    (b'\n<?xml version="1.0"?><rss/>', "xml"),
+    (b"title;price\nCaneca;10\n", "csv"),
+])
+def test_detectar_formato(tmp_path, conteudo, formato):
+    assert tabular_service.detectar_formato(_arquivo(tmp_path, "catalogo", conteudo)) == formato
+
+def test_detectar_formato_de_arquivo_compactado(tmp_path):
+    import zstandard
+
+    ndjson = b'{"title": "Caneca"}\n'
+    assert tabular_service.detectar_formato(_arquivo(tmp_path, "a.gz", gzip.compress(ndjson))) == "ndjson"
+    assert tabular_service.detectar_formato(_arquivo(tmp_path, "a.zst", zstandard.ZstdCompressor().compress(b"PAR1"))) == "parquet"
+
+@pytest.mark.parametrize("conteudo, encoding", [
+    # utf-8-sig vem primeiro: remove o BOM quando existe e lê UTF-8 puro igual
+    ("title\nCafé\n".encode("utf-8-sig"), "utf-8-sig"),
+    ("title\nCafé\n".encode("utf-8"), "utf-8-sig"),
+    ("title\nCafé – 10€\n".encode("windows-1252"), "windows-1252"),
+])
+def test_detectar_encoding(tmp_path, conteudo, encoding):
+    assert tabular_service.detectar_encoding(_arquivo(tmp_path, "catalogo.csv", conteudo)) == encoding
+
+def test_detectar_encoding_tolera_multibyte_cortado_na_amostra(tmp_path, monkeypatch):
+    conteudo = "ção".encode("utf-8")
+    monkeypatch.setattr(tabular_service, "ENCODING_SAMPLE_BYTES", 2)  # corta o "ç" no meio
+    assert tabular_service.detectar_encoding(_arquivo(tmp_path, "catalogo.csv", conteudo)) == "utf-8-sig"
+
+def test_mapear_colunas_resolve_aliases():
+    renomear, erro = mapear_colunas([" Product_Name", "final_price", "Marca", "category", "link", "SKU", "extra"])
+    assert erro is None
+    assert renomear == {
+        " Product_Name": "title", "final_price": "price", "Marca": "brand", "category": "category",
+        "link": "url", "SKU": "id", "extra": "extra",
+    }
+
+def test_mapear_colunas_sem_obrigatorios():
+    renomear, erro = mapear_colunas(["title", "price"])
+    assert renomear == {}
+    assert "brand" in erro and "url" in erro
+
+@pytest.mark.parametrize("texto, preco", [
+    ("1.299,90 BRL", "1299.90"),
+    ("19.90 USD", "19.90"),
+    ("1,299.90 USD", "1299.90"),
+    ("49,90", "49.90"),
+    ("R$ 7", "7"),
+    ("sob consulta", "0"),
+    (None, "0"),
+])
+def test_preco_do_feed_xml(texto, preco):
+    assert _preco(texto) == preco
+
+@pytest.mark.parametrize("produto, chave", [
+    ({"id": " SKU-1 ", "url": "https://loja/p/1"}, "SKU-1"),
+    ({"id": 123, "url": "https://loja/p/1"}, "123"),
+    ({"id": float("nan"), "url": "https://loja/p/1"}, "https://loja/p/1"),
+    ({"id": "  ", "url": None}, ""),
+    ({}, ""),
+])
+def test_chave_produto(produto, chave):
+    assert chave_produto(produto) == chave
+
+def test_product_point_id_deterministico_por_tenant():
+    assert product_point_id("loja", "SKU-1") == product_point_id("loja", "SKU-1")
+    assert product_point_id("loja", "SKU-1") != product_point_id("outra", "SKU-1")
+    assert str(UUID(product_point_id("loja", "SKU-1"))) == product_point_id("loja", "SKU-1")
+
+@pytest.mark.parametrize("client_id", ["acme/", "a/b", "../x", "h-forjado"])
+def test_nome_seguro_nunca_e_prefixo_de_outro_tenant(client_id):
+    nome = nome_seguro(client_id)
+    assert nome.startswith("h-") and "/" not in nome
+    assert nome_seguro("acme") == "acme"
+
+@pytest.mark.parametrize("client_id", ["", "  ", "acme/", "a/b"])
+def test_purge_recusa_client_id_invalido(client_id):
+    with pytest.raises(ValueError):
+        validar_client_id_purge(client_id)
+
+# 📝 Relatório de erros: acima do limite do stream, o resumo diz quantos itens ficaram de fora
+
+def test_relatorio_de_erros_indica_truncamento(monkeypatch):
+    from fakeredis import FakeAsyncRedis
+    from src.admin.services import relatorio_service
+
+    monkeypatch.setattr(relatorio_service, "redis_client", FakeAsyncRedis(decode_responses=True))
+    monkeypatch.setattr(relatorio_service, "ERROR_REPORT_MAX_ENTRIES", 10)
+
+    async def cenario():
+        relatorio = relatorio_service.RelatorioErros("u1", "loja")
+        for i in range(1200):
+            await relatorio.registrar(f"p{i}", "Preço inválido", {"i": i})
+        await relatorio.flush()
+        return await relatorio_service.resumo_erros("u1"), await relatorio_service.listar_erros("u1", limit=1000)
+
+    resumo, pagina = asyncio.run(cenario())
+    assert resumo["total"] == 1200
+    assert resumo["por_motivo"] == {"Preço inválido": 1200}
+    assert resumo["truncado"] is True
+    assert resumo["omitidos"] == 1200 - resumo["armazenados"] == 1200 - len(pagina["items"])
+    # Ficam os mais recentes
+    assert pagina["items"][-1]["dados"] == {"i": 1199}
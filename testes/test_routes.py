@@ -0,0 +1,108 @@
+import asyncio
+import os
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.utils import rate_limit
+from src.utils.rate_limit import RateLimiter, RateLimitMiddleware, _LocalBuckets, parse_limit
+
+# 🪣 Rate limit: fallback em memória quando o Redis está fora
+
+@pytest.fixture
+def sem_redis(monkeypatch):
+    monkeypatch.setattr(rate_limit, "redis_client", None)
+
+def _limiter_com_redis_fora(regras: dict) -> RateLimiter:
+    async def script_fora(keys, args):
+        raise ConnectionError("redis fora")
+
+    limiter = RateLimiter(regras)
+    limiter.script = script_fora
+    return limiter
+
+def test_parse_limit():
+    assert parse_limit("5,10") == (5.0, 10.0)
+    for raw in ("0,10", "5,0", "-1,10"):
+        with pytest.raises(ValueError):
+            parse_limit(raw)
+
+def test_local_buckets_consome_burst_e_recarrega():
+    buckets = _LocalBuckets()
+    limite = [("ip:1", 2.0, 3.0)]
+
+    assert [buckets.take(limite, 100.0) for _ in range(3)] == [0, 0, 0]
+    assert buckets.take(limite, 100.0) == pytest.approx(0.5)
+    # 0.5 s a 2 fichas/s devolve uma ficha
+    assert buckets.take(limite, 100.5) == 0
+
+def test_local_buckets_so_consome_se_todas_as_chaves_tiverem_ficha():
+    buckets = _LocalBuckets()
+    ip, tenant = ("ip:1", 1.0, 5.0), ("tenant:loja", 1.0, 1.0)
+
+    assert buckets.take([ip, tenant], 0.0) == 0
+    assert buckets.take([ip, tenant], 0.0) == pytest.approx(1.0)
+    # A recusa não gastou a ficha do IP: restam 4
+    assert [buckets.take([ip], 0.0) for _ in range(5)] == [0, 0, 0, 0, pytest.approx(1.0)]
+
+def test_local_buckets_limita_chaves_em_memoria():
+    buckets = _LocalBuckets(max_keys=2)
+    for i in range(5):
+        buckets.take([(f"ip:{i}", 1.0, 1.0)], 0.0)
+        buckets.block(f"combo:{i}", 10.0)
+
+    assert list(buckets.buckets) == ["ip:3", "ip:4"]
+    assert list(buckets.blocked_until) == ["combo:3", "combo:4"]
+    assert buckets.blocked("combo:4", 4.0) == 6.0
+    assert buckets.blocked("combo:4", 10.0) == 0
+
+def test_rate_limiter_usa_buckets_locais_sem_redis(sem_redis):
+    limiter = _limiter_com_redis_fora({"/api/busca": {"per_tenant": "1,2"}})
+
+    async def cenario():
+        limites = await limiter.tenant_limits("loja", "/api/busca")
+        return [await limiter.retry_after(limites) for _ in range(3)]
+
+    retries = asyncio.run(cenario())
+    assert retries[:2] == [0, 0]
+    assert retries[2] > 0
+
+def test_middleware_responde_429_com_retry_after(sem_redis):
+    app = FastAPI()
+
+    @app.get("/api/busca")
+    async def busca():
+        return {"ok": True}
+
+    @app.get("/livre")
+    async def livre():
+        return {"ok": True}
+
+    limiter = _limiter_com_redis_fora({"/api/busca": {"per_ip": "1,2", "per_tenant": "100,100"}})
+    app.add_middleware(RateLimitMiddleware, limiter=limiter, enabled=True)
+    client = TestClient(app)
+
+    codigos = [client.get("/api/busca", params={"client_id": "loja"}).status_code for _ in range(3)]
+    assert codigos == [200, 200, 429]
+
+    resposta = client.get("/api/busca", params={"client_id": "loja"})
+    assert resposta.status_code == 429
+    assert int(resposta.headers["Retry-After"]) >= 1
+    assert all(client.get("/livre").status_code == 200 for _ in range(5))
+
+# 🧩 Config do widget: If-None-Match como CDNs/proxies mandam (widget_config_service lê o Firestore)
+CREDENCIAL_FIREBASE = os.path.join(os.path.dirname(__file__), "..", "secrets", "firebase-admin.json")
+
+@pytest.mark.skipif(not os.path.exists(CREDENCIAL_FIREBASE), reason="sem credencial do Firebase")
+@pytest.mark.parametrize("if_none_match, confere", [
+    ('"3-abc"', True),
+    ('W/"3-abc"', True),
+    ('"2-old", W/"3-abc"', True),
+    ("*", True),
+    ('"2-old"', False),
+    ("", False),
+    (None, False),
+])
+def test_etag_confere(if_none_match, confere):
+    from src.admin.services.widget_config_service import etag_confere
+
+    assert etag_confere(if_none_match, '"3-abc"') is confere